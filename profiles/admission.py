@@ -0,0 +1,155 @@
+"""Admission control of requests by endpoint class.
+
+Endpoints are assigned to classes by ADMISSION_ENDPOINTS. A request is
+admitted while the number of in-flight requests of its class and of all
+classes are below the class limits of ADMISSION_CLASSES, so expensive
+endpoints are shed first when the node gets busy and cheap reads are
+served as long as possible.
+
+In-flight requests are counted in memory-mapped `settings.ADMISSION_FILE`,
+with a row of counters per process, so limits are shared by all workers of
+the node. Rows of exited processes are reused by new ones. Without
+`ADMISSION_FILE` requests are counted per process. Counts are read without
+locking, limits are approximate. Rows of processes which died without
+counting their requests out are ignored.
+
+Streaming responses are in flight until the server closes them, after
+their body is sent. Long lived streams, like server-sent events, are left
+out of admission control by mapping their view to None.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+from .utils import view_setting
+
+DEFAULT_CLASS = 'default'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class InFlight:
+    """In-flight requests counters of processes, row of process id and
+    counter of every class.
+    """
+
+    def __init__(self, classes, path=None, processes=256):
+        self.classes = sorted(classes)
+        self.indexes = {name: index for index, name
+                        in enumerate(self.classes)}
+        self.row = struct.Struct('q' + 'q' * len(self.classes))
+        self.lock = threading.Lock()
+        if path is None:
+            self.file = None
+            self.map = mmap.mmap(-1, self.row.size)
+            self.position = self.claim()
+            return
+        size = self.row.size * processes
+        self.file = open(path, 'a+b')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.file.fileno()).st_size < size:
+                self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+            self.position = self.claim()
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def claim(self):
+        """Returns position of row taken by this process"""
+        pid = os.getpid()
+        free = None
+        for position in range(0, len(self.map), self.row.size):
+            owner = struct.unpack_from('q', self.map, position)[0]
+            if owner == pid:
+                free = position
+                break
+            if free is None and (owner == 0 or not is_alive(owner)):
+                free = position
+        if free is None:
+            raise RuntimeError('No free row for process {}'.format(pid))
+        self.row.pack_into(self.map, free, pid, *[0] * len(self.classes))
+        return free
+
+    def add(self, name, amount):
+        offset = self.position + 8 * (1 + self.indexes[name])
+        with self.lock:
+            value = struct.unpack_from('q', self.map, offset)[0]
+            struct.pack_into('q', self.map, offset, value + amount)
+
+    def totals(self):
+        """Returns number of in-flight requests by class"""
+        counts = [0] * len(self.classes)
+        for position in range(0, len(self.map), self.row.size):
+            row = self.row.unpack_from(self.map, position)
+            if row[0] and is_alive(row[0]):
+                for index, count in enumerate(row[1:]):
+                    counts[index] += count
+        return dict(zip(self.classes, counts))
+
+
+_in_flight = None
+_in_flight_pid = None
+_in_flight_lock = threading.Lock()
+
+
+def in_flight():
+    """Returns in-flight counters of current process"""
+    global _in_flight, _in_flight_pid
+    pid = os.getpid()
+    if _in_flight_pid != pid:
+        with _in_flight_lock:
+            if _in_flight_pid != pid:
+                _in_flight = InFlight(settings.ADMISSION_CLASSES,
+                                      settings.ADMISSION_FILE,
+                                      settings.ADMISSION_MAX_PROCESSES)
+                _in_flight_pid = pid
+    return _in_flight
+
+
+def classify(view_func, method):
+    """Returns class of endpoint, None if it isn't admission controlled"""
+    return view_setting(settings.ADMISSION_ENDPOINTS, view_func, method,
+                        DEFAULT_CLASS)
+
+
+def admit(name):
+    """Counts request of class in if it's admitted, returns whether it is"""
+    limit, total_limit = settings.ADMISSION_CLASSES[name]
+    counters = in_flight()
+    totals = counters.totals()
+    if limit is not None and totals[name] >= limit:
+        return False
+    if total_limit is not None and sum(totals.values()) >= total_limit:
+        return False
+    counters.add(name, 1)
+    return True
+
+
+def release(name):
+    """Counts out admitted request of class"""
+    in_flight().add(name, -1)
+
+
+class Release:
+    """Counts out admitted request of class when response is closed"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        if self.name is not None:
+            release(self.name)
+            self.name = None
@@ -0,0 +1,162 @@
+"""Allocation profiling of serialization and rendering.
+
+While `collect()` block is active, "serialize" and "render" phases of
+instrumented views are measured with tracemalloc: peak memory above the
+phase start, memory retained after the phase and lines which allocated
+the most. Used by `?_profile=alloc` requests and `alloc_report` command.
+"""
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Phases measured by allocation profile.
+PHASES = ('serialize', 'render')
+# Number of top allocating lines reported for every phase.
+TOP_LINES = 10
+
+_local = threading.local()
+
+_filters = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class AllocationProfile:
+    """Allocation statistics of measured phases"""
+
+    def __init__(self, limit=TOP_LINES):
+        self.limit = limit
+        self.phases = OrderedDict()
+        self.measuring = False
+
+    @contextmanager
+    def measure(self, name):
+        # Nested phases, e.g. serialization of browsable API forms during
+        # rendering, are part of the outer one.
+        if self.measuring:
+            yield
+            return
+        self.measuring = True
+        before = tracemalloc.take_snapshot().filter_traces(_filters)
+        start = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(_filters)
+            self.measuring = False
+            stats = [stat for stat in after.compare_to(before, 'lineno')
+                     if stat.size_diff > 0][:self.limit]
+            phase = self.phases.setdefault(
+                name, {'peak': 0, 'retained': 0, 'top': []})
+            phase['peak'] = max(phase['peak'], peak - start)
+            phase['retained'] += current - start
+            phase['top'] = [
+                {'line': '{}:{}'.format(stat.traceback[0].filename,
+                                        stat.traceback[0].lineno),
+                 'size': stat.size_diff, 'count': stat.count_diff}
+                for stat in stats
+            ]
+
+    def as_dict(self):
+        return dict(self.phases)
+
+    def report(self):
+        """Returns human readable report"""
+        lines = []
+        for name, phase in self.phases.items():
+            lines.append('{}: peak {}, retained {}'.format(
+                name, format_size(phase['peak']),
+                format_size(phase['retained'])))
+            lines.extend(format_top(phase['top']))
+        return '\n'.join(lines) + '\n'
+
+
+def format_top(stats):
+    """Returns lines describing top allocating lines of phase"""
+    return ['    {} {} in {} blocks'.format(
+        stat['line'], format_size(stat['size']), stat['count'])
+        for stat in stats]
+
+
+def format_size(size):
+    """Formats size in bytes
+
+    Examples
+    -------
+    >>> format_size(1536)
+    '1.5 KiB'
+    >>> format_size(-10)
+    '-10 B'
+    """
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'GiB'
+    if unit == 'B':
+        return '{} B'.format(size)
+    return '{:.1f} {}'.format(size, unit)
+
+
+def current():
+    """Returns allocation profile collected in current thread or None"""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def measure(name):
+    """Measures allocations of the block if profile is being collected"""
+    profile = current()
+    if profile is None or name not in PHASES:
+        yield
+        return
+    with profile.measure(name):
+        yield
+
+
+@contextmanager
+def collect(limit=TOP_LINES):
+    """Collects allocation profile of the block, yields AllocationProfile"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    _local.profile = profile = AllocationProfile(limit)
+    try:
+        yield profile
+    finally:
+        _local.profile = None
+        if started:
+            tracemalloc.stop()
+
+
+def compare(results, baseline):
+    """Returns report comparing peak and retained memory of results with
+    baseline, both keyed by scale and case name.
+    """
+    lines = []
+    for scale, cases in sorted(results.items()):
+        for case, phases in sorted(cases.items()):
+            for name, phase in phases.items():
+                previous = baseline.get(scale, {}).get(case, {}).get(name)
+                for metric in ('peak', 'retained'):
+                    after = phase[metric]
+                    if previous is None:
+                        change = '{} (new)'.format(format_size(after))
+                    else:
+                        before = previous[metric]
+                        change = '{} -> {}'.format(format_size(before),
+                                                   format_size(after))
+                        if before:
+                            change += ' ({:+.1f}%)'.format(
+                                (after - before) / before * 100)
+                    lines.append('{} {} {} {}: {}'.format(
+                        scale, case, name, metric, change))
+    return '\n'.join(lines) + '\n'
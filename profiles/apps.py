@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ProfilesConfig(AppConfig):
     name = 'profiles'
+
+    def ready(self):
+        # Connect signal receivers.
+        from . import signals  # noqa: F401
+        from .slow_queries import install
+        connection_created.connect(install)
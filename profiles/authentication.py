@@ -0,0 +1,37 @@
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from . import metrics
+
+
+class MeteredTokenAuthentication(TokenAuthentication):
+    """Token authentication counting token lookups by their result"""
+
+    def authenticate_credentials(self, key):
+        try:
+            result = super().authenticate_credentials(key)
+        except exceptions.AuthenticationFailed:
+            metrics.TOKEN_LOOKUPS.inc(('failure',))
+            raise
+        metrics.TOKEN_LOOKUPS.inc(('success',))
+        return result
+
+
+class QueryStringTokenAuthentication(MeteredTokenAuthentication):
+    """Token authentication that reads token from `token` query parameter.
+
+    Browsers' EventSource can't send custom headers, so the events endpoint
+    accepts token in query string as well. Only views with
+    `allow_query_string_token` set are authenticated this way. Tokens end up
+    in URLs, so access logs of the proxy and uwsgi must scrub `token`
+    parameter.
+    """
+
+    def authenticate(self, request):
+        view = request.parser_context.get('view')
+        if not getattr(view, 'allow_query_string_token', False):
+            return None
+        key = request.query_params.get('token')
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
@@ -0,0 +1,122 @@
+"""Execution of batched API sub-requests.
+
+Sub-requests are dispatched straight to resolved views within the outer
+request, so they share the authenticated user (along with its permission
+cache) and the database connection.
+"""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+def execute(request, sub_requests, parallel=False, max_workers=1):
+    """Executes sub-requests and returns list of their results.
+
+    Parameters
+    ----------
+    request : rest_framework.request.Request
+        Outer batch request, its user and auth are reused.
+    sub_requests : list
+        Validated sub-requests, dicts with `method`, `url` and `body` keys.
+    parallel : bool
+        Run sub-requests in threads. Honored only if every sub-request is
+        read-only.
+    max_workers : int
+        Maximum number of threads used for parallel execution.
+
+    Returns
+    -------
+    list of dicts with `status` and `body` keys.
+    """
+    read_only = all(sub['method'] in permissions.SAFE_METHODS
+                    for sub in sub_requests)
+    if not (parallel and read_only and max_workers > 1):
+        return [_execute_one(request, sub) for sub in sub_requests]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda sub: _execute_in_thread(request, sub), sub_requests
+        ))
+
+
+def _execute_in_thread(request, sub):
+    try:
+        return _execute_one(request, sub)
+    finally:
+        # Threads get their own connections, don't leave them open.
+        connections.close_all()
+
+
+def _execute_one(request, sub):
+    """Returns result of sub-request, errors of the view are reported as
+    its result, so they don't fail the whole batch.
+    """
+    try:
+        return _dispatch(request, sub)
+    except Exception:
+        logger.exception('Batched %s %s failed', sub['method'], sub['url'])
+        return _result(status.HTTP_500_INTERNAL_SERVER_ERROR,
+                       {'detail': 'Server error.'})
+
+
+def _dispatch(request, sub):
+    url = urlsplit(sub['url'])
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return _result(status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'})
+    if match.namespace != 'api' or match.url_name == 'batch':
+        return _result(status.HTTP_400_BAD_REQUEST,
+                       {'detail': 'Only API endpoints can be batched.'})
+    if getattr(getattr(match.func, 'cls', None), 'streaming', False):
+        return _result(status.HTTP_400_BAD_REQUEST,
+                       {'detail': 'Streaming endpoints cannot be batched.'})
+
+    sub_request = _build_request(request, sub['method'], url, sub.get('body'))
+    sub_request.resolver_match = match
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Http404:
+        return _result(status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'})
+
+    if response.streaming:
+        response.close()
+        return _result(status.HTTP_400_BAD_REQUEST,
+                       {'detail': 'Streaming endpoints cannot be batched.'})
+    if isinstance(response, Response):
+        return _result(response.status_code, response.data)
+    content = response.content.decode(response.charset or 'utf-8')
+    return _result(response.status_code, content)
+
+
+def _build_request(request, method, url, body):
+    """Builds WSGI request for sub-request with outer request's environ"""
+    payload = b'' if body is None else json.dumps(body).encode('utf-8')
+    environ = dict(request.META)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _result(status_code, body):
+    return {'status': status_code, 'body': body}
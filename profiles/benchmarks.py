@@ -0,0 +1,355 @@
+"""Endpoints benchmark suite.
+
+Every case is run against a directory of given size generated by
+`seeding.seed()` and measured for wall time, number of queries and peak
+memory. Each metric is measured in separate runs, so query logging and
+allocation tracing don't distort timings.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.db import connection, reset_queries, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import allocations, fragments, seeding
+from .middleware import MiddlewareChain
+from .models import Address, User
+from .serializers import UserSerializer
+from .utils import chunked
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Users per group in generated datasets.
+USERS_PER_GROUP = 1000
+
+BENCHMARK_USER = 'benchmark-admin'
+
+METRICS = ('time', 'queries', 'peak_memory')
+
+# Requests made by every run of middleware cases.
+MIDDLEWARE_REQUESTS = 100
+
+# Number of fragment keys deleted at once between runs.
+FRAGMENTS_CHUNK_SIZE = 10000
+
+# Cases profiled by `run_allocations()`.
+ALLOCATION_CASES = ('users-list', 'users-detail', 'search-name',
+                    'groups-list', 'groups-detail')
+
+
+def parse_scale(value):
+    """Converts scale name or number to number of users
+
+    Examples
+    -------
+    >>> parse_scale('100k')
+    100000
+    >>> parse_scale('250')
+    250
+    """
+    return SCALES.get(value.lower()) or int(value)
+
+
+def dataset_size():
+    """Returns number of users in existing dataset"""
+    return User.objects.exclude(username=BENCHMARK_USER).count()
+
+
+@contextmanager
+def test_database(users, keepdb=False):
+    """Creates test database and yields whether dataset of given size has
+    to be built in it, existing data is never touched.
+    """
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  keepdb=keepdb)
+    try:
+        build = not (keepdb and dataset_size() == users)
+        if build and keepdb:
+            clear_dataset()
+        yield build
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0,
+                                            keepdb=keepdb)
+
+
+def build_dataset(users):
+    seeding.seed(users, max(10, users // USERS_PER_GROUP))
+
+
+def clear_dataset():
+    User.objects.all().delete()
+    Address.objects.all().delete()
+    Group.objects.all().delete()
+
+
+def get_admin():
+    """Returns admin user benchmarks are run on behalf of"""
+    admin = User.objects.filter(username=BENCHMARK_USER).first()
+    if admin is None:
+        admin = User.objects.create_user(
+            BENCHMARK_USER, 'benchmark-admin@example.com', 'benchmark',
+            first_name='Benchmark', last_name='Admin',
+            birthday=date(1990, 1, 1)
+        )
+        group, _ = Group.objects.get_or_create(name='Benchmark admins')
+        group.permissions.add(*Permission.objects.filter(
+            Q(content_type__app_label='profiles') |
+            Q(content_type__model='group')
+        ))
+        admin.groups.add(group)
+    return admin
+
+
+class Suite:
+    """Collection of benchmark cases bound to admin user and dataset"""
+
+    def __init__(self):
+        self.admin = get_admin()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.sample = User.objects.exclude(pk=self.admin.pk).order_by(
+            'pk').first()
+        self.group = Group.objects.exclude(
+            name='Benchmark admins').order_by('pk').first()
+
+    def cases(self):
+        """Returns list of (name, function) pairs"""
+        sample, group = self.sample, self.group
+        return [
+            ('users-list', lambda: self.get('/api/users/')),
+            ('users-detail', lambda: self.get(
+                '/api/users/{}/'.format(sample.username))),
+            ('search-name', lambda: self.get(
+                '/api/users/search', {'q': sample.first_name})),
+            ('search-email', lambda: self.get(
+                '/api/users/search', {'q': sample.email})),
+            ('search-date', lambda: self.get(
+                '/api/users/search', {'q': sample.birthday.isoformat()})),
+            ('groups-list', lambda: self.get('/api/groups/')),
+            ('groups-detail', lambda: self.get(
+                '/api/groups/{}/'.format(group.name))),
+            ('user-groups-put', lambda: self.request(
+                'put', '/api/users/{}/groups/'.format(sample.username),
+                {'groups': [group.name]})),
+            ('serializer-create', self.serializer_create),
+            ('serializer-update', self.serializer_update),
+            ('middleware-api', self.middleware(settings.API_MIDDLEWARE)),
+            ('middleware-full', self.middleware(
+                settings.DEFAULT_MIDDLEWARE)),
+        ]
+
+    def get(self, path, data=None):
+        return self.request('get', path, data)
+
+    def request(self, method, path, data=None):
+        kwargs = {'format': 'json'} if method != 'get' else {}
+        response = getattr(self.client, method)(path, data, **kwargs)
+        assert response.status_code < 400, (
+            '{} {} returned {}'.format(method.upper(), path,
+                                       response.status_code)
+        )
+        return response
+
+    def middleware(self, paths):
+        """Returns function passing MIDDLEWARE_REQUESTS requests through
+        middleware chain to a view returning empty response.
+        """
+        def get_response(request):
+            for process_view in chain.view_middleware:
+                process_view(request, view, (), {})
+            return view(request)
+
+        def view(request):
+            return HttpResponse()
+
+        chain = MiddlewareChain(paths, get_response)
+        factory = RequestFactory()
+
+        def run():
+            for _ in range(MIDDLEWARE_REQUESTS):
+                chain.handler(factory.get('/api/users/'))
+        return run
+
+    def context(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.admin
+        return {'request': request}
+
+    def serializer_create(self):
+        data = {'username': 'benchmark-new', 'first_name': 'New',
+                'last_name': 'User', 'email': 'benchmark-new@example.com',
+                'password': 'benchmark', 'birthday': '1990-01-01',
+                'address': {'zip_code': '000000', 'country': 'Russia',
+                            'city': 'City 0', 'district': 'District',
+                            'street': 'Street 0'}}
+        serializer = UserSerializer(data=data, context=self.context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def serializer_update(self):
+        # Refetching user, previous run changes were rolled back.
+        user = User.objects.get(pk=self.sample.pk)
+        data = {'first_name': 'Updated', 'address': {'street': 'New street'}}
+        serializer = UserSerializer(user, data=data, partial=True,
+                                    context=self.context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+
+def rolled_back(function):
+    """Runs function in transaction that is rolled back afterwards, so
+    write cases can be repeated on unchanged data.
+    """
+    with transaction.atomic():
+        function()
+        transaction.set_rollback(True)
+
+
+def drop_fragments():
+    """Deletes cached fragments of all users and groups, so every run
+    serializes objects. Other entries of FRAGMENT_CACHE, which may be shared
+    with other caches, are kept.
+    """
+    for model in (User, Group):
+        pks = model.objects.values_list('pk', flat=True).iterator()
+        for chunk in chunked(pks, FRAGMENTS_CHUNK_SIZE):
+            fragments.get_cache().delete_many(
+                [fragments.fragment_key(model, pk) for pk in chunk])
+
+
+def measure(function, repeat=3):
+    """Returns dict with median wall time in seconds, number of queries and
+    peak traced memory in bytes of function.
+    """
+    rolled_back(function)  # Warm up.
+    drop_fragments()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rolled_back(function)
+        timings.append(time.perf_counter() - start)
+        drop_fragments()
+
+    reset_queries()
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        transaction.set_rollback(True)
+    # Captured queries are sliced from connection's log lazily, count them
+    # before next request resets the log.
+    query_count = len(queries)
+    drop_fragments()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        rolled_back(function)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    drop_fragments()
+
+    return {'time': statistics.median(timings),
+            'queries': query_count,
+            'peak_memory': peak}
+
+
+def run(users, repeat=3, cases=None, build=True):
+    """Runs benchmark cases at given scale.
+
+    Parameters
+    ----------
+    users : int
+        Number of users in synthetic directory.
+    repeat : int
+        Number of timed runs of every case.
+    cases : iterable or None
+        Names of cases to run, all cases if None.
+    build : bool
+        Whether dataset should be built, pass False if database already
+        contains it.
+
+    Returns
+    -------
+    dict
+        Results keyed by case name.
+    """
+    if build:
+        build_dataset(users)
+    suite = Suite()
+    results = {}
+    for name, function in suite.cases():
+        if cases is None or name in cases:
+            results[name] = measure(function, repeat)
+    return results
+
+
+def run_allocations(users, cases=None, build=True,
+                    limit=allocations.TOP_LINES):
+    """Profiles allocations of serialization and rendering of read cases
+    at given scale.
+
+    Returns
+    -------
+    dict
+        Phases statistics keyed by case name, see
+        `allocations.AllocationProfile`.
+    """
+    if build:
+        build_dataset(users)
+    suite = Suite()
+    results = {}
+    for name, function in suite.cases():
+        if name in (cases or ALLOCATION_CASES):
+            rolled_back(function)  # Warm up.
+            drop_fragments()
+            with allocations.collect(limit) as profile:
+                rolled_back(function)
+            drop_fragments()
+            results[name] = profile.as_dict()
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Compares results with baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Results keyed by scale and case name.
+    baseline : dict
+        Baseline results in the same format.
+    tolerance : float
+        Allowed relative increase of time and memory, query count must not
+        increase at all.
+
+    Returns
+    -------
+    list of (scale, case, metric, baseline value, new value) tuples for
+    every regressed metric.
+    """
+    regressions = []
+    for scale, cases in sorted(results.items()):
+        for case, metrics in sorted(cases.items()):
+            previous = baseline.get(scale, {}).get(case)
+            if previous is None:
+                continue
+            for metric in METRICS:
+                allowed = previous[metric]
+                if metric != 'queries':
+                    allowed *= 1 + tolerance
+                if metrics[metric] > allowed:
+                    regressions.append((scale, case, metric,
+                                        previous[metric], metrics[metric]))
+    return regressions
@@ -0,0 +1,119 @@
+"""Coalescing of identical concurrent reads (single-flight).
+
+The first request for a key computes and renders the response, identical
+requests arriving meanwhile wait for it and get the same bytes instead of
+running the same queries and serialization. Requests are identical when
+they have the same normalized URL, permission level and media type.
+Flights are tracked per process, so requests are shared by threads of one
+worker.
+"""
+import threading
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from . import metrics
+from .instrumentation import phase
+from .permissions import permission_level
+
+
+class Flight:
+    """Response being computed by the first request of the key"""
+
+    def __init__(self):
+        self.landed = threading.Event()
+        self.result = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def request_key(request):
+    """Returns key of REST framework request shared by identical ones"""
+    query = sorted((key, value)
+                   for key, values in request.query_params.lists()
+                   for value in values)
+    return (request.method, request.scheme, request.get_host(), request.path,
+            urlencode(query), permission_level(request.user),
+            request.accepted_media_type)
+
+
+def join(key):
+    """Returns flight of key and whether the caller leads it"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = Flight()
+        return flight, True
+
+
+def land(key, flight, result):
+    """Shares result with requests waiting for the flight"""
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+    flight.result = result
+    flight.landed.set()
+
+
+def render(view, response):
+    """Renders response returned by view's handler before REST framework
+    does, returns its content and content type.
+    """
+    if isinstance(response, Response) and not response.is_rendered:
+        request = view.request
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = view.get_renderer_context()
+        with phase('render'):
+            response.render()
+    return response.content, response['Content-Type']
+
+
+class SingleFlightMixin:
+    """Shares rendered responses of list and retrieve actions between
+    identical concurrent requests.
+
+    Browsable API pages hold user's data and are never shared. Should be
+    placed before StatementTimeoutMixin, so waiting requests don't hold
+    its transaction.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.single_flight(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.single_flight(super().retrieve, request, *args,
+                                  **kwargs)
+
+    def single_flight(self, handler, request, *args, **kwargs):
+        if (not settings.SINGLE_FLIGHT_ENABLED or
+                isinstance(request.accepted_renderer, BrowsableAPIRenderer)):
+            return handler(request, *args, **kwargs)
+        key = request_key(request)
+        flight, leader = join(key)
+        if not leader:
+            landed = flight.landed.wait(settings.SINGLE_FLIGHT_TIMEOUT)
+            if landed and flight.result is not None:
+                metrics.record_cache('single_flight', True)
+                content, content_type = flight.result
+                return HttpResponse(content, content_type=content_type)
+            # Leader failed or is too slow, computing on our own.
+            return handler(request, *args, **kwargs)
+
+        metrics.record_cache('single_flight', False)
+        result = None
+        try:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                # Rendering now, so waiting requests get the bytes.
+                result = render(self, response)
+            return response
+        finally:
+            land(key, flight, result)
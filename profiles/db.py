@@ -0,0 +1,70 @@
+"""Database helpers.
+
+`execute_wrapper()` backports `connection.execute_wrapper()` of Django 2.0:
+wrappers are called around every query executed through the connection's
+cursors as `wrapper(execute, sql, params, many, context)`.
+"""
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.utils import CursorWrapper
+
+
+class WrappedCursor(CursorWrapper):
+    """Cursor calling connection's execute wrappers around queries"""
+
+    def execute(self, sql, params=None):
+        return self._execute_with_wrappers(sql, params, many=False)
+
+    def executemany(self, sql, param_list):
+        return self._execute_with_wrappers(sql, param_list, many=True)
+
+    def _execute(self, sql, params, many, context):
+        if many:
+            return self.cursor.executemany(sql, params)
+        return self.cursor.execute(sql, params)
+
+    def _execute_with_wrappers(self, sql, params, many):
+        context = {'connection': self.db, 'cursor': self}
+        execute = self._execute
+        for wrapper in reversed(self.db.execute_wrappers):
+            execute = partial(wrapper, execute)
+        return execute(sql, params, many, context)
+
+
+def install(connection):
+    """Makes connection's cursors call execute wrappers.
+
+    Does nothing if connection already supports them.
+    """
+    if hasattr(connection, 'execute_wrappers'):
+        return
+    connection.execute_wrappers = []
+    make_cursor = connection.make_cursor
+    make_debug_cursor = connection.make_debug_cursor
+    connection.make_cursor = lambda cursor: WrappedCursor(
+        make_cursor(cursor), connection)
+    connection.make_debug_cursor = lambda cursor: WrappedCursor(
+        make_debug_cursor(cursor), connection)
+
+
+@contextmanager
+def execute_wrapper(wrapper, connection=None):
+    """Calls wrapper around queries executed in the block.
+
+    Parameters
+    ----------
+    wrapper : callable
+        Called as `wrapper(execute, sql, params, many, context)`, must call
+        `execute(sql, params, many, context)` and return its result.
+    connection : DatabaseWrapper or None
+        Connection to wrap, default connection if None.
+    """
+    connection = connection or connections[DEFAULT_DB_ALIAS]
+    install(connection)
+    connection.execute_wrappers.append(wrapper)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.pop()
@@ -0,0 +1,30 @@
+"""URLs of API documentation.
+
+Views are created on the first request, so schema generation and
+documentation modules are not imported by workers which never serve docs.
+"""
+from importlib import import_module
+
+from django.conf.urls import url
+
+
+def lazy_view(name):
+    """Returns view which creates view by calling `profiles.schema.<name>`
+    on the first request.
+    """
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = getattr(import_module('profiles.schema'), name)()
+        return view(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+urlpatterns = [
+    url(r'^$', lazy_view('get_docs_view'), name='docs-index'),
+    url(r'^schema.js$', lazy_view('get_schemajs_view'), name='schema-js')
+]
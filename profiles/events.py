@@ -0,0 +1,199 @@
+"""In-process change notification broker.
+
+Changes to users, addresses and groups are published as ``Event`` objects
+to every subscription interested in the event type. Subscriptions hold a
+bounded queue, a subscriber that falls behind is dropped instead of letting
+its queue grow.
+
+When the database is PostgreSQL, events are additionally sent through
+``NOTIFY`` so that subscribers connected to other workers receive them too.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('user', 'address', 'group')
+
+Event = namedtuple('Event', ['type', 'action', 'id', 'key'])
+
+_origin = None
+_origin_pid = None
+_origin_lock = threading.Lock()
+
+
+def origin():
+    """Returns identifier of events published by current process, so the
+    LISTEN relay doesn't deliver them twice. Made per process, workers
+    forked from uwsgi master get their own.
+    """
+    global _origin, _origin_pid
+    pid = os.getpid()
+    if _origin_pid != pid:
+        with _origin_lock:
+            if _origin_pid != pid:
+                _origin = '{}:{}'.format(pid, uuid.uuid4().hex)
+                _origin_pid = pid
+    return _origin
+
+
+def event_to_json(event):
+    return json.dumps(event._asdict())
+
+
+def format_sse(event):
+    """Formats event as server-sent event message"""
+    return 'event: {}\ndata: {}\n\n'.format(event.type, event_to_json(event))
+
+
+class Subscription:
+    """Bounded queue of events for one connected client.
+
+    Parameters
+    ----------
+    broker : Broker
+        Broker subscription belongs to.
+    types : iterable or None
+        Event types subscriber is interested in, all types if None.
+    maxsize : int
+        Maximum number of pending events, once exceeded the subscription
+        is dropped.
+    """
+
+    def __init__(self, broker, types, maxsize):
+        self.broker = broker
+        self.types = frozenset(types or EVENT_TYPES)
+        self.dropped = False
+        self._queue = queue.Queue(maxsize)
+
+    def wants(self, event):
+        return event.type in self.types
+
+    def put(self, event):
+        """Enqueues event, returns False if subscriber is too slow"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped = True
+            return False
+        return True
+
+    def get(self, timeout=None):
+        """Returns next event, raises queue.Empty on timeout"""
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Fans published events out to subscriptions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, types=None, maxsize=None):
+        if maxsize is None:
+            maxsize = settings.EVENTS_QUEUE_SIZE
+        subscription = Subscription(self, types, maxsize)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        if settings.EVENTS_NOTIFY_CHANNEL and connection.vendor == 'postgresql':
+            relay.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Delivers event to subscriptions of this process"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event) and not subscription.put(event):
+                logger.info('Dropping slow events subscriber')
+                self.unsubscribe(subscription)
+
+
+class NotifyRelay:
+    """Relays events published by other workers through PostgreSQL
+    LISTEN/NOTIFY to the local broker.
+
+    Listener thread is started lazily, so workers that have no subscribers
+    never hold an extra connection.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._listen,
+                                            name='events-relay', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        import psycopg2
+
+        params = connection.get_connection_params()
+        conn = psycopg2.connect(**params)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'LISTEN {}'.format(settings.EVENTS_NOTIFY_CHANNEL)
+                )
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._deliver(conn.notifies.pop(0).payload)
+        except Exception:
+            logger.exception('Events relay stopped')
+        finally:
+            conn.close()
+
+    def _deliver(self, payload):
+        data = json.loads(payload)
+        if data.pop('origin', None) == origin():
+            return
+        self.broker.publish(Event(**data))
+
+
+broker = Broker()
+relay = NotifyRelay(broker)
+
+
+def publish(event):
+    """Publishes event once current transaction is committed.
+
+    On PostgreSQL the event is also sent with NOTIFY, which is transactional
+    as well, so other workers will see it only after commit.
+    """
+    channel = settings.EVENTS_NOTIFY_CHANNEL
+    if channel and connection.vendor == 'postgresql':
+        payload = dict(event._asdict(), origin=origin())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [channel, json.dumps(payload)])
+    transaction.on_commit(lambda: broker.publish(event))
@@ -0,0 +1,203 @@
+"""Streaming export of users directory.
+
+Users are read with server-side cursor (on PostgreSQL `QuerySet.iterator()`
+uses named cursors), joined with their groups by merging two cursors sorted
+by user id, so memory use doesn't depend on directory size.
+
+Exported fields are the fields `UserSerializer` exposes to the requesting
+user, values are converted by the serializer's own fields.
+"""
+import csv
+import io
+import json
+import zlib
+
+from .models import User
+
+# Approximate size of chunks yielded by exporters.
+CHUNK_SIZE = 64 * 1024
+
+ADDRESS_FIELDS = ('zip_code', 'country', 'city', 'district', 'street')
+GROUPS_SEPARATOR = ';'
+
+
+class UserExporter:
+    """Base class of users exporters.
+
+    Parameters
+    ----------
+    serializer : UserSerializer
+        Serializer instance, exported fields and their representation are
+        taken from it.
+    build_url : function
+        Function that builds user's url from username.
+    """
+    content_type = None
+    extension = None
+
+    def __init__(self, serializer, build_url):
+        self.fields = [name for name, field in serializer.fields.items()
+                       if not field.write_only]
+        self.serializer_fields = serializer.fields
+        self.build_url = build_url
+
+    def rows(self):
+        """Yields users representations as dicts"""
+        columns = ['id', 'username'] + [
+            name for name in self.fields
+            if name not in ('id', 'username', 'url', 'address', 'groups')
+        ]
+        with_address = 'address' in self.fields
+        with_groups = 'groups' in self.fields
+        if with_address:
+            columns += ['address__' + name for name in ADDRESS_FIELDS]
+
+        users = User.objects.order_by('id').values_list(*columns)
+        memberships = iter(())
+        if with_groups:
+            memberships = User.groups.through.objects.order_by(
+                'user_id', 'id'
+            ).values_list('user_id', 'group__name').iterator()
+
+        scalar_fields = [(index, name, self.serializer_fields[name])
+                         for index, name in enumerate(columns)
+                         if name in self.serializer_fields]
+        address_start = len(columns) - len(ADDRESS_FIELDS)
+        membership = next(memberships, None)
+
+        for values in users.iterator():
+            data = {name: None if values[index] is None
+                    else field.to_representation(values[index])
+                    for index, name, field in scalar_fields}
+            if 'url' in self.fields:
+                data['url'] = self.build_url(values[1])
+            if with_address:
+                address = values[address_start:]
+                if address[0] is None:
+                    data['address'] = None
+                else:
+                    data['address'] = dict(zip(ADDRESS_FIELDS, address))
+            if with_groups:
+                groups = []
+                # Skip memberships of users that were created after users
+                # cursor was opened.
+                while membership is not None and membership[0] < values[0]:
+                    membership = next(memberships, None)
+                while membership is not None and membership[0] == values[0]:
+                    groups.append(membership[1])
+                    membership = next(memberships, None)
+                data['groups'] = groups
+            yield {name: data[name] for name in self.fields}
+
+    def chunks(self):
+        """Yields exported data as strings of about CHUNK_SIZE length"""
+        buffer = io.StringIO()
+        self.write_header(buffer)
+        for row in self.rows():
+            self.write_row(buffer, row)
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def write_header(self, buffer):
+        pass
+
+    def write_row(self, buffer, row):
+        raise NotImplementedError
+
+
+class CSVExporter(UserExporter):
+    """Exports users as CSV, address is flattened into `address.<field>`
+    columns and groups names are joined with semicolon.
+    """
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.columns = []
+        for name in self.fields:
+            if name == 'address':
+                self.columns += ['address.' + field for field in ADDRESS_FIELDS]
+            else:
+                self.columns.append(name)
+
+    def write_header(self, buffer):
+        self.writer = csv.writer(buffer)
+        self.writer.writerow(self.columns)
+
+    def write_row(self, buffer, row):
+        values = []
+        for name in self.fields:
+            value = row[name]
+            if name == 'address':
+                value = value or {}
+                values += [value.get(field) for field in ADDRESS_FIELDS]
+            elif name == 'groups':
+                values.append(GROUPS_SEPARATOR.join(value))
+            else:
+                values.append(value)
+        self.writer.writerow(values)
+
+
+class NDJSONExporter(UserExporter):
+    """Exports users as newline delimited JSON, one user per line in
+    the same format API returns.
+    """
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def write_row(self, buffer, row):
+        buffer.write(json.dumps(row, ensure_ascii=False))
+        buffer.write('\n')
+
+
+EXPORTERS = {
+    'csv': CSVExporter,
+    'ndjson': NDJSONExporter,
+}
+
+
+def encode(chunks, encoding='utf-8'):
+    for chunk in chunks:
+        yield chunk.encode(encoding)
+
+
+def gzip(chunks):
+    """Compresses stream of bytes chunks in gzip format"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """Returns whether Accept-Encoding header value allows gzip, explicitly
+    or by "*", with non-zero quality.
+
+    Examples
+    -------
+    >>> accepts_gzip('gzip;q=0, deflate')
+    False
+    >>> accepts_gzip('br, *;q=0.5')
+    True
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
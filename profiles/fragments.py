@@ -0,0 +1,158 @@
+"""Cache of rendered JSON of single users and groups.
+
+List responses rendered by JSONRenderer are assembled by joining cached
+fragments of their objects, only objects missing in the cache are
+serialized. Fragments of an object are kept under one key, with variant
+per permission level, URL base and format, which change rendered fields
+and URLs, and per version fields of the view such as `last_update`.
+
+Fragments are tagged with version of their object, kept in the cache
+under its own key. Object gets new version, and its fragments are
+deleted, when it's saved, deleted or its address or membership changes,
+see profiles.signals. Version is read right after the objects, so
+requests which read them before a change don't cache their fragments
+under the new version, unless the change is committed between the two
+reads. FRAGMENT_CACHE must be shared by workers, otherwise other workers,
+like changes made without signals (queryset `update()`, import), see them
+after FRAGMENT_CACHE_TIMEOUT.
+"""
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import metrics
+from .instrumentation import phase
+from .permissions import permission_level
+
+
+def get_cache():
+    return caches[settings.FRAGMENT_CACHE]
+
+
+def fragment_key(model, pk):
+    return 'fragment:{}:{}'.format(model._meta.model_name, pk)
+
+
+def version_key(model, pk):
+    return 'fragment-version:{}:{}'.format(model._meta.model_name, pk)
+
+
+def invalidate(model, pks):
+    """Gives model objects with given primary keys new version and
+    deletes their fragments.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    _renew(model, pks)
+    if connection.in_atomic_block:
+        # Old data could be cached again before the change is committed.
+        transaction.on_commit(lambda: _renew(model, pks))
+
+
+def _renew(model, pks):
+    cache = get_cache()
+    cache.delete_many([fragment_key(model, pk) for pk in pks])
+    # Versions outlive fragments cached by requests which read the old
+    # ones, objects without version have empty one.
+    cache.set_many({version_key(model, pk): uuid.uuid4().hex for pk in pks},
+                   settings.FRAGMENT_CACHE_TIMEOUT * 2)
+
+
+class AssembledResponse(Response):
+    """Response with JSON content assembled by the view, so it's rendered
+    from the start. `data` is parsed from the content on access, e.g. by
+    batch requests.
+    """
+
+    def __init__(self, content, content_type, **kwargs):
+        super().__init__(content_type=content_type, **kwargs)
+        self['Content-Type'] = content_type
+        self.content = content
+
+    @property
+    def data(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    @data.setter
+    def data(self, value):
+        # Content is the data, None set by Response is ignored.
+        pass
+
+
+class FragmentCacheMixin:
+    """Assembles JSON of list action from cached fragments of objects.
+
+    `fragment_fields` are attributes of objects which change whenever
+    their representation does, they are part of fragment variant.
+    """
+    fragment_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if (not settings.FRAGMENT_CACHE_ENABLED or
+                not isinstance(renderer, JSONRenderer) or
+                self.paginator is not None):
+            return super().list(request, *args, **kwargs)
+        context = self.get_renderer_context()
+        if renderer.get_indent(request.accepted_media_type,
+                               context) is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        with phase('queryset'):
+            objects = list(queryset)
+        content = self.join_fragments(queryset.model, objects, renderer,
+                                      context)
+        return AssembledResponse(content, renderer.media_type)
+
+    def get_fragment_variant(self, obj):
+        request = self.request
+        return (
+            permission_level(request.user),
+            request.build_absolute_uri('/'),
+            self.format_kwarg,
+            request.query_params.get(api_settings.URL_FORMAT_OVERRIDE),
+        ) + tuple(getattr(obj, name) for name in self.fragment_fields)
+
+    def join_fragments(self, model, objects, renderer, context):
+        """Returns JSON array of objects made of their fragments"""
+        cache = get_cache()
+        keys = [fragment_key(model, obj.pk) for obj in objects]
+        variants = [self.get_fragment_variant(obj) for obj in objects]
+        stored = cache.get_many(
+            keys + [version_key(model, obj.pk) for obj in objects])
+        entries = []
+        for obj, key in zip(objects, keys):
+            version = stored.get(version_key(model, obj.pk), '')
+            entry = stored.get(key)
+            if entry is None or entry[0] != version:
+                entry = (version, {})
+            entries.append(entry)
+        fragments = [entry[1].get(variant)
+                     for entry, variant in zip(entries, variants)]
+        missing = [index for index, fragment in enumerate(fragments)
+                   if fragment is None]
+        metrics.CACHE_REQUESTS.inc(('fragments', 'hit'),
+                                   len(objects) - len(missing))
+        metrics.CACHE_REQUESTS.inc(('fragments', 'miss'), len(missing))
+        if missing:
+            serializer = self.get_serializer(
+                [objects[index] for index in missing], many=True)
+            data = serializer.data
+            with phase('render'):
+                for index, item in zip(missing, data):
+                    fragments[index] = renderer.render(
+                        item, self.request.accepted_media_type, context)
+            updated = {}
+            for index in missing:
+                entries[index][1][variants[index]] = fragments[index]
+                updated[keys[index]] = entries[index]
+            cache.set_many(updated, settings.FRAGMENT_CACHE_TIMEOUT)
+        separator = b',' if renderer.compact else b', '
+        return b'[' + separator.join(fragments) + b']'
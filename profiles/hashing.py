@@ -0,0 +1,174 @@
+"""Password hashing in bounded thread pool.
+
+PBKDF2 and other hashers are CPU bound and release the GIL, so a burst of
+logins or user creations would keep every request thread hashing. Here at
+most PASSWORD_HASHING_WORKERS passwords are hashed at once per process and
+at most PASSWORD_HASHING_QUEUE_SIZE more wait for a thread. Single
+threaded workers never fill their own pool, so operations of all workers of
+the node are also counted in memory-mapped `settings.PASSWORD_HASHING_FILE`
+(see profiles.admission) and limited to PASSWORD_HASHING_NODE_LIMIT.
+Without the file operations are counted per process. Operations beyond the
+limits are rejected with 503, so hashing can't starve other endpoints.
+Upgrading of outdated hashes on login is done in background, after the
+response.
+
+Authentication backend is also used by Django admin login, which can't
+answer 503, so there a rejected login fails like one with wrong password.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from . import metrics
+from .admission import InFlight
+from .models import User
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password operations, try again later.'
+    default_code = 'hashing_busy'
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        # Sent in Retry-After header by REST framework exception handler.
+        self.wait = settings.PASSWORD_HASHING_RETRY_AFTER
+
+
+class HashingPool:
+    """Thread pool rejecting tasks when all threads and queue are busy or
+    the node limit of tasks is reached.
+    """
+
+    def __init__(self, workers, queue_size, node_limit=None, path=None,
+                 processes=256):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.node_limit = node_limit
+        self.in_flight = InFlight(['hashing'], path, processes)
+
+    def acquire(self):
+        if not self.slots.acquire(blocking=False):
+            return False
+        # Counts are read without locking, so the node limit is approximate.
+        if (self.node_limit is not None and
+                self.in_flight.totals()['hashing'] >= self.node_limit):
+            self.slots.release()
+            return False
+        self.in_flight.add('hashing', 1)
+        return True
+
+    def release(self):
+        self.in_flight.add('hashing', -1)
+        self.slots.release()
+
+    def submit(self, fn, *args):
+        """Schedules call of fn, returns Future or None if pool is full"""
+        if not self.acquire():
+            return None
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda future: self.release())
+        return future
+
+    def run(self, fn, *args):
+        """Returns result of fn called in pool, raises HashingBusy if pool
+        is full.
+        """
+        future = self.submit(fn, *args)
+        if future is None:
+            metrics.PASSWORD_HASHING.inc(('rejected',))
+            raise HashingBusy()
+        metrics.PASSWORD_HASHING.inc(('accepted',))
+        return future.result()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns hashing pool of current process"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool_pid != pid:
+        with _pool_lock:
+            if _pool_pid != pid:
+                _pool = HashingPool(settings.PASSWORD_HASHING_WORKERS,
+                                    settings.PASSWORD_HASHING_QUEUE_SIZE,
+                                    settings.PASSWORD_HASHING_NODE_LIMIT,
+                                    settings.PASSWORD_HASHING_FILE,
+                                    settings.ADMISSION_MAX_PROCESSES)
+                _pool_pid = pid
+    return _pool
+
+
+def make_password(password):
+    """Returns hash of password made by default hasher"""
+    return get_pool().run(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """Returns whether password is correct for user. If user's hash is made
+    by outdated hasher, it's replaced in background.
+    """
+    encoded = user.password
+
+    def setter(password):
+        # Called in pool, so not waiting for the rehash. If the pool is
+        # full, hash is upgraded on one of the next logins.
+        get_pool().submit(rehash, user.pk, encoded, password)
+
+    return get_pool().run(hashers.check_password, password, encoded, setter)
+
+
+def rehash(pk, encoded, password):
+    try:
+        # Password could be changed meanwhile.
+        User.objects.filter(pk=pk, password=encoded).update(
+            password=hashers.make_password(password))
+    finally:
+        connections.close_all()
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend hashing passwords in pool. HashingBusy is raised only
+    for REST framework requests, other logins are just refused.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(request, username, password, **kwargs)
+        except HashingBusy:
+            if isinstance(request, Request):
+                raise
+            # Stops authentication by other backends, login fails.
+            raise PermissionDenied
+
+    def _authenticate(self, request, username=None, password=None,
+                      **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hashing anyway, so response time doesn't reveal whether user
+            # exists.
+            make_password(password)
+        else:
+            if (check_password(user, password) and
+                    self.user_can_authenticate(user)):
+                return user
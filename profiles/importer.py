@@ -0,0 +1,457 @@
+"""Bulk import of users directory.
+
+Accepts files in the formats produced by `export_users` (CSV or newline
+delimited JSON, optionally gzipped), plus optional `password` column with
+raw passwords. Passwords are hashed in a process pool.
+
+On PostgreSQL rows are copied into a temporary staging table and merged
+into addresses, users and memberships tables with a few set based
+statements. Other backends fall back to chunked `bulk_create`.
+
+Import is additive: existing users (matched by username) are updated,
+their memberships are extended but never removed. Missing groups are
+created. Signals are not sent for imported objects.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date
+
+from .export import ADDRESS_FIELDS, GROUPS_SEPARATOR
+from .models import Address, User
+
+REQUIRED_FIELDS = ('username', 'email', 'first_name', 'last_name',
+                   'birthday')
+
+FORMATS = ('csv', 'ndjson')
+
+# Usernames reachable by lookups of API URLs, see profiles.urls.
+USERNAME_PATTERN = re.compile(r'[\w-]+\Z')
+
+
+class InvalidRowsError(Exception):
+    """Raised when import file contains invalid rows"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(
+            'line {}: {}'.format(line, error) for line, error in errors
+        ))
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    return 'ndjson'
+
+
+def read_rows(path, format=None):
+    """Yields (line number, record) pairs from import file.
+
+    NDJSON records are yielded as text and decoded by `clean_row`, so
+    malformed lines are reported as invalid rows.
+    """
+    format = format or detect_format(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if format == 'csv':
+            for line, record in enumerate(csv.DictReader(f), 2):
+                yield line, _from_csv(record)
+        else:
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    yield line, text
+
+
+def _from_csv(record):
+    """Converts flat CSV record to the shape of NDJSON record"""
+    address = {field: record.pop('address.' + field, None)
+               for field in ADDRESS_FIELDS}
+    if any(address.values()):
+        record['address'] = address
+    groups = record.get('groups')
+    record['groups'] = groups.split(GROUPS_SEPARATOR) if groups else []
+    if record.get('is_active'):
+        record['is_active'] = record['is_active'].lower() in ('true', '1')
+    else:
+        record.pop('is_active', None)
+    return record
+
+
+def clean_row(record):
+    """Validates record and returns row ready for import.
+
+    Raises ValueError with description of the first found problem.
+    """
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as exc:
+            raise ValueError('invalid JSON: {}'.format(exc))
+    if not isinstance(record, dict):
+        raise ValueError('record must be JSON object')
+    row = {}
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        if not value:
+            raise ValueError('{} is required'.format(field))
+        row[field] = value
+    for field in ('username', 'email', 'first_name', 'last_name'):
+        row[field] = clean_field(User, field, row[field])
+    if not USERNAME_PATTERN.match(row['username']):
+        raise ValueError('username may contain only letters, digits, _ and '
+                         '- characters')
+    if parse_date(row['birthday']) is None:
+        raise ValueError('birthday must be date in YYYY-MM-DD format')
+    row['is_active'] = record.get('is_active')
+    row['password'] = record.get('password') or None
+
+    address = record.get('address') or {}
+    for field in ADDRESS_FIELDS:
+        row[field] = address.get(field) or None
+    if address:
+        missing = [field for field in ADDRESS_FIELDS if not row[field]]
+        if missing:
+            raise ValueError('address is incomplete, missing: {}'.format(
+                ', '.join(missing)))
+        try:
+            Address._meta.get_field('zip_code').run_validators(
+                row['zip_code']
+            )
+        except ValidationError:
+            raise ValueError('zip_code must contain 6 digits')
+        for field in ADDRESS_FIELDS:
+            row[field] = clean_field(Address, field, row[field])
+    row['groups'] = [clean_field(Group, 'name', name)
+                     for name in record.get('groups') or () if name]
+    return row
+
+
+def clean_field(model, name, value):
+    """Returns value cleaned by model field, raises ValueError if it's
+    invalid, e.g. too long for the column.
+    """
+    try:
+        return model._meta.get_field(name).clean(value, None)
+    except ValidationError as exc:
+        raise ValueError('{}: {}'.format(name, ' '.join(exc.messages)))
+
+
+def taken_emails(chunk):
+    """Returns (line, error) pairs of rows with email of another existing
+    user.
+    """
+    owners = dict(User.objects.filter(
+        email__in=[row['email'] for row in chunk]
+    ).values_list('email', 'username'))
+    return [
+        (row['line'], 'email {} is taken by user {}'.format(
+            row['email'], owners[row['email']]))
+        for row in chunk
+        if owners.get(row['email'], row['username']) != row['username']
+    ]
+
+
+def chunks(rows, size):
+    """Validates rows and groups them in lists of given size.
+
+    Emails must be unique in the file and among existing users.
+    Raises InvalidRowsError if any row is invalid, after reading whole
+    input, so all problems are reported at once.
+    """
+    chunk, errors = [], []
+    emails = {}
+    for line, record in rows:
+        try:
+            row = clean_row(record)
+        except ValueError as exc:
+            errors.append((line, str(exc)))
+            continue
+        owner = emails.setdefault(row['email'], (row['username'], line))
+        if owner[0] != row['username']:
+            errors.append((line, 'email {} is used by {} on line {}'.format(
+                row['email'], *owner)))
+            continue
+        row['line'] = line
+        chunk.append(row)
+        if len(chunk) == size:
+            errors.extend(taken_emails(chunk))
+            if not errors:
+                yield chunk
+            chunk = []
+    if chunk:
+        errors.extend(taken_emails(chunk))
+    if errors:
+        raise InvalidRowsError(sorted(errors))
+    if chunk:
+        yield chunk
+
+
+class UserImporter:
+    """Imports rows in chunks, hashing passwords in process pool.
+
+    Parameters
+    ----------
+    chunk_size : int
+        Number of rows hashed and written at once.
+    processes : int or None
+        Size of password hashing pool, number of CPUs by default.
+    """
+
+    def __init__(self, chunk_size=10000, processes=None):
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.pool = None
+
+    def run(self, rows):
+        """Imports rows, returns dict with number of created and updated
+        users.
+        """
+        self.pool = None
+        try:
+            with transaction.atomic():
+                self.begin()
+                for chunk in chunks(rows, self.chunk_size):
+                    self.hash_passwords(chunk)
+                    self.write_chunk(chunk)
+                return self.finish()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+    def hash_passwords(self, chunk):
+        with_password = [row for row in chunk if row['password']]
+        if not with_password:
+            return
+        if self.pool is None:
+            # Started on the first password, imports without them don't
+            # pay for the processes.
+            self.pool = ProcessPoolExecutor(max_workers=self.processes)
+        workers = self.processes or os.cpu_count() or 1
+        hashed = self.pool.map(make_password,
+                               [row['password'] for row in with_password],
+                               chunksize=max(1, len(with_password) // workers))
+        for row, password in zip(with_password, hashed):
+            row['password'] = password
+
+    def begin(self):
+        pass
+
+    def write_chunk(self, chunk):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+
+class PostgresUserImporter(UserImporter):
+    """Copies rows into temporary staging table and merges them with
+    set based SQL.
+    """
+
+    staging_table = 'profiles_import_staging'
+    staging_columns = (
+        ('line', 'integer'),
+        ('username', 'text'),
+        ('email', 'text'),
+        ('first_name', 'text'),
+        ('last_name', 'text'),
+        ('birthday', 'date'),
+        ('is_active', 'boolean'),
+        ('password', 'text'),
+    ) + tuple((field, 'text') for field in ADDRESS_FIELDS) + (
+        ('groups', 'jsonb'),
+    )
+
+    def begin(self):
+        # Temporary table is private to the connection, so concurrent
+        # imports don't collide, and it's dropped with import transaction.
+        columns = ', '.join('{} {}'.format(name, type)
+                            for name, type in self.staging_columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE {} ({}) ON COMMIT DROP'.format(
+                    self.staging_table, columns))
+
+    def write_chunk(self, chunk):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        names = [name for name, _ in self.staging_columns]
+        for row in chunk:
+            values = [row[name] for name in names[:-1]]
+            values.append(json.dumps(row['groups']))
+            writer.writerow(values)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                    self.staging_table, ', '.join(names)),
+                buffer
+            )
+
+    def finish(self):
+        tables = {
+            'staging': self.staging_table,
+            'address': Address._meta.db_table,
+            'user': User._meta.db_table,
+            'group': Group._meta.db_table,
+            'membership': User.groups.through._meta.db_table,
+        }
+        address_match = ' AND '.join(
+            'a.{0} = s.{0}'.format(field) for field in ADDRESS_FIELDS
+        )
+        address_fields = ', '.join(ADDRESS_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {staging}'.format(**tables))
+            cursor.execute("""
+                INSERT INTO {address} ({fields})
+                SELECT DISTINCT {fields} FROM {staging} s
+                WHERE s.zip_code IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM {address} a WHERE {match}
+                )
+            """.format(fields=address_fields, match=address_match, **tables))
+            # Last row wins if username occurs multiple times. Rows without
+            # password get unusable one, existing users keep their password.
+            cursor.execute("""
+                WITH upserted AS (
+                    INSERT INTO {user} (
+                        password, is_superuser, username, first_name,
+                        last_name, email, is_staff, is_active, date_joined,
+                        birthday, address_id, last_update
+                    )
+                    SELECT DISTINCT ON (s.username)
+                        COALESCE(s.password, '!' || md5(random()::text)),
+                        false, s.username, s.first_name, s.last_name,
+                        s.email, false, COALESCE(s.is_active, true), now(),
+                        s.birthday, a.id, now()
+                    FROM {staging} s
+                    LEFT JOIN (
+                        SELECT min(id) AS id, {fields} FROM {address}
+                        GROUP BY {fields}
+                    ) a ON {match}
+                    ORDER BY s.username, s.line DESC
+                    ON CONFLICT (username) DO UPDATE SET
+                        password = CASE
+                            WHEN EXCLUDED.password LIKE '!%'
+                            THEN {user}.password
+                            ELSE EXCLUDED.password
+                        END,
+                        first_name = EXCLUDED.first_name,
+                        last_name = EXCLUDED.last_name,
+                        email = EXCLUDED.email,
+                        is_active = EXCLUDED.is_active,
+                        birthday = EXCLUDED.birthday,
+                        address_id = COALESCE(EXCLUDED.address_id,
+                                              {user}.address_id),
+                        last_update = EXCLUDED.last_update
+                    RETURNING xmax = 0 AS inserted
+                )
+                SELECT count(*) FILTER (WHERE inserted),
+                       count(*) FILTER (WHERE NOT inserted)
+                FROM upserted
+            """.format(fields=address_fields, match=address_match, **tables))
+            created, updated = cursor.fetchone()
+            cursor.execute("""
+                INSERT INTO {group} (name)
+                SELECT DISTINCT jsonb_array_elements_text(groups)
+                FROM {staging}
+                ON CONFLICT (name) DO NOTHING
+            """.format(**tables))
+            cursor.execute("""
+                INSERT INTO {membership} (user_id, group_id)
+                SELECT DISTINCT u.id, g.id
+                FROM {staging} s
+                CROSS JOIN jsonb_array_elements_text(s.groups) AS n(name)
+                JOIN {user} u ON u.username = s.username
+                JOIN {group} g ON g.name = n.name
+                ON CONFLICT DO NOTHING
+            """.format(**tables))
+        return {'created': created, 'updated': updated}
+
+
+class ORMUserImporter(UserImporter):
+    """Fallback importer for databases without COPY support"""
+
+    def begin(self):
+        self.addresses = {}
+        self.groups = {group.name: group for group in Group.objects.all()}
+        self.stats = {'created': 0, 'updated': 0}
+
+    def get_address(self, row):
+        if row['zip_code'] is None:
+            return None
+        key = tuple(row[field] for field in ADDRESS_FIELDS)
+        if key not in self.addresses:
+            address = Address.objects.filter(
+                **dict(zip(ADDRESS_FIELDS, key))
+            ).order_by('id').first()
+            if address is None:
+                address = Address.objects.create(
+                    **dict(zip(ADDRESS_FIELDS, key))
+                )
+            self.addresses[key] = address
+        return self.addresses[key]
+
+    def write_chunk(self, chunk):
+        # Last row wins if username occurs multiple times.
+        rows = {row['username']: row for row in chunk}
+        existing = {user.username: user for user in
+                    User.objects.filter(username__in=list(rows))}
+        new_users = []
+        for username, row in rows.items():
+            user = existing.get(username)
+            if user is None:
+                user = User(username=username)
+                new_users.append(user)
+            if row['password']:
+                user.password = row['password']
+            elif user.pk is None:
+                user.set_unusable_password()
+            for field in ('email', 'first_name', 'last_name', 'birthday'):
+                setattr(user, field, row[field])
+            if row['is_active'] is not None:
+                user.is_active = row['is_active']
+            user.address = self.get_address(row) or user.address
+            if user.pk is not None:
+                user.save()
+        User.objects.bulk_create(new_users)
+        self.stats['created'] += len(new_users)
+        self.stats['updated'] += len(existing)
+
+        user_ids = dict(User.objects.filter(
+            username__in=list(rows)
+        ).values_list('username', 'id'))
+        Membership = User.groups.through
+        present = set(Membership.objects.filter(
+            user_id__in=user_ids.values()
+        ).values_list('user_id', 'group_id'))
+        memberships = []
+        for username, row in rows.items():
+            for name in row['groups']:
+                if name not in self.groups:
+                    self.groups[name] = Group.objects.create(name=name)
+                pair = (user_ids[username], self.groups[name].id)
+                if pair not in present:
+                    present.add(pair)
+                    memberships.append(Membership(user_id=pair[0],
+                                                  group_id=pair[1]))
+        Membership.objects.bulk_create(memberships)
+
+    def finish(self):
+        return self.stats
+
+
+def get_importer(**kwargs):
+    if connection.vendor == 'postgresql':
+        return PostgresUserImporter(**kwargs)
+    return ORMUserImporter(**kwargs)
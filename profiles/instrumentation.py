@@ -0,0 +1,187 @@
+"""Per-request performance instrumentation.
+
+`ServerTimingMiddleware` collects timings of the request being processed in
+thread local `Timings`, views record their phases with `phase()` through
+`InstrumentedViewMixin`, or `InstrumentedGenericViewMixin` for generic
+views. Phase durations exclude time spent in database queries made inside
+them, which is reported separately as "db", so it's easy to tell whether
+endpoint is database or Python bound.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db.models import QuerySet
+
+from . import allocations, tracing
+
+_local = threading.local()
+
+
+class Timings:
+    """Durations of request phases and database queries in seconds"""
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.db_time = 0
+        self.db_queries = 0
+
+    def add(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0) + duration
+
+    def record_query(self, execute, sql, params, many, context):
+        """Execute wrapper counting queries and their time"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def server_timing(self, total):
+        """Returns value of Server-Timing header, durations in milliseconds
+
+        Examples
+        -------
+        >>> timings = Timings()
+        >>> timings.add('auth', 0.0012)
+        >>> timings.server_timing(0.01)
+        'auth;dur=1.2, db;dur=0.0;desc="0 queries", total;dur=10.0'
+        """
+        metrics = ['{};dur={:.1f}'.format(name, duration * 1000)
+                   for name, duration in self.phases.items()]
+        metrics.append('db;dur={:.1f};desc="{} queries"'.format(
+            self.db_time * 1000, self.db_queries))
+        metrics.append('total;dur={:.1f}'.format(total * 1000))
+        return ', '.join(metrics)
+
+
+def current():
+    """Returns timings of request processed in current thread or None"""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect():
+    """Collects timings of the block, yields Timings instance"""
+    previous = current()
+    _local.timings = timings = Timings()
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def phase(name):
+    """Records duration of the block as phase of current request, as span
+    if request is traced and its allocations if they're profiled.
+    """
+    timings = current()
+    if timings is None:
+        with tracing.span(name, 'phase'), allocations.measure(name):
+            yield
+        return
+    db_time = timings.db_time
+    start = time.perf_counter()
+    try:
+        with tracing.span(name, 'phase'), allocations.measure(name):
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        timings.add(name, duration - (timings.db_time - db_time))
+
+
+class TimedPermission:
+    """Proxy recording checks of wrapped permission as separate phase"""
+
+    def __init__(self, permission):
+        self.permission = permission
+        self.phase = 'perm-{}'.format(type(permission).__name__)
+
+    def has_permission(self, request, view):
+        with phase(self.phase):
+            return self.permission.has_permission(request, view)
+
+    def has_object_permission(self, request, view, obj):
+        with phase(self.phase):
+            return self.permission.has_object_permission(request, view, obj)
+
+    def __getattr__(self, name):
+        return getattr(self.permission, name)
+
+
+class InstrumentedViewMixin:
+    """Records authentication, permissions and rendering phases of API
+    view.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with tracing.span(type(self).__name__, 'view'):
+            return super().dispatch(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def get_permissions(self):
+        return [TimedPermission(permission)
+                for permission in super().get_permissions()]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args,
+                                             **kwargs)
+        # Response is rendered by Django after view has returned, timing
+        # renderer of this request instead of the view.
+        renderer = getattr(response, 'accepted_renderer', None)
+        if renderer is not None:
+            render = renderer.render
+
+            def timed_render(*args, **kwargs):
+                with phase('render'):
+                    return render(*args, **kwargs)
+
+            renderer.render = timed_render
+        return response
+
+
+class InstrumentedGenericViewMixin(InstrumentedViewMixin):
+    """Records also queryset evaluation and serialization phases of generic
+    API view.
+    """
+
+    def get_queryset(self):
+        with tracing.span('get_queryset', 'view'):
+            return super().get_queryset()
+
+    def get_object(self):
+        with phase('queryset'):
+            return super().get_object()
+
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            # Evaluating queryset here, otherwise it would be evaluated
+            # during serialization.
+            with phase('queryset'):
+                args = (list(args[0]),) + args[1:]
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            with phase('serialize'):
+                return to_representation(instance)
+
+        serializer.to_representation = timed_to_representation
+        child = getattr(serializer, 'child', None)
+        if child is not None and tracing.current() is not None:
+            # Tracing serialization of every object of the list.
+            child_to_representation = child.to_representation
+            name = '{}.to_representation'.format(type(child).__name__)
+
+            def traced_to_representation(instance):
+                with tracing.span(name, 'serializer'):
+                    return child_to_representation(instance)
+
+            child.to_representation = traced_to_representation
+        return serializer
@@ -0,0 +1,349 @@
+"""Closed-loop load generator replaying the bundled frontend traffic.
+
+Every virtual user logs in through `api-auth` and then repeatedly performs
+one of the frontend's actions, picked by weight, waiting for each response
+before sending next request. Requests are sent with a minimal asyncio
+HTTP/1.1 client, so no third party packages or services are needed.
+"""
+import asyncio
+import json
+import random
+import ssl
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlencode, urlsplit
+
+# Actions of the frontend and their default weights.
+DEFAULT_MIX = {
+    # Users page: users table and active users (dest/script2.js).
+    'users-page': 30,
+    # Search box.
+    'search': 25,
+    # User's details.
+    'user-detail': 15,
+    # Groups page (dest/groups/script.js).
+    'groups-page': 10,
+    # Group editing dialog: group details and all users.
+    'group-detail': 5,
+    # User's groups editing dialog, submits unchanged groups.
+    'user-groups-edit': 10,
+    # Group's users editing dialog, submits unchanged users.
+    'group-edit': 5,
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """Keep-alive HTTP/1.1 connection to the server"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.secure = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        self.netloc = parts.netloc
+        self.reader = self.writer = None
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.secure else None
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=context
+        )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        """Sends request and returns (status, body) pair.
+
+        Request is retried once on fresh connection if server closed idle
+        keep-alive connection before responding.
+        """
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self.connect()
+            try:
+                return await self._send(method, path, headers or {}, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused or attempt:
+                    raise
+
+    async def _send(self, method, path, headers, body):
+        lines = ['{} {} HTTP/1.1'.format(method, path),
+                 'Host: {}'.format(self.netloc),
+                 'Connection: keep-alive',
+                 'Content-Length: {}'.format(len(body))]
+        lines += ['{}: {}'.format(name, value)
+                  for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+                          + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by server')
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      response_headers.get('connection', '').lower() != 'close')
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(
+                int(response_headers['content-length'])
+            )
+        else:
+            content = await self.reader.read()
+            keep_alive = False
+        if not keep_alive:
+            self.close()
+        return int(status), content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Skip trailers.
+                while (await self.reader.readline()) not in (b'\r\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+
+class Stats:
+    """Collects latencies of requests grouped by endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = self.finished = None
+
+    def record(self, endpoint, latency, ok):
+        self.latencies[endpoint].append(latency)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self):
+        """Returns dict with throughput and latency percentiles in
+        milliseconds for every endpoint and in total.
+        """
+        elapsed = self.finished - self.started
+        everything = []
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            endpoints[endpoint] = self._summary(latencies, elapsed)
+            endpoints[endpoint]['errors'] = self.errors[endpoint]
+        total = self._summary(everything, elapsed)
+        total['errors'] = sum(self.errors.values())
+        return {'duration': elapsed, 'total': total, 'endpoints': endpoints}
+
+    @staticmethod
+    def _summary(latencies, elapsed):
+        latencies = sorted(latencies)
+        summary = {'requests': len(latencies),
+                   'throughput': len(latencies) / elapsed if elapsed else 0}
+        for p in PERCENTILES:
+            summary['p{}'.format(p)] = percentile(latencies, p) * 1000
+        return summary
+
+
+def percentile(values, p):
+    """Returns p-th percentile of sorted values using nearest-rank method
+
+    Examples
+    -------
+    >>> percentile([1, 2, 3, 4], 50)
+    2
+    >>> percentile([], 99)
+    0
+    """
+    if not values:
+        return 0
+    rank = max(1, -(-p * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+class VirtualUser:
+    """Logs in and performs weighted frontend actions in a loop"""
+
+    def __init__(self, runner, rng):
+        self.runner = runner
+        self.rng = rng
+        self.connection = Connection(runner.url)
+        self.token = None
+
+    async def call(self, endpoint, method, path, data=None, form=False):
+        """Sends request and records its latency under endpoint label"""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = 'Token ' + self.token
+        body = b''
+        if data is not None:
+            if form:
+                body = urlencode(data).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(data).encode()
+                headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            status, content = await self.connection.request(
+                method, path, headers, body
+            )
+        except (OSError, asyncio.IncompleteReadError):
+            self.runner.stats.record(endpoint, time.perf_counter() - start,
+                                     False)
+            raise HTTPError('{} {} failed'.format(method, path))
+        self.runner.stats.record(endpoint, time.perf_counter() - start,
+                                 status < 400)
+        if status >= 400:
+            raise HTTPError('{} {} returned {}'.format(method, path, status))
+        return json.loads(content.decode()) if content else None
+
+    async def login(self):
+        data = await self.call('POST /api/api-auth/', 'POST',
+                               '/api/api-auth/', self.runner.credentials,
+                               form=True)
+        self.token = data['token']
+
+    async def run(self, deadline):
+        await self.login()
+        actions, weights = zip(*self.runner.mix.items())
+        while time.monotonic() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            try:
+                await getattr(self, action.replace('-', '_'))()
+            except HTTPError:
+                pass
+        self.connection.close()
+
+    def username(self):
+        return quote(self.rng.choice(self.runner.usernames))
+
+    def group(self):
+        return quote(self.rng.choice(self.runner.groups))
+
+    async def users_page(self):
+        await self.call('GET /api/users/', 'GET', '/api/users/')
+        await self.call('GET /api/users/search?is_active', 'GET',
+                        '/api/users/search?is_active=true')
+
+    async def search(self):
+        term = self.rng.choice(self.runner.search_terms)
+        await self.call('GET /api/users/search?q', 'GET',
+                        '/api/users/search?' + urlencode({'q': term}))
+
+    async def user_detail(self):
+        await self.call('GET /api/users/<username>/', 'GET',
+                        '/api/users/{}/'.format(self.username()))
+
+    async def groups_page(self):
+        await self.call('GET /api/groups/', 'GET', '/api/groups/')
+
+    async def group_detail(self):
+        await self.call('GET /api/groups/<name>/', 'GET',
+                        '/api/groups/{}/'.format(self.group()))
+        await self.call('GET /api/users/', 'GET', '/api/users/')
+
+    async def user_groups_edit(self):
+        path = '/api/users/{}/groups/'.format(self.username())
+        await self.call('GET /api/groups/', 'GET', '/api/groups/')
+        data = await self.call('GET /api/users/<username>/groups/', 'GET',
+                               path)
+        await self.call('PUT /api/users/<username>/groups/', 'PUT', path,
+                        data)
+
+    async def group_edit(self):
+        path = '/api/groups/{}/'.format(self.group())
+        data = await self.call('GET /api/groups/<name>/', 'GET', path)
+        await self.call('PATCH /api/groups/<name>/', 'PATCH', path,
+                        {'users': data['users']})
+
+
+class LoadTest:
+    """Runs virtual users against server and collects statistics.
+
+    Parameters
+    ----------
+    url : str
+        Server base url, e.g. "http://127.0.0.1:8000".
+    username, password : str
+        Credentials virtual users log in with.
+    concurrency : int
+        Number of virtual users.
+    duration : float
+        Test duration in seconds.
+    mix : dict or None
+        Weights of actions, DEFAULT_MIX by default.
+    seed : int
+        Seed of actions choice.
+    """
+
+    def __init__(self, url, username, password, concurrency=10,
+                 duration=30, mix=None, seed=0):
+        self.url = url.rstrip('/')
+        self.credentials = {'username': username, 'password': password}
+        self.concurrency = concurrency
+        self.duration = duration
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX)
+                    .items() if weight > 0}
+        self.seed = seed
+        self.stats = Stats()
+
+    async def prepare(self):
+        """Fetches usernames, groups and search terms to use in requests"""
+        user = VirtualUser(self, random.Random(self.seed))
+        await user.login()
+        users = await user.call('setup', 'GET', '/api/users/')
+        groups = await user.call('setup', 'GET', '/api/groups/')
+        user.connection.close()
+        if len(users) < 2 or not groups:
+            raise HTTPError('Directory must contain users and groups')
+        # Virtual users don't edit their own account.
+        self.usernames = [data['username'] for data in users
+                          if data['username'] != self.credentials['username']]
+        self.groups = [data['name'] for data in groups]
+        self.search_terms = sorted(
+            {data['first_name'] for data in users} |
+            {data['email'] for data in users[:100]} |
+            {data['birthday'] for data in users[:100]}
+        )
+
+    async def run(self):
+        await self.prepare()
+        self.stats = Stats()
+        self.stats.started = time.monotonic()
+        deadline = self.stats.started + self.duration
+        users = [VirtualUser(self, random.Random(self.seed + i))
+                 for i in range(1, self.concurrency + 1)]
+        await asyncio.gather(*(user.run(deadline) for user in users))
+        self.stats.finished = time.monotonic()
+        return self.stats.report()
+
+
+def run(**kwargs):
+    """Runs load test in new event loop and returns report"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(LoadTest(**kwargs).run())
+    finally:
+        loop.close()
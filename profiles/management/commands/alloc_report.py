@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from profiles import allocations, benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Profiles memory allocations of serialization and rendering of '
+            'read endpoints on synthetic datasets of given sizes and '
+            'compares them with baseline. Runs against test database, so '
+            'existing data is never touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append',
+                            help='Dataset size: 1k, 100k, 1m or number of '
+                                 'users. May be repeated, 1k by default.')
+        parser.add_argument('--case', action='append', dest='cases',
+                            help='Profile only given case, may be repeated. '
+                                 'Cases: {}.'.format(
+                                     ', '.join(benchmarks.ALLOCATION_CASES)))
+        parser.add_argument('--top', type=int, default=allocations.TOP_LINES,
+                            help='Number of top allocating lines reported.')
+        parser.add_argument('--output', help='Write results as JSON to file.')
+        parser.add_argument('--baseline',
+                            help='Compare results with baseline file.')
+        parser.add_argument('--report',
+                            help='Write comparison report to file instead of '
+                                 'standard output.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep test database between runs.')
+
+    def handle(self, *args, **options):
+        scales = options['scale'] or ['1k']
+        results = {}
+        setup_test_environment()
+        try:
+            for scale in scales:
+                users = benchmarks.parse_scale(scale)
+                self.stderr.write('Profiling {} users dataset...'.format(
+                    users))
+                with benchmarks.test_database(users,
+                                              options['keepdb']) as build:
+                    results[scale] = benchmarks.run_allocations(
+                        users, options['cases'], build, options['top']
+                    )
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        report = allocations.compare(results, baseline)
+        for scale, cases in sorted(results.items()):
+            for case, phases in sorted(cases.items()):
+                for name, phase in phases.items():
+                    report += '\n{} {} {} top allocating lines:\n'.format(
+                        scale, case, name)
+                    report += '\n'.join(
+                        allocations.format_top(phase['top'])) + '\n'
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report, ending='')
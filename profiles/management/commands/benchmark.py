@@ -0,0 +1,74 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from profiles import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks API endpoints and serializers on synthetic datasets '
+            'of given sizes. Runs against test database, so existing data '
+            'is never touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append',
+                            help='Dataset size: 1k, 100k, 1m or number of '
+                                 'users. May be repeated, 1k by default.')
+        parser.add_argument('--case', action='append', dest='cases',
+                            help='Run only given case, may be repeated.')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Number of timed runs of every case.')
+        parser.add_argument('--output', help='Write results as JSON to file.')
+        parser.add_argument('--baseline',
+                            help='Compare results with baseline file, exit '
+                                 'with error on regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='Allowed relative increase of time and '
+                                 'memory over baseline.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep test database between runs.')
+
+    def handle(self, *args, **options):
+        scales = options['scale'] or ['1k']
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on, queries logging will inflate '
+                              'timings.')
+        results = {}
+        setup_test_environment()
+        try:
+            for scale in scales:
+                users = benchmarks.parse_scale(scale)
+                self.stderr.write('Running {} users benchmark...'.format(
+                    users))
+                with benchmarks.test_database(users,
+                                              options['keepdb']) as build:
+                    if not build:
+                        self.stderr.write('Reusing existing dataset.')
+                    results[scale] = benchmarks.run(
+                        users, options['repeat'], options['cases'], build
+                    )
+        finally:
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            sys.stdout.write(output + '\n')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = benchmarks.compare(results, baseline,
+                                             options['tolerance'])
+            for scale, case, metric, before, after in regressions:
+                self.stderr.write('{} {}: {} regressed from {} to {}'.format(
+                    scale, case, metric, before, after))
+            if regressions:
+                raise CommandError('{} regressions found'.format(
+                    len(regressions)))
@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+
+from profiles import export
+from profiles.models import User
+from profiles.serializers import UserSerializer
+from profiles.utils import url_template
+
+
+class Command(BaseCommand):
+    help = 'Exports users directory as CSV or newline delimited JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Output file, "-" for stdout.')
+        parser.add_argument('--format', choices=sorted(export.EXPORTERS),
+                            default='csv')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress output, implied if output file '
+                                 'ends with ".gz".')
+        parser.add_argument('--username',
+                            help='Export fields visible to this user, by '
+                                 'default only basic fields are exported.')
+        parser.add_argument('--base-url', default='',
+                            help='Prefix of users urls, e.g. '
+                                 '"https://example.com".')
+
+    def handle(self, *args, **options):
+        request = None
+        if options['username']:
+            request = HttpRequest()
+            try:
+                request.user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    'User "{}" does not exist'.format(options['username'])
+                )
+        serializer = UserSerializer(context={'request': request})
+
+        build_path = url_template('api:user-detail', 'username')
+        base_url = options['base_url'].rstrip('/')
+
+        def build_url(username):
+            return base_url + build_path(username)
+
+        exporter = export.EXPORTERS[options['format']](serializer, build_url)
+        content = export.encode(exporter.chunks())
+        output = options['output']
+        if options['gzip'] or output.endswith('.gz'):
+            content = export.gzip(content)
+
+        if output == '-':
+            stream = sys.stdout.buffer
+        else:
+            stream = open(output, 'wb')
+        try:
+            for chunk in content:
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
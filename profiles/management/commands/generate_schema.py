@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from profiles import schema
+
+
+class Command(BaseCommand):
+    help = ('Generates API schema served by docs. Run on deploy, so workers '
+            'do not generate it on the first request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output',
+                            help='Schema file, API_SCHEMA_FILE by default.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.API_SCHEMA_FILE
+        schema.dump_schema(path)
+        self.stdout.write('Schema written to {}'.format(path))
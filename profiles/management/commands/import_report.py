@@ -0,0 +1,67 @@
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Imports done by worker before serving the first request.
+BOOT = ('from django.core.wsgi import get_wsgi_application; '
+        'get_wsgi_application(); '
+        'from django.urls import get_resolver; '
+        'get_resolver().url_patterns')
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse(output):
+    """Returns (self, cumulative, module) tuples of -X importtime output,
+    times in microseconds.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match:
+            imports.append((int(match.group(1)), int(match.group(2)),
+                            match.group(4)))
+    return imports
+
+
+class Command(BaseCommand):
+    help = ('Reports modules which dominate worker boot time: imports '
+            'done by WSGI application setup and URLconf loading in a fresh '
+            'interpreter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of reported modules.')
+        parser.add_argument('--by', choices=['package', 'module'],
+                            default='package',
+                            help='Sum import time of top level packages or '
+                                 'report cumulative time of modules.')
+
+    def handle(self, *args, **options):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True
+        )
+        if process.returncode:
+            raise CommandError('Worker boot failed:\n{}'.format(
+                process.stderr))
+        imports = parse(process.stderr)
+
+        total = sum(own for own, cumulative, module in imports)
+        self.stdout.write('Total import time: {:.1f} ms, {} modules'.format(
+            total / 1000, len(imports)))
+        if options['by'] == 'package':
+            times = Counter()
+            for own, cumulative, module in imports:
+                times[module.split('.')[0]] += own
+        else:
+            times = Counter({module: cumulative
+                             for own, cumulative, module in imports})
+        for name, time in times.most_common(options['top']):
+            self.stdout.write('{:>9.1f} ms {:>5.1f}%  {}'.format(
+                time / 1000, time / total * 100, name))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles import importer
+
+
+class Command(BaseCommand):
+    help = ('Imports users from CSV or newline delimited JSON file in the '
+            'format produced by export_users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='File to import, may be gzipped.')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='File format, detected from file extension '
+                                 'by default.')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--processes', type=int,
+                            help='Number of password hashing processes, '
+                                 'number of CPUs by default.')
+
+    def handle(self, *args, **options):
+        rows = importer.read_rows(options['file'], options['format'])
+        user_importer = importer.get_importer(
+            chunk_size=options['chunk_size'],
+            processes=options['processes']
+        )
+        try:
+            stats = user_importer.run(rows)
+        except importer.InvalidRowsError as exc:
+            raise CommandError('Nothing imported, invalid rows:\n{}'.format(
+                exc))
+        self.stdout.write('Created {created} users, updated {updated} '
+                          'users.'.format(**stats))
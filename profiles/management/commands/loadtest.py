@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles import loadtest
+
+
+class Command(BaseCommand):
+    help = ('Runs closed-loop load test against running server, replaying '
+            'requests of the bundled frontend, and reports throughput and '
+            'latency percentiles of every endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Base url of the server.')
+        parser.add_argument('--username', default='admin',
+                            help='Username virtual users log in with.')
+        parser.add_argument('--password', default='admin',
+                            help='Password virtual users log in with.')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Number of virtual users.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Test duration in seconds.')
+        parser.add_argument('--mix', action='append',
+                            help='Action weight as "action=weight", may be '
+                                 'repeated. Actions: {}.'.format(
+                                     ', '.join(loadtest.DEFAULT_MIX)))
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of actions choice.')
+        parser.add_argument('--json', action='store_true',
+                            help='Output report as JSON.')
+
+    def handle(self, *args, **options):
+        mix = dict(loadtest.DEFAULT_MIX)
+        for value in options['mix'] or []:
+            action, _, weight = value.partition('=')
+            if action not in mix or not weight.isdigit():
+                raise CommandError('Invalid mix "{}"'.format(value))
+            mix[action] = int(weight)
+        try:
+            report = loadtest.run(
+                url=options['url'], username=options['username'],
+                password=options['password'],
+                concurrency=options['concurrency'],
+                duration=options['duration'], mix=mix, seed=options['seed']
+            )
+        except (OSError, loadtest.HTTPError) as exc:
+            raise CommandError('Load test failed: {}'.format(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+        row = '{:<40} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}\n'
+        self.stdout.write(row.format('endpoint', 'requests', 'errors',
+                                     'req/s', 'p50 ms', 'p95 ms', 'p99 ms'),
+                          ending='')
+        rows = sorted(report['endpoints'].items())
+        rows.append(('total', report['total']))
+        for endpoint, summary in rows:
+            self.stdout.write(row.format(
+                endpoint, summary['requests'], summary['errors'],
+                '{:.1f}'.format(summary['throughput']),
+                *('{:.1f}'.format(summary['p{}'.format(p)])
+                  for p in loadtest.PERCENTILES)
+            ), ending='')
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles import seeding
+
+
+class Command(BaseCommand):
+    help = ('Fills database with realistic synthetic users directory. '
+            'Every generated user has "{}" password.'.format(
+                seeding.SEED_PASSWORD))
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Same seed produces same directory.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        seeding.seed(options['users'], options['groups'], options['seed'],
+                     options['batch_size'])
+        self.stdout.write('Created {} users and {} groups in {:.1f}s'.format(
+            options['users'], options['groups'], time.perf_counter() - start))
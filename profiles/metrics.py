@@ -0,0 +1,353 @@
+"""Application metrics and their exposition in Prometheus text format.
+
+Every process writes its metric values into its own memory-mapped file in
+`settings.METRICS_DIR`, exposition sums values of all files, so metrics of
+all uwsgi workers are reported by whichever worker serves `/metrics`.
+Without `METRICS_DIR` values are kept in memory of the process.
+
+Files of exited workers are kept, so counters don't go backwards when
+workers are recycled, `METRICS_DIR` should be emptied when server starts.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+# Upper bounds of latency buckets in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+# Upper bounds of per-request query count buckets.
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class MemoryValues:
+    """Metric values of this process kept in memory"""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self.lock:
+            self.values[key] += amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class MmapValues:
+    """Metric values of this process kept in memory-mapped file.
+
+    File starts with 8 bytes header holding used size, followed by entries
+    of key length, key padded to 8 bytes and value as double.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            size = self.INITIAL_SIZE
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = struct.unpack_from('i', self.map, 0)[0] or 8
+        self.positions = {key: position for key, _, position
+                          in read_entries(self.map, self.used)}
+
+    def add(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self._append(key)
+            value = struct.unpack_from('d', self.map, position)[0]
+            struct.pack_into('d', self.map, position, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode('utf-8')
+        padding = b' ' * ((8 - (4 + len(encoded)) % 8) % 8)
+        entry = struct.pack('i', len(encoded)) + encoded + padding
+        entry += struct.pack('d', 0)
+        if self.used + len(entry) > len(self.map):
+            size = len(self.map)
+            while self.used + len(entry) > size:
+                size *= 2
+            self.file.truncate(size)
+            self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), size)
+        self.map[self.used:self.used + len(entry)] = entry
+        self.used += len(entry)
+        struct.pack_into('i', self.map, 0, self.used)
+        self.positions[key] = self.used - 8
+        return self.used - 8
+
+    def items(self):
+        with self.lock:
+            return [(key, value) for key, value, _
+                    in read_entries(self.map, self.used)]
+
+
+def read_entries(data, used=None):
+    """Yields (key, value, value position) of entries in values file"""
+    if used is None:
+        used = struct.unpack_from('i', data, 0)[0]
+    position = 8
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        position += 4
+        key = bytes(data[position:position + length]).decode('utf-8')
+        position += length + (8 - (4 + length) % 8) % 8
+        yield key, struct.unpack_from('d', data, position)[0], position
+        position += 8
+
+
+_values = None
+_values_pid = None
+_values_lock = threading.Lock()
+
+
+def values():
+    """Returns values store of current process"""
+    global _values, _values_pid
+    pid = os.getpid()
+    if _values_pid != pid:
+        with _values_lock:
+            if _values_pid != pid:
+                if settings.METRICS_DIR:
+                    _values = MmapValues(os.path.join(
+                        settings.METRICS_DIR, 'metrics_{}.db'.format(pid)))
+                else:
+                    _values = MemoryValues()
+                _values_pid = pid
+    return _values
+
+
+def collect():
+    """Returns values of all processes summed by key"""
+    if not settings.METRICS_DIR:
+        return dict(values().items())
+    values()  # Making sure file of this process exists.
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR,
+                                       'metrics_*.db')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < 8:
+            continue
+        for key, value, _ in read_entries(data):
+            totals[key] += value
+    return totals
+
+
+def escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def format_labels(names, values):
+    """Formats labels of sample
+
+    Examples
+    -------
+    >>> format_labels(('endpoint', 'le'), ('api:user-list', '0.5'))
+    '{endpoint="api:user-list",le="0.5"}'
+    """
+    if not names:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, escape(value))
+                          for name, value in zip(names, values)) + '}'
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+registry = []
+
+
+class Metric:
+    """Family of metric samples with given label names"""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.append(self)
+
+    def key(self, suffix, labels):
+        return json.dumps([self.name + suffix, [str(v) for v in labels]])
+
+    def value(self, labels=(), suffix=''):
+        """Returns value summed over all processes"""
+        return collect().get(self.key(suffix, labels), 0)
+
+    def samples(self, totals):
+        """Yields (suffix, labels, value) of collected samples"""
+        for key, value in sorted(totals.items()):
+            name, labels = json.loads(key)
+            if name == self.name:
+                yield '', labels, value
+
+    def expose(self, totals):
+        lines = ['# HELP {} {}'.format(self.name, self.documentation),
+                 '# TYPE {} {}'.format(self.name, self.type)]
+        for suffix, labels, value in self.samples(totals):
+            names = self.labelnames
+            if suffix == '_bucket':
+                names += ('le',)
+            lines.append('{}{}{} {}'.format(
+                self.name, suffix, format_labels(names, labels),
+                format_value(value)))
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        values().add(self.key('', labels), amount)
+
+
+class Histogram(Metric):
+    """Histogram with fixed bucket upper bounds.
+
+    Buckets are stored non-cumulative and accumulated on exposition.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.bounds = [format_value(bound) for bound in self.buckets]
+        self.bounds.append('+Inf')
+
+    def observe(self, labels, value):
+        store = values()
+        bound = self.bounds[bisect.bisect_left(self.buckets, value)]
+        store.add(self.key('_bucket', tuple(labels) + (bound,)), 1)
+        store.add(self.key('_sum', labels), value)
+        store.add(self.key('_count', labels), 1)
+
+    def count(self, labels=()):
+        return self.value(labels, '_count')
+
+    def sum(self, labels=()):
+        return self.value(labels, '_sum')
+
+    def samples(self, totals):
+        series = defaultdict(dict)
+        for key, value in totals.items():
+            name, labels = json.loads(key)
+            if name == self.name + '_bucket':
+                series[tuple(labels[:-1])][labels[-1]] = value
+        for labels in sorted(series):
+            cumulative = 0
+            for bound in self.bounds:
+                cumulative += series[labels].get(bound, 0)
+                yield '_bucket', labels + (bound,), cumulative
+            for suffix in ('_sum', '_count'):
+                yield suffix, labels, totals.get(self.key(suffix, labels), 0)
+
+
+class Gauge(Metric):
+    """Gauge which samples are taken at exposition from `function`
+    returning values keyed by labels, for values shared by processes
+    anyway.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def samples(self, totals):
+        for labels, value in sorted(self.function().items()):
+            yield '', labels, value
+
+
+def expose():
+    """Returns all metrics in Prometheus text exposition format"""
+    totals = collect()
+    lines = []
+    for metric in registry:
+        lines.extend(metric.expose(totals))
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'xusers_requests_total',
+    'Number of API requests.',
+    ('endpoint', 'method', 'status'),
+)
+REQUEST_PHASE_SECONDS = Histogram(
+    'xusers_request_phase_seconds',
+    'Time spent in phases of API requests.',
+    ('endpoint', 'phase'),
+)
+REQUEST_QUERIES = Histogram(
+    'xusers_request_queries',
+    'Number of database queries made by API requests.',
+    ('endpoint',),
+    buckets=QUERIES_BUCKETS,
+)
+TOKEN_LOOKUPS = Counter(
+    'xusers_token_lookups_total',
+    'Number of authentication token lookups.',
+    ('result',),
+)
+PASSWORD_HASHING = Counter(
+    'xusers_password_hashing_total',
+    'Number of password hashing operations accepted or rejected by pool.',
+    ('result',),
+)
+THROTTLED_REQUESTS = Counter(
+    'xusers_throttled_requests_total',
+    'Number of requests rejected by throttles.',
+    ('scope',),
+)
+STATEMENT_TIMEOUTS = Counter(
+    'xusers_statement_timeouts_total',
+    'Number of requests which query was cancelled by statement timeout.',
+    ('view',),
+)
+SHED_REQUESTS = Counter(
+    'xusers_shed_requests_total',
+    'Number of requests rejected by admission control.',
+    ('class',),
+)
+
+
+def in_flight_requests():
+    # Imported here, admission imports REST framework views, which import
+    # authentication classes using metrics.
+    from .admission import in_flight
+    return {(name,): count for name, count in in_flight().totals().items()}
+
+
+IN_FLIGHT_REQUESTS = Gauge(
+    'xusers_in_flight_requests',
+    'Number of requests being processed on the node by endpoint class.',
+    ('class',),
+    in_flight_requests,
+)
+CACHE_REQUESTS = Counter(
+    'xusers_cache_requests_total',
+    'Number of cache lookups, hit ratio is hits over all lookups.',
+    ('cache', 'result'),
+)
+
+
+def record_cache(cache, hit):
+    """Records lookup in cache layer named `cache`"""
+    CACHE_REQUESTS.inc((cache, 'hit' if hit else 'miss'))
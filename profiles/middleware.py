@@ -0,0 +1,233 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+
+from . import admission, db, instrumentation, metrics, profiling, tracing
+
+
+class TracingMiddleware:
+    """Records spans of sampled requests, see `profiles.tracing`.
+
+    Should be placed first, so request span includes all middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracing.should_trace(request):
+            return self.get_response(request)
+        with ExitStack() as stack:
+            trace = stack.enter_context(tracing.collect())
+            for connection in connections.all():
+                stack.enter_context(db.execute_wrapper(tracing.trace_query,
+                                                       connection))
+            args = {'method': request.method, 'path': request.path}
+            with tracing.span('request', 'middleware', args):
+                response = self.get_response(request)
+            args['status'] = response.status_code
+        tracing.write(trace)
+        return response
+
+
+class ServerTimingMiddleware:
+    """Measures requests, emits their timings in `Server-Timing` header and
+    records them in per-endpoint histograms.
+
+    Timings reveal internals of the server, so the header is sent only in
+    debug mode, to staff users and to addresses listed in
+    INSTRUMENTATION_SERVER_TIMING_ALLOWED_IPS, like /metrics.
+
+    Should be placed right after TracingMiddleware, so total time includes
+    other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            timings = stack.enter_context(instrumentation.collect())
+            for connection in connections.all():
+                stack.enter_context(db.execute_wrapper(timings.record_query,
+                                                       connection))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        if self.sends_timing(request):
+            response['Server-Timing'] = timings.server_timing(total)
+        match = request.resolver_match
+        if match is not None:
+            endpoint = match.view_name
+            metrics.REQUESTS.inc((endpoint, request.method,
+                                  response.status_code))
+            for name, duration in timings.phases.items():
+                metrics.REQUEST_PHASE_SECONDS.observe((endpoint, name),
+                                                      duration)
+            metrics.REQUEST_PHASE_SECONDS.observe((endpoint, 'db'),
+                                                  timings.db_time)
+            metrics.REQUEST_PHASE_SECONDS.observe((endpoint, 'total'), total)
+            metrics.REQUEST_QUERIES.observe((endpoint,), timings.db_queries)
+        return response
+
+    def sends_timing(self, request):
+        """Returns whether client may see timings of the request"""
+        if not settings.INSTRUMENTATION_SERVER_TIMING:
+            return False
+        if settings.DEBUG:
+            return True
+        # Set by REST framework authentication as well.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        allowed = settings.INSTRUMENTATION_SERVER_TIMING_ALLOWED_IPS
+        return allowed is None or request.META.get('REMOTE_ADDR') in allowed
+
+
+class AdmissionControlMiddleware:
+    """Rejects requests with 503 when too many requests of their endpoint
+    class are in flight, see `profiles.admission`.
+
+    Requests are classified by their view, so it should be placed before
+    PathDispatchMiddleware, which runs the view hooks of other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            name = getattr(request, 'admission_class', None)
+            if name is not None:
+                if response is not None and response.streaming:
+                    # Body is produced while the server sends it.
+                    response._closable_objects.append(
+                        admission.Release(name))
+                else:
+                    admission.release(name)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = admission.classify(view_func, request.method)
+        if name is None:
+            return None
+        if not admission.admit(name):
+            metrics.SHED_REQUESTS.inc((name,))
+            response = JsonResponse(
+                {'detail': 'Server is overloaded, try again later.'},
+                status=503
+            )
+            response['Retry-After'] = settings.ADMISSION_RETRY_AFTER
+            return response
+        request.admission_class = name
+
+
+class ProfilingMiddleware:
+    """Returns profile of request instead of response when admin asks for
+    it, see `profiles.profiling`.
+
+    Should be placed last, so profile covers the view only. Requests without
+    profiling flag pass through untouched.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = profiling.get_user(request)
+        if user is None or not user.has_perm(profiling.PERMISSION):
+            return self.get_response(request)
+
+        response, content = profiling.profile(
+            self.get_response, request, mode,
+            settings.PROFILING_SAMPLE_INTERVAL
+        )
+        profile = HttpResponse(content,
+                               content_type='application/octet-stream')
+        profile['Content-Disposition'] = (
+            'attachment; filename="profile.{}"'.format(mode))
+        profile['X-Profiled-Status'] = response.status_code
+        return profile
+
+
+class MiddlewareChain:
+    """Chain of middleware built the way Django builds MIDDLEWARE"""
+
+    def __init__(self, paths, get_response):
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+        handler = get_response
+        for path in reversed(paths):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, 'process_view'):
+                self.view_middleware.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_middleware.append(
+                    instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self.exception_middleware.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.handler = handler
+
+
+class PathDispatchMiddleware:
+    """Runs middleware chain picked by request path.
+
+    Requests which path starts with one of MIDDLEWARE_CHAINS prefixes run
+    its chain, other requests run DEFAULT_MIDDLEWARE. View, exception and
+    template response hooks of chain's middleware are forwarded, so it
+    should be placed last.
+    """
+
+    def __init__(self, get_response):
+        self.chains = [(prefix, MiddlewareChain(paths, get_response))
+                       for prefix, paths in settings.MIDDLEWARE_CHAINS]
+        self.default = MiddlewareChain(settings.DEFAULT_MIDDLEWARE,
+                                       get_response)
+
+    def get_chain(self, request):
+        for prefix, chain in self.chains:
+            if request.path_info.startswith(prefix):
+                return chain
+        return self.default
+
+    def __call__(self, request):
+        request.middleware_chain = self.get_chain(request)
+        return request.middleware_chain.handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in request.middleware_chain.view_middleware:
+            response = process_view(request, view_func, view_args,
+                                    view_kwargs)
+            if response is not None:
+                return response
+
+    def process_exception(self, request, exception):
+        chain = request.middleware_chain
+        for process_exception in chain.exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+
+    def process_template_response(self, request, response):
+        chain = request.middleware_chain
+        for process_template_response in chain.template_response_middleware:
+            response = process_template_response(request, response)
+        return response
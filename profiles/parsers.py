@@ -0,0 +1,110 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(stream, encoding='utf-8', read_size=64 * 1024):
+    """Lazily decodes JSON array from stream, yielding one item at a time.
+
+    Only the item being decoded is kept in memory, so memory use doesn't
+    depend on the number of items.
+
+    Parameters
+    ----------
+    stream : file-like object
+        Stream to read JSON from.
+    encoding : str
+        Encoding of the stream.
+    read_size : int
+        Number of bytes read from stream at once.
+
+    Raises
+    ------
+    rest_framework.exceptions.ParseError
+        If stream content isn't valid JSON array.
+
+    Examples
+    -------
+    >>> import io
+    >>> list(iter_json_array(io.BytesIO(b'[{"a": 1}, 2]')))
+    [{'a': 1}, 2]
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(characters):
+        nonlocal position
+        skip_whitespace()
+        if position == len(buffer) or buffer[position] not in characters:
+            raise ParseError('JSON parse error - expected {}'.format(
+                ' or '.join(repr(c) for c in characters)))
+        position += 1
+        return buffer[position - 1]
+
+    expect('[')
+    skip_whitespace()
+    if position < len(buffer) and buffer[position] == ']':
+        position += 1
+    else:
+        while True:
+            skip_whitespace()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except ValueError as exc:
+                    if eof:
+                        raise ParseError(
+                            'JSON parse error - {}'.format(exc)
+                        )
+                    fill()
+                    continue
+                # Number at the end of buffer may continue in next chunk.
+                if end == len(buffer) and not eof:
+                    fill()
+                    continue
+                break
+            position = end
+            yield item
+            if expect(',]') == ']':
+                break
+    skip_whitespace()
+    if position < len(buffer):
+        raise ParseError('JSON parse error - extra data after array')
+
+
+class JSONArrayStreamParser(BaseParser):
+    """Parses JSON array lazily, request data is iterator over array items.
+
+    Meant for bulk endpoints, which process items in chunks instead of
+    building whole payload in memory.
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return iter_json_array(stream, encoding)
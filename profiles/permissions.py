@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -41,3 +42,23 @@ class CantEditSuperuserIfNotSuperuser(permissions.BasePermission):
         if request.method not in permissions.SAFE_METHODS and obj.is_superuser:
             return request.user.is_superuser
         return True
+
+
+class IsAllowedMetricsClient(permissions.BasePermission):
+    """Permission that allows access only from addresses listed in
+    METRICS_ALLOWED_IPS setting, or from everywhere if it's None.
+    """
+
+    def has_permission(self, request, view):
+        allowed = settings.METRICS_ALLOWED_IPS
+        return allowed is None or request.META.get('REMOTE_ADDR') in allowed
+
+
+def permission_level(user):
+    """Returns "full" if user can see full users info, "basic" otherwise.
+
+    Responses of read endpoints are the same for users of the same level.
+    """
+    if user is not None and user.has_perm('profiles.view_full_info'):
+        return 'full'
+    return 'basic'
@@ -0,0 +1,149 @@
+"""On-demand profiling of individual requests.
+
+Request is profiled when it has `_profile` query parameter or `X-Profile`
+header and its user has `profiles.view_full_info` permission. Value picks
+profiler:
+
+* `collapsed` (or `1`) - statistical profiler sampling stack of request's
+  thread, result is collapsed stacks file accepted by flamegraph tools.
+* `pstats` - deterministic cProfile profiler, result is pstats file.
+* `alloc` - tracemalloc profile of serialization and rendering, result is
+  text report of peak and retained memory and top allocating lines.
+
+Profile is returned as attachment instead of the response.
+"""
+import cProfile
+import marshal
+import sys
+import threading
+from collections import Counter
+
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import allocations
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+PERMISSION = 'profiles.view_full_info'
+
+MODES = ('collapsed', 'pstats', 'alloc')
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def requested_mode(request):
+    """Returns profiler requested for request or None
+
+    Checks only query string and headers, so it's cheap to call for every
+    request.
+    """
+    value = request.GET.get(QUERY_PARAM) or request.META.get(HEADER)
+    if not value:
+        return None
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return MODES[0]
+    return value if value in MODES else None
+
+
+def get_user(request):
+    """Returns user of the request authenticated by session or any of
+    the API authentication classes, None if request isn't authenticated.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(drf_request)
+        except exceptions.APIException:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return '{}.{}'.format(frame.f_globals.get('__name__', '?'),
+                          getattr(code, 'co_qualname', code.co_name))
+
+
+class Sampler(threading.Thread):
+    """Samples stack of another thread at regular intervals.
+
+    Parameters
+    ----------
+    thread_id : int
+        Identifier of the sampled thread.
+    root : frame
+        Frame of sampled thread, only frames called from it are recorded.
+    interval : float
+        Seconds between samples.
+    """
+
+    def __init__(self, thread_id, root, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        """Returns samples in collapsed stacks format, line per stack"""
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in sorted(self.stacks.items()))
+
+
+def _consume(response):
+    # Streaming content is generated lazily, profiling its generation too.
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+        response.close()
+
+
+def profile(get_response, request, mode, interval):
+    """Runs get_response profiled, returns response and profile content"""
+    if mode == 'pstats':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = get_response(request)
+            _consume(response)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return response, marshal.dumps(profiler.stats)
+
+    if mode == 'alloc':
+        with allocations.collect() as profile:
+            response = get_response(request)
+            _consume(response)
+        return response, profile.report().encode('utf-8')
+
+    sampler = Sampler(threading.get_ident(), sys._getframe(), interval)
+    sampler.start()
+    try:
+        response = get_response(request)
+        _consume(response)
+    finally:
+        sampler.stop()
+    return response, sampler.collapsed().encode('utf-8')
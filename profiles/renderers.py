@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+from rest_framework import renderers
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """Renderer used for content negotiation of server-sent events streams.
+
+    Stream itself is written by the view, renderer only handles error
+    responses, sending them as single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return 'event: error\ndata: {}\n\n'.format(json.dumps(data))
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """Renderer used for content negotiation of users export.
+
+    Export is streamed by the view, renderer only handles error responses.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if isinstance(data, dict):
+            writer.writerows(data.items())
+        return buffer.getvalue()
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Renderer used for content negotiation of users export.
+
+    Export is streamed by the view, renderer only handles error responses.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data) + '\n'
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """Renderer of metrics in Prometheus text exposition format.
+
+    View passes exposition as text, error responses are rendered as
+    "key: value" lines.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data
+        return ''.join('{}: {}\n'.format(key, value)
+                       for key, value in data.items())
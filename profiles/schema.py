@@ -0,0 +1,76 @@
+"""API schema served from file.
+
+Schema is generated by `generate_schema` command into API_SCHEMA_FILE and
+loaded once per process. When the file is missing schema is generated on
+the first request and kept in memory.
+"""
+import os
+
+from django.conf import settings
+
+from rest_framework.compat import coreapi
+from rest_framework.renderers import (CoreJSONRenderer, DocumentationRenderer,
+                                      SchemaJSRenderer)
+from rest_framework.response import Response
+from rest_framework.schemas import SchemaGenerator
+from rest_framework.schemas.views import SchemaView
+
+TITLE = 'xUsers Managment System API'
+
+
+def generate_schema():
+    """Returns public schema of the API as coreapi.Document"""
+    generator = SchemaGenerator(title=TITLE)
+    return generator.get_schema(public=True)
+
+
+def dump_schema(path):
+    """Writes schema to path in Core JSON format"""
+    content = CoreJSONRenderer().render(generate_schema(), renderer_context={})
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def load_schema(path=None):
+    """Returns schema read from path, API_SCHEMA_FILE by default, or None if
+    file does not exist.
+    """
+    path = path or settings.API_SCHEMA_FILE
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return coreapi.codecs.CoreJSONCodec().decode(f.read())
+
+
+class CachedSchemaView(SchemaView):
+    """Schema view serving schema loaded from file"""
+    authentication_classes = []
+    permission_classes = []
+    public = True
+
+    _schema = None
+
+    @classmethod
+    def get_schema(cls):
+        if cls._schema is None:
+            cls._schema = load_schema() or generate_schema()
+        return cls._schema
+
+    def get(self, request, *args, **kwargs):
+        schema = self.get_schema()
+        # Base URL is not known to generate_schema command.
+        schema = coreapi.Document(
+            url=request.build_absolute_uri(), title=schema.title,
+            description=schema.description, media_type=schema.media_type,
+            content=dict(schema)
+        )
+        return Response(schema)
+
+
+def get_docs_view():
+    return CachedSchemaView.as_view(
+        renderer_classes=[DocumentationRenderer, CoreJSONRenderer])
+
+
+def get_schemajs_view():
+    return CachedSchemaView.as_view(renderer_classes=[SchemaJSRenderer])
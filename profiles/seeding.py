@@ -0,0 +1,214 @@
+"""Generator of realistic synthetic users directory.
+
+Generated data mimics real directories: names are drawn from small pools,
+so searches by name match many users, addresses are shared by households,
+group sizes follow Zipf distribution and birthdays are spread around
+the mid eighties.
+
+Output depends only on the seed and sizes, rows are written with explicit
+primary keys using COPY on PostgreSQL and `bulk_create` elsewhere.
+"""
+import csv
+import io
+import itertools
+import random
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Address, User
+
+FIRST_NAMES = (
+    'Alexander', 'Alexey', 'Anastasia', 'Andrey', 'Anna', 'Anton', 'Artem',
+    'Boris', 'Daria', 'Denis', 'Dmitriy', 'Ekaterina', 'Elena', 'Evgeniy',
+    'Igor', 'Ilya', 'Irina', 'Ivan', 'Kirill', 'Ksenia', 'Lily', 'Maria',
+    'Marina', 'Maxim', 'Mikhail', 'Natalia', 'Nikita', 'Nikolay', 'Olga',
+    'Pavel', 'Polina', 'Robin', 'Roman', 'Sergey', 'Sofia', 'Svetlana',
+    'Tatiana', 'Timur', 'Vadim', 'Valeria', 'Victor', 'Victoria', 'Vladimir',
+    'Yulia', 'Yuri',
+)
+LAST_NAMES = (
+    'Alekseev', 'Andreev', 'Belov', 'Bogdanov', 'Bychkov', 'Egorov',
+    'Fedorov', 'Frolov', 'Gavrilov', 'Grigoriev', 'Ivanov', 'Karpov',
+    'Kiselev', 'Kovalev', 'Kozlov', 'Kuznetsov', 'Lebedev', 'Makarov',
+    'Medvedev', 'Mikhailov', 'Morozov', 'Nikitin', 'Nikolaev', 'Novikov',
+    'Orlov', 'Pavlov', 'Petrov', 'Popov', 'Romanov', 'Semenov', 'Smirnov',
+    'Sokolov', 'Solovyov', 'Sorokin', 'Sparkles', 'Stepanov', 'Tarasov',
+    'Vasiliev', 'Volkov', 'Vorobiev', 'Yakovlev', 'Zaitsev', 'Zakharov',
+)
+CITIES = (
+    ('Russia', 'Moscow'), ('Russia', 'Saint Petersburg'),
+    ('Russia', 'Nizhny Novgorod'), ('Russia', 'Kazan'),
+    ('Russia', 'Novosibirsk'), ('Russia', 'Yekaterinburg'),
+    ('Germany', 'Berlin'), ('Germany', 'Munich'),
+    ('Kazakhstan', 'Almaty'), ('Belarus', 'Minsk'),
+)
+STREETS = (
+    'Lenina', 'Pushkina', 'Gagarina', 'Sadovaya', 'Lesnaya', 'Mira',
+    'Sovetskaya', 'Rodionova', 'Naberezhnaya', 'Central', 'Big Low',
+)
+TEAMS = (
+    'Sales', 'Support', 'Engineering', 'Marketing', 'Finance', 'Legal',
+    'Operations', 'Design', 'Research', 'Security',
+)
+EMAIL_DOMAINS = ('mail.ru', 'yandex.ru', 'gmail.com', 'example.com')
+
+# Users per address on average, addresses are picked uniformly, so
+# household sizes are roughly Poisson distributed.
+USERS_PER_ADDRESS = 2.5
+# Exponent of Zipf distribution of group sizes.
+GROUP_SIZE_EXPONENT = 1.1
+# Probabilities of belonging to 0, 1, 2 and 3 groups.
+MEMBERSHIPS_WEIGHTS = (30, 40, 20, 10)
+
+SEED_PASSWORD = 'userpassword'
+
+# Users join dates are spread over five years before this date.
+JOINED_BEFORE = datetime(2018, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(count, exponent=GROUP_SIZE_EXPONENT):
+    """Returns cumulative Zipf weights for given number of items
+
+    Examples
+    -------
+    >>> zipf_weights(3, exponent=1)
+    [1.0, 1.5, 1.8333333333333333]
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def random_birthday(rng):
+    # Normal distribution around 1985, clipped to realistic range.
+    years = min(max(rng.gauss(1985, 12), 1940), 2008)
+    return date(1940, 1, 1) + timedelta(days=int((years - 1940) * 365.25))
+
+
+class Writer:
+    """Writes rows with explicit primary keys.
+
+    Uses COPY on PostgreSQL and `bulk_create` on other databases.
+    """
+
+    def __init__(self):
+        self.copy = connection.vendor == 'postgresql'
+
+    def write(self, model, fields, rows):
+        if not rows:
+            return
+        if self.copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            columns = [model._meta.get_field(name).column
+                       for name in fields]
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                        model._meta.db_table, ', '.join(columns)),
+                    buffer
+                )
+        else:
+            model.objects.bulk_create(
+                model(**dict(zip(fields, row))) for row in rows
+            )
+
+    def reset_sequences(self, models):
+        """Moves sequences past explicitly inserted primary keys"""
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def next_id(model):
+    return (model.objects.aggregate(value=Max('pk'))['value'] or 0) + 1
+
+
+@transaction.atomic
+def seed(users, groups, seed=0, batch_size=10000):
+    """Generates users directory.
+
+    Parameters
+    ----------
+    users : int
+        Number of users to create.
+    groups : int
+        Number of groups to create.
+    seed : int
+        Seed of random generator, same seed gives same directory.
+    batch_size : int
+        Number of rows written at once.
+    """
+    rng = random.Random(seed)
+    writer = Writer()
+    Membership = User.groups.through
+    password = make_password(SEED_PASSWORD, salt='seeddirectory')
+
+    first_group = next_id(Group)
+    writer.write(Group, ('id', 'name'), [
+        (first_group + i, '{} {}'.format(TEAMS[i % len(TEAMS)],
+                                         first_group + i))
+        for i in range(groups)
+    ])
+
+    first_address = next_id(Address)
+    addresses = max(1, int(users / USERS_PER_ADDRESS))
+    for start in range(0, addresses, batch_size):
+        rows = []
+        for i in range(start, min(addresses, start + batch_size)):
+            country, city = rng.choice(CITIES)
+            rows.append((first_address + i, '{:06d}'.format(
+                rng.randrange(100000, 1000000)), country, city,
+                'District {}'.format(rng.randrange(1, 20)),
+                '{} {}'.format(rng.choice(STREETS), rng.randrange(1, 200))))
+        writer.write(Address, ('id', 'zip_code', 'country', 'city',
+                               'district', 'street'), rows)
+
+    user_fields = ('id', 'password', 'is_superuser', 'username',
+                   'first_name', 'last_name', 'email', 'is_staff',
+                   'is_active', 'date_joined', 'birthday', 'address_id',
+                   'last_update')
+    group_weights = zipf_weights(groups) if groups else None
+    group_ids = range(first_group, first_group + groups)
+    first_user = next_id(User)
+    first_membership = next_id(Membership)
+    memberships_written = 0
+    for start in range(0, users, batch_size):
+        rows, memberships = [], []
+        for i in range(start, min(users, start + batch_size)):
+            pk = first_user + i
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            joined = JOINED_BEFORE - timedelta(
+                seconds=rng.randrange(5 * 365 * 86400))
+            rows.append((
+                pk, password, False,
+                '{}{}{}'.format(first_name, last_name, pk).lower(),
+                first_name, last_name,
+                '{}.{}{}@{}'.format(first_name, last_name, pk,
+                                    rng.choice(EMAIL_DOMAINS)).lower(),
+                False, rng.random() > 0.05, joined, random_birthday(rng),
+                first_address + rng.randrange(addresses), joined,
+            ))
+            if groups:
+                count = rng.choices(range(len(MEMBERSHIPS_WEIGHTS)),
+                                    MEMBERSHIPS_WEIGHTS)[0]
+                chosen = set(rng.choices(group_ids, cum_weights=group_weights,
+                                         k=count))
+                memberships.extend((pk, group) for group in sorted(chosen))
+        writer.write(User, user_fields, rows)
+        writer.write(Membership, ('id', 'user_id', 'group_id'), [
+            (first_membership + memberships_written + i, user, group)
+            for i, (user, group) in enumerate(memberships)
+        ])
+        memberships_written += len(memberships)
+
+    writer.reset_sequences([Group, Address, User, Membership])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import Group
 from django.db import transaction
 from django.forms.models import model_to_dict
@@ -5,7 +6,37 @@ from django.forms.models import model_to_dict
 from rest_framework import serializers
 from rest_framework import status
 
+from . import hashing
 from .models import User, Address
+from .utils import url_template
+
+
+class TemplateHyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+    """HyperlinkedIdentityField resolving URL of the view once per request
+    and format, URLs of objects are built by substituting quoted lookup
+    value, see `utils.url_template()`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.templates = {}
+        self.templates_request = None
+
+    def get_url(self, obj, view_name, request, format):
+        lookup_value = getattr(obj, self.lookup_field, None)
+        if (getattr(obj, 'pk', None) in (None, '') or
+                not isinstance(lookup_value, str) or not lookup_value or
+                '/' in lookup_value or '.' in lookup_value):
+            # Not matching router's lookup pattern, left to reverse().
+            return super().get_url(obj, view_name, request, format)
+        if self.templates_request is not request:
+            self.templates = {}
+            self.templates_request = request
+        build_url = self.templates.get((view_name, format))
+        if build_url is None:
+            build_url = self.templates[view_name, format] = url_template(
+                view_name, self.lookup_url_kwarg, request, format)
+        return build_url(lookup_value)
 
 
 class UserGroupsSerializer(serializers.Serializer):
@@ -49,6 +80,8 @@ class GroupDetailSerializer(serializers.HyperlinkedModelSerializer):
     Serializer for group's details.
     """
 
+    serializer_url_field = TemplateHyperlinkedIdentityField
+
     users_count = serializers.IntegerField(read_only=True)
     users = serializers.SlugRelatedField(many=True, slug_field='username',
                                          queryset=User.objects.all(),
@@ -93,6 +126,8 @@ class GroupSerializer(serializers.HyperlinkedModelSerializer):
     view as annotation.
     """
 
+    serializer_url_field = TemplateHyperlinkedIdentityField
+
     users_count = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -121,17 +156,19 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
     basic fields representation.
     """
 
+    basic_user_fields = {'first_name', 'url', 'last_name', 'username',
+                         'email', 'birthday', 'address', 'groups'}
+    serializer_url_field = TemplateHyperlinkedIdentityField
+    # Permission to check.
+    full_info_permission = 'profiles.view_full_info'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        basic_user_fields = {'first_name', 'url', 'last_name', 'username',
-                             'email', 'birthday', 'address', 'groups'}
-
         request = self.context.get('request')
-        # Permission to check.
-        permission = 'profiles.view_full_info'
-        if request is None or not request.user.has_perm(permission):
-            restricted_fields = set(self.fields) - basic_user_fields
+        if request is None or not request.user.has_perm(
+                self.full_info_permission):
+            restricted_fields = set(self.fields) - self.basic_user_fields
             for field in restricted_fields:
                 self.fields.pop(field)
 
@@ -163,49 +200,103 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
     # nested address object looks and placed it as nested serialzier, so
     # we can't use default implementation for objects with fk.
 
-    @transaction.atomic
+    def hash_password(self, validated_data):
+        """Hashes password in hashing pool, only once data is valid.
+
+        Called by create and update before their own transaction, the one
+        of the view may still be open, like in bulk create or with
+        statement timeout on PostgreSQL.
+        """
+        if validated_data.get('password') is not None:
+            validated_data['password'] = hashing.make_password(
+                validated_data['password'])
+
     def create(self, validated_data):
         """Method to create user instance with coresponding address"""
 
-        address_data = validated_data.pop('address')
-        address, _ = Address.objects.get_or_create(**address_data)
-
-        user = User.objects.create_user(**validated_data, address=address)
+        self.hash_password(validated_data)
+        with transaction.atomic():
+            address_data = validated_data.pop('address')
+            address, _ = Address.objects.get_or_create(**address_data)
+
+            # Doing what User.objects.create_user() does, except for
+            # hashing of already hashed password.
+            user = User(**validated_data, address=address)
+            user.username = User.normalize_username(user.username)
+            user.email = User.objects.normalize_email(user.email)
+            user.save()
         return user
 
-    @transaction.atomic
     def update(self, instance, validated_data):
         """Method to update user instance and address"""
 
-        address_data = validated_data.pop('address', None)
-
-        if address_data is not None:
-            # look if updated address already exists in database
-            address = instance.address
-            existing_data = model_to_dict(address)
-            existing_data.pop('id')
-            existing_data.update(address_data)
-            try:
-                obj = Address.objects.get(**existing_data)
-                if not obj == address:
+        self.hash_password(validated_data)
+        with transaction.atomic():
+            address_data = validated_data.pop('address', None)
+
+            if address_data is not None:
+                # look if updated address already exists in database
+                address = instance.address
+                existing_data = model_to_dict(address)
+                existing_data.pop('id')
+                existing_data.update(address_data)
+                try:
+                    obj = Address.objects.get(**existing_data)
+                    if not obj == address:
+                        if address.user_set.count() == 1:
+                            address.delete()
+                        instance.address = obj
+                except Address.DoesNotExist:
                     if address.user_set.count() == 1:
-                        address.delete()
-                    instance.address = obj
-            except Address.DoesNotExist:
-                if address.user_set.count() == 1:
-                    for attr, value in address_data.items():
-                        setattr(address, attr, value)
-                    address.save()
-                else:
-                    instance.address = Address.objects.create(**existing_data)
+                        for attr, value in address_data.items():
+                            setattr(address, attr, value)
+                        address.save()
+                    else:
+                        instance.address = Address.objects.create(
+                            **existing_data)
 
-        password = validated_data.pop('password', None)
+            password = validated_data.pop('password', None)
 
-        if password is not None:
-            instance.set_password(password)
+            if password is not None:
+                # Already hashed.
+                instance.password = password
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        instance.save()
+            instance.save()
         return instance
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Single sub-request of batch request"""
+
+    method = serializers.ChoiceField(
+        choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE']
+    )
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = dict(data, method=data['method'].upper())
+        return super().to_internal_value(data)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for batch of API sub-requests, used in /batch endpoint"""
+
+    requests = BatchItemSerializer(many=True)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, data):
+        if not data:
+            raise serializers.ValidationError(
+                detail='Batch must contain atleast one request'
+            )
+        if len(data) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                detail='Batch can contain at most {} requests'.format(
+                    settings.BATCH_MAX_REQUESTS)
+            )
+        return data
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import events, fragments
+from .models import Address, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Address)
+def object_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # Skip fixtures loading.
+        return
+    action = 'created' if created else 'updated'
+    events.publish(_make_event(instance, action))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def object_deleted(sender, instance, **kwargs):
+    events.publish(_make_event(instance, 'deleted'))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def membership_changed(sender, instance, action, reverse, model, pk_set,
+                       **kwargs):
+    """Publishes membership event for both sides of changed relation.
+
+    For `clear` actions pk_set is None, so only instance side is reported.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    events.publish(_make_event(instance, 'membership'))
+    event_type = 'user' if model is User else 'group'
+    for pk in pk_set or ():
+        events.publish(events.Event(event_type, 'membership', pk, None))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_fragments_changed(sender, instance, **kwargs):
+    fragments.invalidate(User, [instance.pk])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_fragments_changed(sender, instance, created=False, **kwargs):
+    fragments.invalidate(Group, [instance.pk])
+    if not created:
+        # Users list names of their groups.
+        fragments.invalidate(User, instance.user_set.values_list('pk',
+                                                                 flat=True))
+
+
+@receiver(post_save, sender=Address)
+def address_fragments_changed(sender, instance, created, **kwargs):
+    if not created:
+        fragments.invalidate(User, instance.user_set.values_list('pk',
+                                                                 flat=True))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def membership_fragments_changed(sender, instance, action, reverse, model,
+                                 pk_set, **kwargs):
+    """Deletes fragments of both sides of changed relation, for `clear`
+    actions other side is looked up before it's cleared.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    fragments.invalidate(type(instance), [instance.pk])
+    if action == 'pre_clear':
+        related = instance.user_set if reverse else instance.groups
+        pk_set = related.values_list('pk', flat=True)
+    fragments.invalidate(model, pk_set)
+
+
+def _make_event(instance, action):
+    if isinstance(instance, User):
+        return events.Event('user', action, instance.pk, instance.username)
+    if isinstance(instance, Group):
+        return events.Event('group', action, instance.pk, instance.name)
+    return events.Event('address', action, instance.pk, None)
@@ -0,0 +1,151 @@
+"""Slow queries log.
+
+`log_slow_queries` is installed as execute wrapper of every connection and
+logs queries slower than `settings.SLOW_QUERY_THRESHOLD` along with the
+view and serializer field which made them and the project's part of the
+stack. In debug mode on PostgreSQL the slowest SELECT of every view is
+also explained with `EXPLAIN (ANALYZE, BUFFERS)`, which executes it again.
+Queries locking rows or calling functions other than the known side
+effect free ones, like `pg_notify()`, are only planned with `EXPLAIN`.
+In a transaction EXPLAIN runs in a savepoint, so its failure, e.g. by
+statement timeout, is only logged and doesn't abort the request.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from rest_framework.serializers import Serializer
+from rest_framework.views import APIView
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# Duration of the slowest explained query of every view.
+_slowest = {}
+_slowest_lock = threading.Lock()
+
+_to_representation = Serializer.to_representation.__code__
+
+LOCKING_CLAUSE = re.compile(
+    r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.I)
+CALL = re.compile(r'(\w+)\s*\(')
+# Keywords followed by parenthesis and functions without side effects.
+SAFE_CALLS = {
+    'ALL', 'AND', 'ANY', 'AS', 'BY', 'CAST', 'COALESCE', 'COUNT', 'EXISTS',
+    'FILTER', 'FROM', 'IN', 'JOIN', 'LOWER', 'MAX', 'MIN', 'NOT', 'ON', 'OR',
+    'OVER', 'SELECT', 'SUM', 'UPPER', 'WHERE',
+}
+
+
+def install(sender, connection, **kwargs):
+    """`connection_created` receiver installing the wrapper"""
+    db.install(connection)
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_queries)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Execute wrapper logging queries slower than threshold"""
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+    if duration >= threshold:
+        view, field = attribute(sys._getframe(1))
+        logger.warning(
+            'Slow query (%.1f ms) in %s, serializer field %s: %s',
+            duration * 1000, view or '-', field or '-', sql,
+            extra={'duration': duration, 'sql': sql, 'params': params,
+                   'view': view, 'field': field, 'stack': project_stack()}
+        )
+        if (view and settings.DEBUG and not many and
+                context['connection'].vendor == 'postgresql' and
+                sql.lstrip()[:6].upper() == 'SELECT'):
+            explain_if_slowest(context['connection'], view, duration, sql,
+                               params)
+    return result
+
+
+def attribute(frame):
+    """Returns names of the view and serializer field calling frame"""
+    view = field = None
+    while frame is not None and view is None:
+        instance = frame.f_locals.get('self')
+        if field is None and frame.f_code is _to_representation:
+            current = frame.f_locals.get('field')
+            if current is not None:
+                field = '{}.{}'.format(type(instance).__name__,
+                                       current.field_name)
+        if isinstance(instance, APIView):
+            view = type(instance).__name__
+            action = getattr(instance, 'action', None)
+            if action:
+                view = '{}.{}'.format(view, action)
+        frame = frame.f_back
+    return view, field
+
+
+def project_stack():
+    """Returns formatted frames of the stack belonging to the project"""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(settings.BASE_DIR) and
+        'site-packages' not in frame.filename and
+        frame.filename != __file__
+    ]
+    for frame in frames:
+        frame.filename = os.path.relpath(frame.filename, settings.BASE_DIR)
+    return ''.join(traceback.format_list(frames))
+
+
+def explain_command(sql):
+    """Returns EXPLAIN command for query, executing it only if it's safe"""
+    if LOCKING_CLAUSE.search(sql) or any(
+            name.upper() not in SAFE_CALLS for name in CALL.findall(sql)):
+        return 'EXPLAIN '
+    return 'EXPLAIN (ANALYZE, BUFFERS) '
+
+
+def explain_if_slowest(connection, view, duration, sql, params):
+    """Logs plan of query if it's the slowest seen in the view"""
+    with _slowest_lock:
+        if duration <= _slowest.get(view, 0):
+            return
+        _slowest[view] = duration
+    try:
+        plan = explain(connection, sql, params)
+    except Exception:
+        logger.warning('Explaining the slowest query in %s failed: %s',
+                       view, sql, exc_info=True,
+                       extra={'view': view, 'sql': sql})
+        return
+    logger.info('Plan of the slowest query in %s (%.1f ms): %s\n%s',
+                view, duration * 1000, sql, plan,
+                extra={'view': view, 'sql': sql, 'plan': plan})
+
+
+def explain(connection, sql, params):
+    """Returns plan of query, rolls back to savepoint if EXPLAIN fails"""
+    # Savepoint is made only in atomic block.
+    sid = connection.savepoint()
+    try:
+        # Using DB-API cursor, so EXPLAIN doesn't go through execute
+        # wrappers.
+        with connection.connection.cursor() as cursor:
+            cursor.execute(explain_command(sql) + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+    except Exception:
+        if sid is not None:
+            connection.savepoint_rollback(sid)
+        raise
+    if sid is not None:
+        connection.savepoint_commit(sid)
+    return plan
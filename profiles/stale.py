@@ -0,0 +1,195 @@
+"""Stale-while-revalidate serving of read endpoints.
+
+Rendered responses of list and retrieve actions are kept in STALE_CACHE.
+Responses younger than STALE_MAX_AGE are served from the cache, the ones
+older than STALE_REVALIDATE_AFTER are refreshed in background thread
+meanwhile. Older responses are refreshed while the request waits, but if
+the refresh takes longer than STALE_LATENCY_SLO or its queries fail, e.g.
+by statement timeout, they are served anyway, up to STALE_IF_ERROR_MAX_AGE,
+with Warning header, so the directory stays readable while the database is
+slow.
+
+This doesn't cover database outage: token lookup and permission checks run
+before the view and still need the database, so without it requests fail
+before a stale copy could be served. Mixin should be placed before
+StatementTimeoutMixin, so responses served from the cache don't open its
+transaction, refreshes run in it.
+
+Refreshes run in threads of the worker, under uwsgi they need
+`enable-threads = true` (or `threads` > 1), otherwise the threads never
+run and requests wait STALE_LATENCY_SLO for them.
+"""
+import copy
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, InterfaceError, connections
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+
+from . import metrics
+from .coalescing import render, request_key
+
+# Sent with responses served because they couldn't be refreshed.
+REVALIDATION_FAILED = '111 - "Revalidation Failed"'
+
+_refreshes = {}
+_refreshes_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.STALE_CACHE]
+
+
+def cache_key(request):
+    """Returns cache key of REST framework request"""
+    digest = hashlib.sha1(repr(request_key(request)).encode('utf-8'))
+    return 'stale:{}'.format(digest.hexdigest())
+
+
+def store(key, content, content_type):
+    get_cache().set(key, (content, content_type, time.time()),
+                    settings.STALE_IF_ERROR_MAX_AGE)
+
+
+def detach(view):
+    """Returns new instance of view with copy of its request, so response
+    can be computed in another thread after the request is finished.
+    """
+    clone = type(view)()
+    for name, value in vars(view).items():
+        if getattr(value, '__self__', None) is view:
+            # Handler bound by as_view() of viewsets.
+            value = getattr(clone, value.__name__)
+        setattr(clone, name, value)
+    # Paginator is stateful, a new one is made on access.
+    clone.__dict__.pop('_paginator', None)
+    original = view.request
+    request = clone.initialize_request(copy.copy(original._request),
+                                       *view.args, **view.kwargs)
+    request.user = original.user
+    request.auth = original.auth
+    request.accepted_renderer = original.accepted_renderer
+    request.accepted_media_type = original.accepted_media_type
+    request.version = original.version
+    request.versioning_scheme = original.versioning_scheme
+    clone.request = request
+    return clone
+
+
+class Refresh(threading.Thread):
+    """Computes response of view in background and stores it in cache.
+
+    Parameters
+    ----------
+    key : str
+        Cache key of the response.
+    view : StaleWhileRevalidateMixin
+        View of the request, refresh runs in a detached copy of it.
+    action : str
+        Name of the action computing the response, "list" or "retrieve".
+    args, kwargs
+        Arguments of the action.
+    """
+
+    def __init__(self, key, view, action, args, kwargs):
+        super().__init__(daemon=True)
+        self.key = key
+        self.view = detach(view)
+        self.handler = getattr(super(StaleWhileRevalidateMixin, self.view),
+                               action)
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            response = self.handler(self.view.request, *self.args,
+                                    **self.kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                self.result = render(self.view, response)
+                store(self.key, *self.result)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            with _refreshes_lock:
+                del _refreshes[self.key]
+            # Connections of this thread aren't closed by request_finished.
+            connections.close_all()
+
+
+def revalidate(key, view, action, args, kwargs):
+    """Returns refresh of key running in this process, starts one if
+    there is none.
+    """
+    with _refreshes_lock:
+        refresh = _refreshes.get(key)
+        if refresh is None:
+            refresh = _refreshes[key] = Refresh(key, view, action, args,
+                                                kwargs)
+            refresh.start()
+    return refresh
+
+
+def cached_response(entry, warning=None):
+    content, content_type, stored = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['Age'] = int(time.time() - stored)
+    if warning is not None:
+        response['Warning'] = warning
+    return response
+
+
+class StaleWhileRevalidateMixin:
+    """Serves list and retrieve actions from cache of rendered responses.
+
+    Browsable API pages hold user's data and are never cached.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.stale_while_revalidate(super().list, request, *args,
+                                           **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.stale_while_revalidate(super().retrieve, request, *args,
+                                           **kwargs)
+
+    def stale_while_revalidate(self, handler, request, *args, **kwargs):
+        if (not settings.STALE_WHILE_REVALIDATE_ENABLED or
+                isinstance(request.accepted_renderer, BrowsableAPIRenderer)):
+            return handler(request, *args, **kwargs)
+        key = cache_key(request)
+        entry = get_cache().get(key)
+        if entry is None:
+            metrics.record_cache('stale', False)
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                store(key, *render(self, response))
+            return response
+
+        age = time.time() - entry[2]
+        if age <= settings.STALE_MAX_AGE:
+            metrics.record_cache('stale', True)
+            if age > settings.STALE_REVALIDATE_AFTER:
+                revalidate(key, self, handler.__name__, args, kwargs)
+            return cached_response(entry)
+
+        refresh = revalidate(key, self, handler.__name__, args, kwargs)
+        refresh.join(settings.STALE_LATENCY_SLO)
+        if refresh.is_alive() or isinstance(refresh.error,
+                                            (DatabaseError, InterfaceError)):
+            # Slow refresh stores the response when it's done.
+            metrics.record_cache('stale', True)
+            return cached_response(entry, REVALIDATION_FAILED)
+        metrics.record_cache('stale', False)
+        if refresh.error is not None:
+            raise refresh.error
+        if refresh.result is None:
+            return handler(request, *args, **kwargs)
+        content, content_type = refresh.result
+        return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,202 @@
+"""Token bucket throttling shared by all workers of the node.
+
+Buckets live in memory-mapped `settings.THROTTLE_FILE`, a fixed size hash
+table of (key hash, tokens, update time) slots guarded by file lock, so
+limits hold for the client no matter which uwsgi worker serves it. Without
+`THROTTLE_FILE` buckets are kept in memory of the process.
+
+Rates are taken from REST framework's DEFAULT_THROTTLE_RATES: "10/minute"
+means bucket of 10 tokens refilled with 10 tokens per minute.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import permissions
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+# Key hash, tokens left and time of last update.
+SLOT = struct.Struct('Qdd')
+# Number of slots searched for the key before replacing the least recently
+# updated one.
+PROBES = 8
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Returns capacity of bucket and number of tokens added per second
+
+    Examples
+    -------
+    >>> parse_rate('30/min')
+    (30, 0.5)
+    """
+    number, period = rate.split('/')
+    number = int(number)
+    return number, number / PERIODS[period[0]]
+
+
+class Buckets:
+    """Token buckets stored in memory-mapped file or anonymous memory"""
+
+    def __init__(self, path=None, slots=4096):
+        self.lock = threading.Lock()
+        self.slots = slots
+        size = SLOT.size * slots
+        self.file = None
+        if path is None:
+            self.map = mmap.mmap(-1, size)
+            return
+        self.file = open(path, 'a+b')
+        with self.locked():
+            if os.fstat(self.file.fileno()).st_size < size:
+                self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    @contextmanager
+    def locked(self):
+        # File lock is held by the process, threads are excluded by the
+        # process lock.
+        with self.lock:
+            if self.file is None:
+                yield
+                return
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def find(self, digest):
+        """Returns position of slot of digest, of empty slot or of the least
+        recently updated one, which is replaced.
+        """
+        start = digest % self.slots
+        oldest, oldest_updated = None, None
+        for probe in range(PROBES):
+            position = (start + probe) % self.slots * SLOT.size
+            stored, _, updated = SLOT.unpack_from(self.map, position)
+            if stored in (digest, 0):
+                return position
+            if oldest is None or updated < oldest_updated:
+                oldest, oldest_updated = position, updated
+        return oldest
+
+    def consume(self, key, capacity, rate, now=None):
+        """Takes token from bucket of key.
+
+        Returns
+        -------
+        float
+            0 if token was taken, otherwise seconds until bucket has one.
+        """
+        if now is None:
+            now = time.time()
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(),
+            'little'
+        ) or 1
+        with self.locked():
+            position = self.find(digest)
+            stored, tokens, updated = SLOT.unpack_from(self.map, position)
+            if stored != digest:
+                tokens, updated = capacity, now
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            SLOT.pack_into(self.map, position, digest, tokens, now)
+        return wait
+
+
+_buckets = None
+_buckets_pid = None
+_buckets_lock = threading.Lock()
+
+
+def buckets():
+    """Returns buckets store of current process"""
+    global _buckets, _buckets_pid
+    pid = os.getpid()
+    if _buckets_pid != pid:
+        with _buckets_lock:
+            if _buckets_pid != pid:
+                _buckets = Buckets(settings.THROTTLE_FILE,
+                                   settings.THROTTLE_SLOTS)
+                _buckets_pid = pid
+    return _buckets
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle with bucket per client and scope.
+
+    Clients are identified by token, by user if they are authenticated
+    otherwise and by IP address if they are anonymous.
+    """
+    scope = None
+
+    def __init__(self):
+        self.wait_time = 0
+
+    def get_key(self, request):
+        if isinstance(request.auth, Token):
+            return 'token:{}'.format(request.auth.key)
+        if request.user and request.user.is_authenticated:
+            return 'user:{}'.format(request.user.pk)
+        return 'ip:{}'.format(self.get_ident(request))
+
+    def allow_request(self, request, view):
+        # Not using api_settings, which are replaced when settings are
+        # overridden.
+        rates = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+        rate = rates.get(self.scope)
+        if rate is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        key = '{}:{}'.format(self.scope, self.get_key(request))
+        self.wait_time = buckets().consume(key, capacity, per_second)
+        if self.wait_time:
+            metrics.THROTTLED_REQUESTS.inc((self.scope,))
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class SearchThrottle(TokenBucketThrottle):
+    scope = 'search'
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Throttles only requests changing data"""
+    scope = 'write'
+
+    def allow_request(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return super().allow_request(request, view)
+
+
+class BulkThrottle(TokenBucketThrottle):
+    scope = 'bulk'
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Throttles token requests by IP address"""
+    scope = 'auth'
+
+    def get_key(self, request):
+        return 'ip:{}'.format(self.get_ident(request))
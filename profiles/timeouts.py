@@ -0,0 +1,82 @@
+"""Per-endpoint database statement timeouts.
+
+Views with `StatementTimeoutMixin` run in a transaction with
+`SET LOCAL statement_timeout` taken from STATEMENT_TIMEOUTS, so a
+pathological query is cancelled by PostgreSQL instead of holding the
+connection. Cancelled queries are answered with 504. Timeouts aren't
+applied on other databases and to content of streaming responses, which is
+produced after the view has returned.
+
+GET and HEAD requests get the transaction only around list and retrieve
+actions, so mixins placed before `StatementTimeoutMixin`, like response
+caches, can answer them without opening it.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+from .utils import view_setting
+
+# SQLSTATE of queries cancelled by statement timeout or by user.
+QUERY_CANCELED = '57014'
+
+
+class StatementTimeout(APIException):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = 'Request took too long, try narrowing it down.'
+    default_code = 'statement_timeout'
+
+
+def is_query_canceled(exc):
+    return (isinstance(exc, OperationalError) and
+            getattr(exc.__cause__, 'pgcode', None) == QUERY_CANCELED)
+
+
+class StatementTimeoutMixin:
+    """Applies statement timeout of the view and action to its queries"""
+
+    def get_statement_timeout(self, request):
+        """Returns timeout in seconds or None"""
+        return view_setting(settings.STATEMENT_TIMEOUTS, self,
+                            request.method)
+
+    @contextmanager
+    def statement_timeout(self, request):
+        """Runs block in transaction with statement timeout of request"""
+        timeout = self.get_statement_timeout(request)
+        if timeout is None or connection.vendor != 'postgresql':
+            yield
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL statement_timeout = %s',
+                               [int(timeout * 1000)])
+            yield
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            # Applied by list and retrieve.
+            return super().dispatch(request, *args, **kwargs)
+        with self.statement_timeout(request):
+            return super().dispatch(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        with self.statement_timeout(request):
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.statement_timeout(request):
+            return super().retrieve(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if is_query_canceled(exc):
+            if connection.in_atomic_block:
+                # Transaction is aborted, it can't be committed.
+                transaction.set_rollback(True)
+            metrics.STATEMENT_TIMEOUTS.inc((type(self).__name__,))
+            exc = StatementTimeout()
+        return super().handle_exception(exc)
@@ -0,0 +1,144 @@
+"""Request tracing in Chrome trace event format.
+
+Sampled requests record nested spans of middleware, view dispatch,
+authentication, permission checks, `get_queryset`, serialization of every
+object and SQL queries. Spans of a request are appended to per-process
+rotating file as complete ("X") events of JSON array format, which trace
+viewers (chrome://tracing, Perfetto) open even without closing bracket.
+
+Requests are sampled with `settings.TRACING_SAMPLE_RATE` probability or
+when they have `X-Trace` header, if `settings.TRACING_ENABLED` is on.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+
+HEADER = 'HTTP_X_TRACE'
+
+_local = threading.local()
+
+# Offset of perf_counter() from wall clock, so timestamps of different
+# processes are comparable.
+_clock_offset = time.time() - time.perf_counter()
+
+
+class Trace:
+    """Spans recorded while processing request"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.events = []
+
+    def add(self, name, category, start, end, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X',
+                 'ts': round((start + _clock_offset) * 1e6, 1),
+                 'dur': round((end - start) * 1e6, 1),
+                 'pid': self.pid, 'tid': self.tid}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+
+def current():
+    """Returns trace of request processed in current thread or None"""
+    return getattr(_local, 'trace', None)
+
+
+def should_trace(request):
+    if not settings.TRACING_ENABLED:
+        return False
+    return (HEADER in request.META or
+            random.random() < settings.TRACING_SAMPLE_RATE)
+
+
+@contextmanager
+def collect():
+    """Records spans of the block, yields Trace instance"""
+    previous = current()
+    _local.trace = trace = Trace()
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name, category, args=None):
+    """Records the block as span of current trace, if any"""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, category, start, time.perf_counter(), args)
+
+
+def trace_query(execute, sql, params, many, context):
+    """Execute wrapper recording queries as spans"""
+    with span('sql', 'db', {'sql': sql, 'many': many}):
+        return execute(sql, params, many, context)
+
+
+class TraceFileHandler(RotatingFileHandler):
+    """Rotating file handler starting every file with opening bracket of
+    JSON array.
+    """
+    terminator = ''
+    header = '[\n'
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write(self.header)
+        return stream
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        # Trace larger than maxBytes is written to fresh file anyway.
+        if self.stream.tell() <= len(self.header):
+            return False
+        return super().shouldRollover(record)
+
+
+_handler = None
+_handler_pid = None
+_handler_lock = threading.Lock()
+
+
+def get_handler():
+    """Returns trace file handler of current process"""
+    global _handler, _handler_pid
+    pid = os.getpid()
+    if _handler_pid != pid:
+        with _handler_lock:
+            if _handler_pid != pid:
+                _handler = TraceFileHandler(
+                    settings.TRACING_FILE.format(pid=pid),
+                    maxBytes=settings.TRACING_MAX_BYTES,
+                    backupCount=settings.TRACING_BACKUP_COUNT,
+                    delay=True
+                )
+                _handler_pid = pid
+    return _handler
+
+
+def write(trace):
+    """Appends events of trace to the trace file"""
+    if not trace.events:
+        return
+    content = ''.join(json.dumps(event) + ',\n' for event in trace.events)
+    # Whole trace is written as one record, so files are rotated only
+    # between traces.
+    get_handler().handle(logging.makeLogRecord({'msg': content}))
@@ -11,6 +11,10 @@ router.register(r'users', views.UserViewSet)
 router.register(r'groups', views.GroupViewSet)
 
 urlpatterns = [
+    url(r'^batch$', views.BatchView.as_view(), name='batch'),
+    url(r'^events/$', views.EventStreamView.as_view(), name='events'),
+    url(r'^users/bulk$', views.BulkUserCreateView.as_view(), name='bulk'),
+    url(r'^users/export$', views.ExportView.as_view(), name='export'),
     url(r'^users/search$', views.SearchView.as_view(), name='search'),
     url(r'^users/(?P<username>[\w-]+)/groups/$',
         views.UserGroupsView.as_view(),
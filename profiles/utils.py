@@ -1,4 +1,10 @@
 from datetime import datetime
+from itertools import islice
+
+from django.utils.http import RFC3986_SUBDELIMS, urlquote
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+
 
 def convert_date(input_formats, value):
     """Tries to convert date string using multiple input_formats
@@ -27,3 +33,100 @@ def convert_date(input_formats, value):
         except ValueError:
             continue
     return None
+
+
+# Placeholder lookup value, must match router's default lookup regex.
+URL_PLACEHOLDER = 'URLPLACEHOLDER'
+
+
+def url_template(view_name, lookup_kwarg, request=None, format=None):
+    """Resolves URL of view once and returns function that builds URLs
+    for different lookup values.
+
+    Parameters
+    ----------
+    view_name : str
+        Name of URL pattern.
+    lookup_kwarg : str
+        URL keyword argument that will be substituted.
+    request : HttpRequest or None
+        If provided, URLs are absolute.
+    format : str or None
+        Format suffix.
+
+    Returns
+    -------
+    function
+        Takes lookup value and returns URL, value is quoted the same way
+        `reverse()` quotes it.
+
+    Examples
+    -------
+    >>> build_url = url_template('api:user-detail', 'username')
+    >>> build_url('Dimka')
+    '/api/users/Dimka/'
+    """
+    url = reverse(view_name, kwargs={lookup_kwarg: URL_PLACEHOLDER},
+                  request=request, format=format)
+    prefix, suffix = url.split(URL_PLACEHOLDER)
+    safe = RFC3986_SUBDELIMS + '/~:@'
+
+    def build_url(value):
+        return prefix + urlquote(value, safe=safe) + suffix
+
+    return build_url
+
+
+def view_setting(mapping, view, method, default=None):
+    """Returns value of mapping for REST framework view, looked up by
+    "View.action" and then by "View" key.
+
+    Parameters
+    ----------
+    mapping : dict
+        Values keyed by view class name, optionally followed by viewset
+        action or lowercased method of other views.
+    view : function or APIView
+        View function returned by `as_view()` or view instance.
+    method : str
+        Request method.
+    default
+        Returned for views missing in mapping and non REST framework views.
+
+    Examples
+    -------
+    >>> from profiles.views import UserViewSet
+    >>> view = UserViewSet.as_view({'get': 'list'})
+    >>> view_setting({'UserViewSet.list': 1, 'UserViewSet': 2}, view, 'GET')
+    1
+    """
+    if isinstance(view, APIView):
+        cls, actions = type(view), getattr(view, 'action_map', None)
+    else:
+        cls = getattr(view, 'cls', None)
+        actions = getattr(view, 'actions', None)
+    if cls is None:
+        return default
+    if actions is not None:
+        action = actions.get(method.lower())
+    else:
+        action = method.lower()
+    name = cls.__name__
+    return mapping.get('{}.{}'.format(name, action),
+                       mapping.get(name, default))
+
+
+def chunked(iterable, size):
+    """Splits iterable into lists of given size
+
+    Examples
+    -------
+    >>> list(chunked(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
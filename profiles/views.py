@@ -1,17 +1,39 @@
+import queue
+import time
 from distutils.util import strtobool
 
+from django.conf import settings
 from django.contrib.auth.models import Group
+from django.db import transaction
 from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 from rest_framework import generics, viewsets
-from rest_framework import permissions
+from rest_framework import permissions, status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from . import batch, events, export, metrics
+from .authentication import QueryStringTokenAuthentication
+from .coalescing import SingleFlightMixin
+from .fragments import FragmentCacheMixin
+from .instrumentation import (InstrumentedGenericViewMixin,
+                              InstrumentedViewMixin)
 from .models import User
+from .parsers import JSONArrayStreamParser
 from .permissions import (ActivateFirstIfInactive,
                           CantEditSuperuserIfNotSuperuser,
-                          DissallowAdminGroupDeletion)
-from .serializers import (GroupDetailSerializer, GroupSerializer,
-                          UserGroupsSerializer, UserSerializer)
-from .utils import convert_date
+                          DissallowAdminGroupDeletion, IsAllowedMetricsClient)
+from .renderers import (CSVRenderer, EventStreamRenderer, NDJSONRenderer,
+                        PrometheusRenderer)
+from .serializers import (BatchSerializer, GroupDetailSerializer,
+                          GroupSerializer, UserGroupsSerializer,
+                          UserSerializer)
+from .stale import StaleWhileRevalidateMixin
+from .throttling import BulkThrottle, SearchThrottle, WriteThrottle
+from .timeouts import StatementTimeoutMixin
+from .utils import chunked, convert_date, url_template
 
 # Need to set permissions explicitly, because docs says:
 # Note: when you set new permission classes through class attribute or
@@ -19,7 +41,9 @@ from .utils import convert_date
 # over the settings.py file.
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(InstrumentedGenericViewMixin, StaleWhileRevalidateMixin,
+                  SingleFlightMixin, StatementTimeoutMixin,
+                  FragmentCacheMixin, viewsets.ModelViewSet):
     """
     retrieve:
     Return requested user.
@@ -42,9 +66,13 @@ class UserViewSet(viewsets.ModelViewSet):
                           permissions.DjangoModelPermissions,
                           ActivateFirstIfInactive,
                           CantEditSuperuserIfNotSuperuser)
+    throttle_classes = (WriteThrottle,)
+    fragment_fields = ('last_update',)
 
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(InstrumentedGenericViewMixin, StaleWhileRevalidateMixin,
+                   SingleFlightMixin, StatementTimeoutMixin,
+                   FragmentCacheMixin, viewsets.ModelViewSet):
     """
     retrieve:
     Return requested group.
@@ -67,6 +95,8 @@ class GroupViewSet(viewsets.ModelViewSet):
     permission_classes = (permissions.IsAuthenticated,
                           permissions.DjangoModelPermissions,
                           DissallowAdminGroupDeletion)
+    throttle_classes = (WriteThrottle,)
+    fragment_fields = ('users_count',)
 
     def get_serializer_class(self):
         if self.action in ['retrieve', 'update', 'partial_update']:
@@ -74,7 +104,8 @@ class GroupViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
 
-class UserGroupsView(generics.RetrieveUpdateAPIView):
+class UserGroupsView(InstrumentedGenericViewMixin, StatementTimeoutMixin,
+                     generics.RetrieveUpdateAPIView):
     """
     get:
     Returns user's groups
@@ -87,14 +118,19 @@ class UserGroupsView(generics.RetrieveUpdateAPIView):
     http_method_names = ['get', 'put', 'head', 'options']
     lookup_field = 'username'
     lookup_url_kwarg = 'username'
+    throttle_classes = (WriteThrottle,)
 
 
-class SearchView(generics.ListAPIView):
+class SearchView(InstrumentedGenericViewMixin, StaleWhileRevalidateMixin,
+                 SingleFlightMixin, StatementTimeoutMixin,
+                 FragmentCacheMixin, generics.ListAPIView):
     """View allow users to perform user search either entering part of user's
     name or by entering full birth date or full email.
     """
 
     serializer_class = UserSerializer
+    throttle_classes = (SearchThrottle,)
+    fragment_fields = ('last_update',)
 
     def get_queryset(self):
         """Filtering Query against user provided params.
@@ -142,3 +178,213 @@ class SearchView(generics.ListAPIView):
                     Q(email=query)
                 )
         return queryset
+
+
+class EventStreamView(InstrumentedViewMixin, APIView):
+    """
+    get:
+    Streams users, addresses and groups change notifications as
+    server-sent events.
+
+    Stream can be limited to some resource types with `types` param,
+    e.g. `?types=user,group`.
+    """
+    authentication_classes = (
+        tuple(api_settings.DEFAULT_AUTHENTICATION_CLASSES) +
+        (QueryStringTokenAuthentication,)
+    )
+    permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = (EventStreamRenderer,)
+    allow_query_string_token = True
+    # Response is streamed, so it can't be batched.
+    streaming = True
+
+    def get(self, request, *args, **kwargs):
+        types = request.query_params.get('types')
+        if types is not None:
+            types = set(filter(None, types.split(',')))
+            unknown = types - set(events.EVENT_TYPES)
+            if unknown:
+                raise ValidationError(
+                    {'types': 'Unknown types: {}'.format(
+                        ', '.join(sorted(unknown)))}
+                )
+        response = StreamingHttpResponse(self.stream(types),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # URL may hold the token, see QueryStringTokenAuthentication.
+        response['Referrer-Policy'] = 'no-referrer'
+        # Disable nginx buffering, otherwise events are delivered in bulk.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, types):
+        """Yields events until connection lifetime expires.
+
+        Stream is closed periodically, so long lived connections don't pin
+        workers forever, clients reconnect automatically. Subscription is
+        made once the body is iterated, so responses which are never sent,
+        e.g. to HEAD requests, don't leave it behind.
+        """
+        subscription = events.broker.subscribe(types)
+        deadline = time.monotonic() + settings.EVENTS_STREAM_LIFETIME
+        try:
+            yield 'retry: {}\n\n'.format(settings.EVENTS_RETRY_MS)
+            while time.monotonic() < deadline:
+                if subscription.dropped:
+                    yield 'event: dropped\ndata: {}\n\n'
+                    return
+                try:
+                    event = subscription.get(
+                        timeout=settings.EVENTS_HEARTBEAT_INTERVAL
+                    )
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield events.format_sse(event)
+        finally:
+            subscription.close()
+
+
+class BatchView(InstrumentedViewMixin, APIView):
+    """
+    post:
+    Executes list of API requests and returns all responses at once.
+
+    Sub-requests are run on behalf of the requesting user, each of them is
+    checked against permissions of endpoint it targets. Batch that contains
+    only read-only requests can be run in parallel with `"parallel": true`.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    serializer_class = BatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.execute(request,
+                                serializer.validated_data['requests'],
+                                serializer.validated_data['parallel'],
+                                settings.BATCH_MAX_WORKERS)
+        return Response(results)
+
+
+class ExportView(InstrumentedViewMixin, APIView):
+    """
+    get:
+    Streams whole users directory as CSV or newline delimited JSON,
+    choosen with `format` param (`?format=csv` or `?format=ndjson`).
+
+    Exported fields are the same as returned by users endpoint, output is
+    gzip compressed if client accepts it.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+    streaming = True
+
+    def get(self, request, *args, **kwargs):
+        serializer = UserSerializer(context={'request': request})
+        # Not passing request to reverse, so `format` param isn't preserved
+        # in users urls.
+        base_url = request.build_absolute_uri('/')[:-1]
+        build_path = url_template('api:user-detail', 'username')
+
+        def build_url(username):
+            return base_url + build_path(username)
+
+        exporter = export.EXPORTERS[request.accepted_renderer.format](
+            serializer, build_url
+        )
+        content = export.encode(exporter.chunks())
+        compress = export.accepts_gzip(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if compress:
+            content = export.gzip(content)
+
+        response = StreamingHttpResponse(content,
+                                         content_type=exporter.content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="users.{}"'.format(exporter.extension)
+        )
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class BulkUserCreateView(InstrumentedGenericViewMixin, StatementTimeoutMixin,
+                         generics.GenericAPIView):
+    """
+    post:
+    Creates users from JSON array of users data.
+
+    Array is parsed lazily and users are validated and created in chunks,
+    so large payloads don't have to fit in memory. Either all users are
+    created or none of them, errors are reported with item's index.
+    """
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+    parser_classes = (JSONArrayStreamParser,)
+    permission_classes = (permissions.IsAuthenticated,
+                          permissions.DjangoModelPermissions)
+    throttle_classes = (BulkThrottle,)
+    unique_fields = ('username', 'email')
+
+    @transaction.atomic
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if isinstance(items, dict):
+            raise ParseError('Expected a list of items.')
+        created = 0
+        seen = {field: {} for field in self.unique_fields}
+        for chunk in chunked(items, settings.BULK_CHUNK_SIZE):
+            serializer = self.get_serializer(data=chunk, many=True)
+            valid = serializer.is_valid()
+            errors = [
+                dict(item_errors, **duplicates) for item_errors, duplicates
+                in zip(serializer.errors if not valid else [{}] * len(chunk),
+                       self.find_duplicates(chunk, created, seen))
+            ]
+            if any(errors):
+                # Discard users created from previous chunks.
+                transaction.set_rollback(True)
+                errors = [{'index': created + index, 'errors': item_errors}
+                          for index, item_errors in enumerate(errors)
+                          if item_errors]
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save()
+            created += len(chunk)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+    def find_duplicates(self, chunk, offset, seen):
+        """Returns errors of chunk items repeating unique field of earlier
+        item of the payload, validators only check existing users.
+
+        `seen` maps values of each unique field to index of their first
+        item, it's updated with the chunk.
+        """
+        duplicates = []
+        for index, item in enumerate(chunk, offset):
+            errors = {}
+            for field, indexes in seen.items():
+                value = item.get(field) if isinstance(item, dict) else None
+                if not isinstance(value, str) or not value.strip():
+                    continue
+                first = indexes.setdefault(value.strip(), index)
+                if first != index:
+                    errors[field] = ['Same {} as item {}.'.format(field,
+                                                                  first)]
+            duplicates.append(errors)
+        return duplicates
+
+
+class MetricsView(InstrumentedViewMixin, APIView):
+    """
+    get:
+    Returns metrics of all workers in Prometheus text exposition format.
+    """
+    authentication_classes = ()
+    permission_classes = (IsAllowedMetricsClient,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(metrics.expose())
@@ -0,0 +1,90 @@
+"""Warmup of worker before its first request.
+
+`prepare()` does work every process would otherwise do lazily on its first
+requests: compiles URL patterns, imports classes named in REST framework
+settings and builds fields of serializers. It doesn't touch database, so
+under uwsgi it runs in master process and forked workers share the result.
+`connect()` opens database connections and runs WARMUP_HOOKS priming
+caches, it must run in every worker after fork. Database errors are
+logged and don't stop the worker, requests connect again. Connections are
+reused by the first requests only if they're persistent, see CONN_MAX_AGE
+in production settings.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+from .serializers import (GroupDetailSerializer, GroupSerializer,
+                          UserGroupsSerializer, UserSerializer)
+
+logger = logging.getLogger(__name__)
+
+SERIALIZERS = (UserSerializer, GroupDetailSerializer, GroupSerializer,
+               UserGroupsSerializer)
+
+
+def compile_patterns(resolver):
+    """Compiles regexes of all patterns and reverse lookups of resolver"""
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.regex
+        if hasattr(pattern, 'url_patterns'):
+            compile_patterns(pattern)
+
+
+def prepare():
+    """Does lazy initialization of URLs, settings and serializers"""
+    compile_patterns(get_resolver())
+    for name in api_settings.defaults:
+        getattr(api_settings, name)
+    for serializer_class in SERIALIZERS:
+        serializer_class().fields
+        serializer_class(many=True).child.fields
+
+
+def connect():
+    """Opens database connections and primes caches. Hooks are skipped if
+    a connection can't be opened.
+    """
+    connected = True
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.exception('Warmup connection to database %r failed',
+                             connection.alias)
+            connected = False
+    if not connected:
+        return
+    for path in settings.WARMUP_HOOKS:
+        try:
+            import_string(path)()
+        except DatabaseError:
+            logger.exception('Warmup hook %s failed', path)
+
+
+def install():
+    """Prepares worker and opens connections, after fork if application
+    is loaded by uwsgi master.
+    """
+    if not settings.WARMUP_ENABLED:
+        return
+    start = time.perf_counter()
+    prepare()
+    logger.info('Worker prepared in %.1f ms',
+                (time.perf_counter() - start) * 1000)
+    try:
+        import uwsgi
+    except ImportError:
+        uwsgi = None
+    if uwsgi is not None and uwsgi.worker_id() == 0:
+        # Application is loaded by master, workers are forked later.
+        from uwsgidecorators import postfork
+        postfork(connect)
+    else:
+        connect()
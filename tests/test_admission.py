@@ -0,0 +1,136 @@
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import admission
+
+from .utils import CreateUsersMixin
+
+
+class TestAdmissionControl(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+        settings_override = self.settings(ADMISSION_CLASSES={
+            'cheap': (None, 3), 'default': (None, 3), 'expensive': (1, 2),
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Forcing creation of counters of overridden classes.
+        admission._in_flight_pid = None
+        self.addCleanup(setattr, admission, '_in_flight_pid', None)
+
+    def test_expensive_requests_are_shed_first(self):
+        admission.in_flight().add('expensive', 1)
+
+        response = self.client.get(reverse('api:user-list'))
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+        response = self.client.get(reverse('api:user-detail',
+                                           args=['Lenka']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cheap_requests_are_admitted_until_total_limit(self):
+        admission.in_flight().add('default', 2)
+
+        response = self.client.get(reverse('api:search'))
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        response = self.client.get(reverse('api:user-detail',
+                                           args=['Lenka']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        admission.in_flight().add('default', 1)
+        response = self.client.get(reverse('api:user-detail',
+                                           args=['Lenka']))
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_requests_are_counted_out(self):
+        self.client.get(reverse('api:user-list'))
+        self.client.get(reverse('api:user-detail', args=['Lenka']))
+
+        self.assertEqual(admission.in_flight().totals(),
+                         {'cheap': 0, 'default': 0, 'expensive': 0})
+
+    def test_streaming_requests_are_counted_out_when_closed(self):
+        response = self.client.get(reverse('api:export'))
+
+        self.assertEqual(admission.in_flight().totals()['default'], 1)
+        b''.join(response.streaming_content)
+        self.assertEqual(admission.in_flight().totals()['default'], 0)
+
+    def test_event_streams_arent_admission_controlled(self):
+        admission.in_flight().add('default', 3)
+
+        response = self.client.get(reverse('api:events'),
+                                   HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+
+    def test_in_flight_requests_are_exposed(self):
+        response = self.client.get(reverse('metrics'))
+
+        content = response.content.decode()
+        self.assertIn('# TYPE xusers_in_flight_requests gauge', content)
+        # The metrics request itself.
+        self.assertIn('xusers_in_flight_requests{class="default"} 1',
+                      content)
+        self.assertIn('xusers_in_flight_requests{class="cheap"} 0', content)
+
+
+class TestSharedInFlight(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'admission.db')
+
+    def write_row(self, pid, *counts):
+        counters = admission.InFlight(['a', 'b'], self.path, processes=2)
+        position = counters.row.size
+        counters.row.pack_into(counters.map, position, pid, *counts)
+
+    def test_counts_of_all_processes_are_summed(self):
+        self.write_row(os.getppid(), 2, 3)
+
+        counters = admission.InFlight(['a', 'b'], self.path, processes=2)
+        counters.add('a', 1)
+
+        self.assertEqual(counters.totals(), {'a': 3, 'b': 3})
+
+    def test_rows_of_exited_processes_are_reused(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        self.write_row(os.getppid(), 0, 0)
+        # Taking the first row.
+        admission.InFlight(['a', 'b'], self.path, processes=2)
+        with open(self.path, 'r+b') as f:
+            f.write(struct.pack('qqq', process.pid, 5, 5))
+
+        counters = admission.InFlight(['a', 'b'], self.path, processes=2)
+
+        self.assertEqual(counters.position, 0)
+        self.assertEqual(counters.totals(), {'a': 0, 'b': 0})
+
+    def test_rows_of_exited_processes_arent_counted(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        self.write_row(process.pid, 5, 5)
+
+        counters = admission.InFlight(['a', 'b'], self.path, processes=2)
+        counters.add('a', 1)
+
+        self.assertEqual(counters.totals(), {'a': 1, 'b': 0})
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import allocations, benchmarks
+
+from .utils import CreateUsersMixin
+
+
+class TestAllocationProfileRequest(CreateUsersMixin, APITestCase):
+
+    def test_admin_gets_allocation_report(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.admin_user.auth_token.key)
+
+        response = self.client.get(reverse('api:user-list'),
+                                   {'_profile': 'alloc'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="profile.alloc"')
+        report = response.content.decode()
+        self.assertRegex(report, r'(?m)^serialize: peak .+, retained .+$')
+        self.assertRegex(report, r'(?m)^render: peak .+, retained .+$')
+        self.assertRegex(report, r'(?m)^    \S+:\d+ .+ in -?\d+ blocks$')
+
+
+class TestAllocationBenchmark(TestCase):
+
+    def test_phases_of_cases_are_profiled(self):
+        results = benchmarks.run_allocations(30, cases=['users-list'],
+                                             limit=3)
+
+        self.assertEqual(list(results), ['users-list'])
+        phases = results['users-list']
+        self.assertEqual(sorted(phases), ['render', 'serialize'])
+        for phase in phases.values():
+            self.assertGreater(phase['peak'], 0)
+            self.assertLessEqual(len(phase['top']), 3)
+            self.assertTrue(phase['top'])
+
+
+class TestCompare(SimpleTestCase):
+
+    def test_reports_changes_against_baseline(self):
+        baseline = {'1k': {'users-list': {
+            'serialize': {'peak': 2048, 'retained': 1024, 'top': []}}}}
+        results = {'1k': {'users-list': {
+            'serialize': {'peak': 1024, 'retained': 1024, 'top': []},
+            'render': {'peak': 512, 'retained': 0, 'top': []}}}}
+
+        report = allocations.compare(results, baseline).splitlines()
+
+        self.assertIn('1k users-list serialize peak: 2.0 KiB -> 1.0 KiB '
+                      '(-50.0%)', report)
+        self.assertIn('1k users-list serialize retained: 1.0 KiB -> '
+                      '1.0 KiB (+0.0%)', report)
+        self.assertIn('1k users-list render peak: 512 B (new)', report)
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from profiles.models import User
+from profiles.serializers import UserSerializer
+from profiles.views import UserViewSet
+
+from .utils import CreateUsersMixin
+
+
+class TestBatchEndpoint(CreateUsersMixin, APITestCase):
+    """Test that batch endpoint executes sub-requests on behalf of user"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:batch')
+        request = APIRequestFactory().get('/something/')
+        request.user = self.admin_user
+        self.context = {'request': request}
+
+    def authenticate(self, user):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + user.auth_token.key
+        )
+
+    def test_anonymous_user_cant_send_batch(self):
+        payload = {'requests': [{'method': 'GET', 'url': '/api/users/'}]}
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_returns_responses_in_order(self):
+        self.authenticate(self.admin_user)
+        payload = {'requests': [
+            {'method': 'GET', 'url': '/api/users/'},
+            {'method': 'GET', 'url': '/api/users/search?q=Lenka'},
+            {'method': 'get', 'url': '/api/users/Dimka/groups/'},
+            {'method': 'GET', 'url': '/api/users/nobody/'},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        users = UserSerializer(User.objects.all(), many=True,
+                               context=self.context)
+        self.assertEqual(response.data[0],
+                         {'status': 200, 'body': users.data})
+        self.assertEqual(response.data[1]['status'], 200)
+        self.assertEqual(response.data[2],
+                         {'status': 200,
+                          'body': {'groups': ['Administrators']}})
+        self.assertEqual(response.data[3]['status'], 404)
+
+    def test_sub_requests_are_checked_against_endpoint_permissions(self):
+        self.authenticate(self.regular_user)
+        payload = {'requests': [
+            {'method': 'PATCH', 'url': '/api/users/Lenka/',
+             'body': {'first_name': 'Elena'}},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 403)
+        self.regular_user.refresh_from_db()
+        self.assertEqual(self.regular_user.first_name, 'user_first_name')
+
+    def test_write_sub_requests_are_applied(self):
+        self.authenticate(self.admin_user)
+        payload = {'requests': [
+            {'method': 'PATCH', 'url': '/api/users/Lenka/',
+             'body': {'first_name': 'Elena'}},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.data[0]['status'], 200)
+        self.regular_user.refresh_from_db()
+        self.assertEqual(self.regular_user.first_name, 'Elena')
+
+    def test_only_api_endpoints_can_be_batched(self):
+        self.authenticate(self.admin_user)
+        payload = {'requests': [
+            {'method': 'GET', 'url': '/admin/'},
+            {'method': 'POST', 'url': '/api/batch', 'body': {}},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.data[0]['status'], 400)
+        self.assertEqual(response.data[1]['status'], 400)
+
+    def test_streaming_endpoints_cant_be_batched(self):
+        self.authenticate(self.admin_user)
+        payload = {'requests': [
+            {'method': 'GET', 'url': '/api/users/export?format=csv'},
+            {'method': 'GET', 'url': '/api/events/'},
+            {'method': 'GET', 'url': '/api/users/Lenka/'},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 400)
+        self.assertEqual(response.data[1]['status'], 400)
+        self.assertEqual(response.data[2]['status'], 200)
+
+    def test_failing_sub_request_doesnt_fail_batch(self):
+        self.authenticate(self.admin_user)
+        payload = {'requests': [
+            {'method': 'GET', 'url': '/api/users/'},
+            {'method': 'GET', 'url': '/api/users/Lenka/'},
+        ]}
+
+        with mock.patch.object(UserViewSet, 'list',
+                               side_effect=RuntimeError), \
+                self.assertLogs('profiles.batch', 'ERROR'):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 500)
+        self.assertEqual(response.data[1]['status'], 200)
+
+    def test_batch_size_is_limited(self):
+        self.authenticate(self.admin_user)
+        with self.settings(BATCH_MAX_REQUESTS=1):
+            payload = {'requests': [{'method': 'GET', 'url': '/api/users/'},
+                                    {'method': 'GET', 'url': '/api/groups/'}]}
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from profiles import benchmarks
+
+
+class TestBenchmarks(TestCase):
+    """Smoke test of benchmark suite on tiny dataset"""
+
+    def test_all_cases_are_measured(self):
+        results = benchmarks.run(30, repeat=1)
+
+        names = [name for name, _ in benchmarks.Suite().cases()]
+        self.assertEqual(sorted(results), sorted(names))
+        for name, metrics in results.items():
+            self.assertEqual(sorted(metrics), sorted(benchmarks.METRICS))
+            # Middleware cases don't reach database.
+            if not name.startswith('middleware-'):
+                self.assertGreater(metrics['queries'], 0)
+
+    def test_compare_reports_regressions_over_tolerance(self):
+        baseline = {'1k': {'users-list': {'time': 1.0, 'queries': 10,
+                                          'peak_memory': 1000}}}
+        results = {'1k': {'users-list': {'time': 1.05, 'queries': 11,
+                                         'peak_memory': 2000},
+                          'groups-list': {'time': 5, 'queries': 5,
+                                          'peak_memory': 5}}}
+
+        regressions = benchmarks.compare(results, baseline, tolerance=0.1)
+
+        self.assertEqual(regressions, [
+            ('1k', 'users-list', 'queries', 10, 11),
+            ('1k', 'users-list', 'peak_memory', 1000, 2000),
+        ])
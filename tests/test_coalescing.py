@@ -0,0 +1,98 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from profiles import coalescing
+from profiles.fragments import FragmentCacheMixin
+
+from .utils import CreateUsersMixin
+
+
+class TestSingleFlight(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+
+    def landed_flight(self):
+        flight = coalescing.Flight()
+        flight.result = (b'[]', 'application/json')
+        flight.landed.set()
+        return flight
+
+    def test_waiting_request_gets_result_of_flight(self):
+        with mock.patch.object(coalescing, 'join',
+                               return_value=(self.landed_flight(), False)):
+            response = self.client.get(reverse('api:user-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'[]')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_browsable_api_is_not_shared(self):
+        with mock.patch.object(coalescing, 'join') as join, \
+                mock.patch.object(BrowsableAPIRenderer, 'render',
+                                  return_value=b'page'):
+            response = self.client.get(reverse('api:user-list'),
+                                       HTTP_ACCEPT='text/html')
+
+        self.assertEqual(response.content, b'page')
+        join.assert_not_called()
+
+    def test_keys_differ_by_permission_level_and_query(self):
+        keys = []
+
+        def join(key):
+            keys.append(key)
+            return coalescing.Flight(), True
+
+        with mock.patch.object(coalescing, 'join', join):
+            self.client.get(reverse('api:search'), {'b': 1, 'a': 2})
+            self.client.get(reverse('api:search'), {'a': 2, 'b': 1})
+            self.client.force_authenticate(self.regular_user)
+            self.client.get(reverse('api:search'), {'a': 2, 'b': 1})
+
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[1], keys[2])
+        self.assertEqual(keys[0][4:6], ('a=2&b=1', 'full'))
+        self.assertEqual(keys[2][5], 'basic')
+
+
+class TestConcurrentRequests(CreateUsersMixin, TransactionTestCase):
+
+    def test_concurrent_identical_requests_are_computed_once(self):
+        calls = []
+        original = FragmentCacheMixin.list
+
+        def slow_list(view, request, *args, **kwargs):
+            calls.append(request.path)
+            time.sleep(0.3)
+            return original(view, request, *args, **kwargs)
+
+        responses = []
+
+        def get():
+            client = APIClient()
+            client.force_authenticate(self.admin_user)
+            responses.append(client.get(reverse('api:user-list')))
+
+        with mock.patch.object(FragmentCacheMixin, 'list', slow_list):
+            threads = [threading.Thread(target=get) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.05)
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({response.content for response in responses}),
+                         1)
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from profiles.schema import CachedSchemaView
+
+
+class TestDocs(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'schema.json')
+        settings_override = override_settings(API_SCHEMA_FILE=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Schema is loaded once per process.
+        CachedSchemaView._schema = None
+        self.addCleanup(setattr, CachedSchemaView, '_schema', None)
+
+    def test_docs_are_served(self):
+        response = self.client.get(reverse('api-docs:docs-index'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'xUsers Managment System API')
+
+        response = self.client.get(reverse('api-docs:schema-js'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            response['Content-Type'].startswith('application/javascript'))
+
+    def test_schema_is_served_from_file(self):
+        call_command('generate_schema', stdout=StringIO())
+        with open(self.path) as f:
+            schema = json.load(f)
+        schema['_meta']['title'] = 'Generated on deploy'
+        with open(self.path, 'w') as f:
+            json.dump(schema, f)
+
+        response = self.client.get(reverse('api-docs:docs-index'),
+                                   HTTP_ACCEPT='application/coreapi+json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        served = json.loads(response.content.decode())
+        self.assertEqual(served['_meta']['title'], 'Generated on deploy')
+        self.assertEqual(served['_meta']['url'],
+                         'http://testserver/api/docs/')
+        self.assertIn('users', served['api'])
+
+
+class TestImportReport(TestCase):
+
+    def test_reports_import_time_of_worker_boot(self):
+        out = StringIO()
+
+        call_command('import_report', top=3, by='module', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertRegex(lines[0], r'^Total import time: [\d.]+ ms, \d+ '
+                                   r'modules$')
+        self.assertEqual(len(lines), 4)
+        self.assertRegex(lines[1], r'^ +[\d.]+ ms +[\d.]+%  \S+$')
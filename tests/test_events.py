@@ -0,0 +1,143 @@
+import json
+import os
+import queue
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import events
+
+from .utils import CreateUsersMixin, create_group, create_user
+
+
+class TestBroker(APITestCase):
+    """Test that broker fans events out to interested subscribers only"""
+
+    def setUp(self):
+        self.broker = events.Broker()
+
+    def test_subscriber_receives_only_requested_types(self):
+        users = self.broker.subscribe(types={'user'}, maxsize=10)
+        everything = self.broker.subscribe(maxsize=10)
+
+        self.broker.publish(events.Event('group', 'created', 1, 'Managers'))
+        self.broker.publish(events.Event('user', 'updated', 2, 'Dimka'))
+
+        self.assertEqual(users.get(timeout=0).type, 'user')
+        self.assertEqual(everything.get(timeout=0).type, 'group')
+        self.assertEqual(everything.get(timeout=0).type, 'user')
+
+    def test_slow_subscriber_is_dropped(self):
+        subscription = self.broker.subscribe(maxsize=1)
+        self.broker.publish(events.Event('user', 'updated', 1, 'Dimka'))
+        self.broker.publish(events.Event('user', 'updated', 1, 'Dimka'))
+
+        self.assertTrue(subscription.dropped)
+        self.assertEqual(len(self.broker), 0)
+
+    def test_relay_skips_events_of_own_process_only(self):
+        relay = events.NotifyRelay(self.broker)
+        subscription = self.broker.subscribe(maxsize=10)
+        payload = json.dumps(dict(
+            events.Event('user', 'updated', 1, 'Dimka')._asdict(),
+            origin=events.origin()
+        ))
+
+        relay._deliver(payload)
+        # Worker forked from the process which published the event.
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            relay._deliver(payload)
+
+        self.assertEqual(subscription.get(timeout=0).key, 'Dimka')
+        with self.assertRaises(queue.Empty):
+            subscription.get(timeout=0)
+
+
+class TestSignalsPublishEvents(TransactionTestCase):
+    """Test that model changes are published after commit"""
+
+    def setUp(self):
+        self.subscription = events.broker.subscribe(maxsize=100)
+
+    def tearDown(self):
+        self.subscription.close()
+
+    def drain(self):
+        received = []
+        while True:
+            try:
+                received.append(self.subscription.get(timeout=0))
+            except events.queue.Empty:
+                return received
+
+    def test_user_creation_and_membership_are_published(self):
+        user = create_user('Dimka', 'dimka@email.com')
+        group = create_group('Managers')
+        self.drain()
+
+        user.groups.add(group)
+
+        received = self.drain()
+        self.assertIn(events.Event('user', 'membership', user.pk, 'Dimka'),
+                      received)
+        self.assertIn(events.Event('group', 'membership', group.pk, None),
+                      received)
+
+
+class TestEventStreamEndpoint(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:events')
+
+    def test_anonymous_users_cant_subscribe(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_can_be_passed_in_query_string(self):
+        response = self.client.get(
+            self.url, {'token': self.regular_user.auth_token.key},
+            HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+
+        events.broker.publish(events.Event('group', 'created', 1, 'Managers'))
+        self.assertTrue(next(stream).startswith(b'event: group\n'))
+        response.close()
+
+    def test_subscription_is_made_when_stream_is_iterated(self):
+        subscriptions = len(events.broker)
+        response = self.client.get(
+            self.url, {'token': self.regular_user.auth_token.key},
+            HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(events.broker), subscriptions)
+
+        stream = iter(response.streaming_content)
+        next(stream)
+        self.assertEqual(len(events.broker), subscriptions + 1)
+        response.close()
+        self.assertEqual(len(events.broker), subscriptions)
+
+    def test_query_string_token_is_accepted_by_events_only(self):
+        response = self.client.get(
+            reverse('api:user-list'),
+            {'token': self.regular_user.auth_token.key}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unknown_types_are_rejected(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.regular_user.auth_token.key
+        )
+        response = self.client.get(self.url, {'types': 'user,nothing'},
+                                   HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import fragments
+from profiles.models import User
+from profiles.serializers import GroupSerializer, UserSerializer
+
+from .utils import CreateUsersMixin, create_group
+
+
+@override_settings(FRAGMENT_CACHE_ENABLED=True)
+class TestFragmentCache(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        fragments.get_cache().clear()
+        self.client.force_authenticate(self.admin_user)
+        self.url = reverse('api:user-list')
+
+    def count_serialized(self, serializer_class):
+        return mock.patch.object(
+            serializer_class, 'to_representation', autospec=True,
+            side_effect=serializer_class.to_representation)
+
+    def test_list_is_the_same_as_rendered_whole(self):
+        assembled = self.client.get(self.url)
+        with override_settings(FRAGMENT_CACHE_ENABLED=False):
+            rendered = self.client.get(self.url)
+
+        self.assertEqual(assembled.status_code, status.HTTP_200_OK)
+        self.assertEqual(assembled.content, rendered.content)
+        self.assertEqual(assembled['Content-Type'], rendered['Content-Type'])
+        self.assertEqual(assembled.data, rendered.data)
+
+    def test_cached_objects_are_not_serialized(self):
+        first = self.client.get(self.url)
+        with self.count_serialized(UserSerializer) as to_representation:
+            second = self.client.get(reverse('api:search'))
+
+        self.assertEqual(second.content, first.content)
+        to_representation.assert_not_called()
+
+    def test_saved_user_is_serialized_again(self):
+        self.client.get(self.url)
+        self.regular_user.first_name = 'Changed'
+        self.regular_user.save()
+
+        with self.count_serialized(UserSerializer) as to_representation:
+            response = self.client.get(self.url)
+
+        self.assertContains(response, 'Changed')
+        self.assertEqual(to_representation.call_count, 1)
+
+    def test_membership_change_invalidates_users(self):
+        self.client.get(self.url)
+        group = create_group('Managers')
+        group.user_set.add(self.regular_user)
+
+        self.assertContains(self.client.get(self.url), 'Managers')
+
+        group.name = 'Directors'
+        group.save()
+
+        self.assertContains(self.client.get(self.url), 'Directors')
+
+        group.user_set.clear()
+
+        self.assertNotContains(self.client.get(self.url), 'Directors')
+
+    def test_fragments_of_rows_read_before_change_dont_match(self):
+        self.client.get(self.url)
+        self.client.get(reverse('api:group-list'))
+        cache = fragments.get_cache()
+        old = cache.get_many([
+            fragments.fragment_key(User, self.admin_user.pk),
+            fragments.fragment_key(User, self.regular_user.pk),
+            fragments.fragment_key(Group, self.admin_group.pk),
+        ])
+
+        self.admin_group.name = 'Directors'
+        self.admin_group.save()
+        address = self.regular_user.address
+        address.street = 'Changed street'
+        address.save()
+        # Cached by request which read the rows before the changes.
+        cache.set_many(old)
+
+        self.assertContains(self.client.get(self.url), 'Directors')
+        self.assertContains(self.client.get(self.url), 'Changed street')
+        self.assertContains(self.client.get(reverse('api:group-list')),
+                            'Directors')
+
+    def test_groups_count_users(self):
+        self.client.get(reverse('api:group-list'))
+        self.admin_group.user_set.add(self.regular_user)
+
+        response = self.client.get(reverse('api:group-list'))
+
+        self.admin_group.users_count = 2
+        self.assertEqual(response.data, GroupSerializer(
+            [self.admin_group], context={'request': response.wsgi_request},
+            many=True).data)
+
+    def test_permission_levels_get_own_fragments(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(self.regular_user)
+
+        response = self.client.get(self.url)
+
+        self.assertNotIn('id', response.data[0])
+
+    def test_format_is_kept_in_urls(self):
+        self.client.get(self.url)
+
+        response = self.client.get(self.url, {'format': 'json'})
+
+        self.assertTrue(response.data[0]['url'].endswith('?format=json'))
+
+    def test_indented_json_is_rendered_whole(self):
+        self.client.get(self.url)
+
+        response = self.client.get(self.url,
+                                   HTTP_ACCEPT='application/json; indent=2')
+
+        self.assertTrue(response.content.startswith(b'[\n  {'))
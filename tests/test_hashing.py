@@ -0,0 +1,142 @@
+import threading
+
+from django.contrib.auth.hashers import make_password
+from django.test import (
+    SimpleTestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import hashing
+from profiles.models import User
+
+from .utils import CreateUsersMixin, create_user
+
+
+class PoolMixin:
+    queue_size = 0
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(
+            PASSWORD_HASHING_WORKERS=1,
+            PASSWORD_HASHING_QUEUE_SIZE=self.queue_size
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Forcing creation of pool with overridden size.
+        hashing._pool_pid = None
+        self.addCleanup(setattr, hashing, '_pool_pid', None)
+
+    def occupy_pool(self):
+        """Blocks the only hashing thread until the end of the test"""
+        released = threading.Event()
+        hashing.get_pool().submit(released.wait)
+        self.addCleanup(released.set)
+
+
+class TestHashingPool(PoolMixin, CreateUsersMixin, APITestCase):
+
+    def test_obtains_token(self):
+        response = self.client.post('/api/api-auth/', {
+            'username': 'Lenka', 'password': 'userpassword'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['token'],
+                         self.regular_user.auth_token.key)
+
+    def test_login_is_rejected_when_pool_is_full(self):
+        self.occupy_pool()
+
+        response = self.client.post('/api/api-auth/', {
+            'username': 'Lenka', 'password': 'userpassword'})
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_user_creation_is_rejected_when_pool_is_full(self):
+        self.client.force_authenticate(self.admin_user)
+        self.occupy_pool()
+
+        response = self.client.post(reverse('api:user-list'), {
+            'username': 'Vasya', 'password': 'userpassword',
+            'email': 'vasya@email.com', 'first_name': 'Vasya',
+            'last_name': 'Pupkin', 'birthday': '1995-07-04',
+            'address': {'zip_code': '654321', 'country': 'Russia',
+                        'city': 'Moscow', 'district': 'Center',
+                        'street': 'Tverskaya'}
+        }, format='json')
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(User.objects.filter(username='Vasya').exists())
+
+    def test_password_isnt_hashed_if_data_is_invalid(self):
+        self.client.force_authenticate(self.admin_user)
+        self.occupy_pool()
+
+        response = self.client.post(reverse('api:user-list'), {
+            'username': 'Vasya', 'password': 'userpassword',
+            'email': 'not an email', 'first_name': 'Vasya',
+            'last_name': 'Pupkin', 'birthday': '1995-07-04',
+            'address': {'zip_code': '654321', 'country': 'Russia',
+                        'city': 'Moscow', 'district': 'Center',
+                        'street': 'Tverskaya'}
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_admin_login_fails_when_pool_is_full(self):
+        User.objects.filter(pk=self.admin_user.pk).update(is_staff=True)
+        self.occupy_pool()
+
+        response = self.client.post('/admin/login/', {
+            'username': self.admin_user.username,
+            'password': 'userpassword'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class TestNodeLimit(SimpleTestCase):
+
+    def test_tasks_beyond_node_limit_are_rejected(self):
+        pool = hashing.HashingPool(2, 2, node_limit=1)
+        released = threading.Event()
+        self.addCleanup(released.set)
+
+        future = pool.submit(released.wait)
+
+        self.assertIsNone(pool.submit(lambda: None))
+        released.set()
+        future.result()
+        # Waiting for done callbacks.
+        pool.executor.shutdown()
+        self.assertEqual(pool.in_flight.totals(), {'hashing': 0})
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.SHA1PasswordHasher',
+])
+class TestDeferredRehash(PoolMixin, TransactionTestCase):
+    # Rehash is queued while password is being checked.
+    queue_size = 1
+
+    def test_outdated_hash_is_upgraded_after_login(self):
+        user = create_user('Lenka', 'regular@email.com')
+        User.objects.filter(pk=user.pk).update(
+            password=make_password('userpassword', hasher='sha1'))
+
+        response = self.client.post('/api/api-auth/', {
+            'username': 'Lenka', 'password': 'userpassword'})
+        # Waiting for rehash, the only thread runs tasks in order.
+        hashing.get_pool().submit(lambda: None).result()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('md5$'))
+        self.assertTrue(user.check_password('userpassword'))
@@ -0,0 +1,101 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import db, metrics
+from profiles.models import User
+
+from .utils import CreateUsersMixin
+
+
+def parse_server_timing(value):
+    """Returns dict of metric name to its parameters"""
+    result = {}
+    for metric in value.split(', '):
+        name, *params = metric.split(';')
+        result[name] = dict(param.split('=', 1) for param in params)
+    return result
+
+
+class TestExecuteWrapper(TestCase):
+
+    def test_wrapper_is_called_around_queries(self):
+        executed = []
+
+        def wrapper(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        with db.execute_wrapper(wrapper):
+            list(User.objects.all())
+        list(User.objects.all())
+
+        self.assertEqual(len(executed), 1)
+        self.assertIn('profiles_user', executed[0])
+        self.assertNotIn(wrapper, connection.execute_wrappers)
+
+
+class TestServerTiming(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+
+    def test_list_reports_phases(self):
+        response = self.client.get(reverse('api:user-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = parse_server_timing(response['Server-Timing'])
+        for name in ('auth', 'perm-IsAuthenticated',
+                     'perm-ActivateFirstIfInactive', 'queryset', 'serialize',
+                     'render', 'db', 'total'):
+            self.assertIn(name, timing)
+        self.assertRegex(timing['db']['desc'], r'"\d+ queries"')
+        self.assertGreater(float(timing['total']['dur']), 0)
+
+    def test_detail_reports_object_permissions(self):
+        response = self.client.patch(
+            reverse('api:user-detail', args=['Lenka']),
+            {'first_name': 'Lena'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = parse_server_timing(response['Server-Timing'])
+        self.assertIn('perm-CantEditSuperuserIfNotSuperuser', timing)
+        self.assertIn('queryset', timing)
+
+    def test_records_histograms(self):
+        labels = ('api:group-list', 'total')
+        count = metrics.REQUEST_PHASE_SECONDS.count(labels)
+
+        self.client.get(reverse('api:group-list'))
+
+        self.assertEqual(metrics.REQUEST_PHASE_SECONDS.count(labels),
+                         count + 1)
+        self.assertGreater(metrics.REQUEST_QUERIES.sum(('api:group-list',)),
+                           0)
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get(reverse('api:user-list'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING_ALLOWED_IPS=[])
+    def test_header_isnt_sent_to_other_clients(self):
+        response = self.client.get(reverse('api:user-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING_ALLOWED_IPS=[])
+    def test_header_is_sent_to_staff(self):
+        self.admin_user.is_staff = True
+        self.admin_user.save()
+
+        response = self.client.get(reverse('api:user-list'))
+
+        self.assertIn('Server-Timing', response)
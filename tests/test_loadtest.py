@@ -0,0 +1,54 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from profiles import seeding
+from profiles.loadtest import DEFAULT_MIX, percentile
+
+from .utils import create_admin_group, create_user
+
+
+class TestPercentile(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+
+class TestLoadTestCommand(LiveServerTestCase):
+    """Test that loadtest replays every frontend action against server"""
+
+    def setUp(self):
+        seeding.seed(30, 3)
+        admin = create_user('admin', 'admin@example.com', password='admin')
+        admin.groups.add(create_admin_group())
+
+    def test_reports_every_endpoint(self):
+        out = StringIO()
+        call_command('loadtest', url=self.live_server_url, concurrency=2,
+                     duration=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertGreater(report['total']['requests'], 0)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertIn('POST /api/api-auth/', report['endpoints'])
+        for summary in report['endpoints'].values():
+            self.assertLessEqual(summary['p50'], summary['p99'])
+
+    def test_replays_writes(self):
+        out = StringIO()
+        mix = ['{}=0'.format(action) for action in DEFAULT_MIX]
+        mix += ['user-groups-edit=1', 'group-edit=1']
+        call_command('loadtest', url=self.live_server_url, concurrency=1,
+                     duration=0.5, mix=mix, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertIn('PUT /api/users/<username>/groups/',
+                      report['endpoints'])
+        self.assertIn('PATCH /api/groups/<name>/', report['endpoints'])
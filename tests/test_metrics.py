@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import metrics
+
+from .utils import CreateUsersMixin
+
+
+class TestMetricsEndpoint(CreateUsersMixin, APITestCase):
+
+    def test_exposes_request_metrics(self):
+        self.client.force_authenticate(self.admin_user)
+        self.client.get(reverse('api:user-list'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        self.assertIn('# TYPE xusers_requests_total counter', content)
+        self.assertIn('xusers_requests_total{endpoint="api:user-list",'
+                      'method="GET",status="200"}', content)
+        self.assertIn('xusers_request_phase_seconds_bucket{endpoint='
+                      '"api:user-list",phase="total",le="+Inf"}', content)
+        self.assertIn('xusers_request_queries_count{endpoint='
+                      '"api:user-list"}', content)
+
+    def test_counts_token_lookups(self):
+        success = metrics.TOKEN_LOOKUPS.value(('success',))
+        failure = metrics.TOKEN_LOOKUPS.value(('failure',))
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.admin_user.auth_token.key)
+        self.client.get(reverse('api:user-list'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token wrong')
+        self.client.get(reverse('api:user-list'))
+
+        self.assertEqual(metrics.TOKEN_LOOKUPS.value(('success',)),
+                         success + 1)
+        self.assertEqual(metrics.TOKEN_LOOKUPS.value(('failure',)),
+                         failure + 1)
+
+    def test_access_is_limited_by_address(self):
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestSharedMetrics(SimpleTestCase):
+    """Test that metrics of all processes are aggregated"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Forcing creation of values store for new directory.
+        metrics._values_pid = None
+        self.addCleanup(setattr, metrics, '_values_pid', None)
+
+    def test_values_of_other_processes_are_summed(self):
+        other = metrics.MmapValues(os.path.join(self.directory.name,
+                                                'metrics_1.db'))
+        other.add(metrics.TOKEN_LOOKUPS.key('', ('success',)), 2)
+        metrics.TOKEN_LOOKUPS.inc(('success',))
+
+        self.assertEqual(metrics.TOKEN_LOOKUPS.value(('success',)), 3)
+
+    def test_values_survive_reopening_and_growth(self):
+        path = os.path.join(self.directory.name, 'metrics_1.db')
+        values = metrics.MmapValues(path)
+        keys = ['key {}'.format(i) * 10 for i in range(1000)]
+        for key in keys:
+            values.add(key, 1.5)
+        values.add(keys[0], 1)
+
+        reopened = dict(metrics.MmapValues(path).items())
+
+        self.assertEqual(len(reopened), 1000)
+        self.assertEqual(reopened[keys[0]], 2.5)
+        self.assertEqual(reopened[keys[-1]], 1.5)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('name',),
+                                      buckets=(1, 2))
+        metrics.registry.remove(histogram)
+        for value in (0.5, 1.5, 3):
+            histogram.observe(('a',), value)
+
+        lines = histogram.expose(metrics.collect())
+
+        self.assertIn('test_seconds_bucket{name="a",le="1"} 1', lines)
+        self.assertIn('test_seconds_bucket{name="a",le="2"} 2', lines)
+        self.assertIn('test_seconds_bucket{name="a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{name="a"} 5', lines)
+        self.assertIn('test_seconds_count{name="a"} 3', lines)
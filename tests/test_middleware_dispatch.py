@@ -0,0 +1,76 @@
+from django.conf.urls import url
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from .utils import CreateUsersMixin
+
+calls = []
+
+
+def failing_view(request):
+    raise ZeroDivisionError
+
+
+urlpatterns = [url(r'^api/fail$', failing_view)]
+
+
+class RecordingMiddleware:
+    """Middleware recording calls of its hooks"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        calls.append('call')
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        calls.append('view')
+
+    def process_exception(self, request, exception):
+        calls.append('exception')
+
+
+class TestPathDispatch(CreateUsersMixin, TestCase):
+
+    def test_api_requests_run_lean_chain(self):
+        client = Client()
+        client.force_login(self.admin_user)
+
+        response = client.get(reverse('api:user-list'))
+
+        request = response.wsgi_request
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertNotIn('X-Frame-Options', response)
+
+    def test_other_requests_run_full_chain(self):
+        response = Client().get(reverse('admin:login'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
+
+    def test_view_hooks_are_forwarded(self):
+        client = Client(enforce_csrf_checks=True)
+
+        response = client.post(reverse('admin:login'),
+                               {'username': 'Dimka', 'password': 'x'})
+
+        # Rejected by CsrfViewMiddleware.process_view.
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(
+        ROOT_URLCONF='tests.test_middleware_dispatch',
+        MIDDLEWARE_CHAINS=[
+            ('/api/', ['tests.test_middleware_dispatch.RecordingMiddleware'])
+        ]
+    )
+    def test_hooks_of_custom_chain_are_called(self):
+        del calls[:]
+
+        with self.assertRaises(ZeroDivisionError):
+            Client().get('/api/fail')
+
+        self.assertEqual(calls, ['call', 'view', 'exception'])
@@ -0,0 +1,77 @@
+import marshal
+import re
+import sys
+import threading
+import time
+
+from django.urls import reverse
+from django.test import SimpleTestCase
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles.profiling import Sampler
+
+from .utils import CreateUsersMixin
+
+
+class TestProfiling(CreateUsersMixin, APITestCase):
+
+    def authenticate(self, user):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + user.auth_token.key)
+
+    def test_admin_gets_pstats_profile(self):
+        self.authenticate(self.admin_user)
+
+        response = self.client.get(reverse('api:user-list'),
+                                   {'_profile': 'pstats'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="profile.pstats"')
+        self.assertEqual(response['X-Profiled-Status'], '200')
+        stats = marshal.loads(response.content)
+        functions = {function for _, _, function in stats}
+        self.assertIn('to_representation', functions)
+        self.assertIn('execute', functions)
+
+    def test_header_requests_sampling_profile(self):
+        self.authenticate(self.admin_user)
+
+        response = self.client.get(reverse('api:user-list'),
+                                   HTTP_X_PROFILE='1')
+
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="profile.collapsed"')
+        for line in response.content.decode().splitlines():
+            self.assertRegex(line, r'^\S+ \d+$')
+
+    def test_flag_is_ignored_for_regular_users(self):
+        self.authenticate(self.regular_user)
+
+        response = self.client.get(reverse('api:user-list'),
+                                   {'_profile': 'pstats'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Content-Disposition', response)
+        self.assertIsInstance(response.data, list)
+
+
+class TestSampler(SimpleTestCase):
+
+    def busy(self, seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def test_collects_stacks_below_root(self):
+        sampler = Sampler(threading.get_ident(), sys._getframe(), 0.001)
+        sampler.start()
+        self.busy(0.1)
+        sampler.stop()
+
+        collapsed = sampler.collapsed()
+        self.assertTrue(collapsed)
+        self.assertRegex(collapsed, re.compile(
+            r'^tests\.test_profiling\.(TestSampler\.)?busy \d+$', re.M))
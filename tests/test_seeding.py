@@ -0,0 +1,52 @@
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from profiles.models import Address, User
+from profiles.seeding import SEED_PASSWORD
+
+
+class TestSeedDirectory(TestCase):
+    """Test that seed_directory generates consistent directory"""
+
+    def seed(self, users=300, groups=10, seed=0):
+        call_command('seed_directory', users=users, groups=groups, seed=seed,
+                     batch_size=100, stdout=open('/dev/null', 'w'))
+
+    def snapshot(self):
+        return list(User.objects.order_by('id').values_list(
+            'username', 'email', 'birthday', 'address__zip_code'
+        ))
+
+    def test_creates_requested_number_of_objects(self):
+        self.seed()
+
+        self.assertEqual(User.objects.count(), 300)
+        self.assertEqual(Group.objects.count(), 10)
+        self.assertLess(Address.objects.count(), 300)
+        user = User.objects.order_by('id').first()
+        self.assertTrue(user.check_password(SEED_PASSWORD))
+
+    def test_group_sizes_are_skewed(self):
+        self.seed()
+
+        sizes = list(Group.objects.annotate(size=Count('user')).order_by(
+            'id').values_list('size', flat=True))
+        self.assertGreater(sizes[0], sizes[-1] * 3)
+
+    def test_same_seed_produces_same_directory(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Address.objects.all().delete()
+        Group.objects.all().delete()
+
+        self.seed(seed=7)
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seeding_twice_appends_users(self):
+        self.seed(users=50)
+        self.seed(users=50, seed=1)
+        self.assertEqual(User.objects.count(), 100)
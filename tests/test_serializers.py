@@ -1,14 +1,16 @@
 from django.contrib.auth.models import Group
 from django.db.models import Count
 from django.forms.models import model_to_dict
-from django.urls import reverse
+from django.urls import NoReverseMatch, reverse
 
+from rest_framework import serializers
 from rest_framework.test import APIRequestFactory, APITestCase
 
 from profiles.models import User
 from profiles.serializers import (AddressSerializer, GroupDetailSerializer,
-                                  GroupSerializer, UserGroupsSerializer,
-                                  UserSerializer)
+                                  GroupSerializer,
+                                  TemplateHyperlinkedIdentityField,
+                                  UserGroupsSerializer, UserSerializer)
 
 from .utils import (CreateUsersMixin, create_address, create_admin_group,
                     create_group, create_user)
@@ -348,3 +350,45 @@ class UserSerializerTestCase(CreateUsersMixin, APITestCase):
         """Small sanity test"""
         UserSerializer().update(self.admin_user, {'username': 'Hello'})
         self.assertTrue(User.objects.filter(username='Hello').exists())
+
+
+class TemplateHyperlinkedIdentityFieldTestCase(APITestCase):
+    """Test URLs built from template are the same as reversed ones"""
+
+    def setUp(self):
+        factory = APIRequestFactory()
+        self.requests = [factory.get('/api/users/'),
+                         factory.get('/api/users/', {'format': 'json'}),
+                         factory.get('/api/users/', secure=True,
+                                     HTTP_HOST='testserver:8443')]
+        kwargs = {'view_name': 'api:user-detail', 'lookup_field': 'username'}
+        self.reversed = serializers.HyperlinkedIdentityField(**kwargs)
+        self.templated = TemplateHyperlinkedIdentityField(**kwargs)
+
+    def get_urls(self, user, request, format):
+        return [field.get_url(user, 'api:user-detail', request, format)
+                for field in (self.templated, self.reversed)]
+
+    def test_urls_are_the_same_as_reversed(self):
+        usernames = ['Dimka', 'Дмитрий', 'with space', 'a+b@c:d~e',
+                     '%20', 'x?y#z']
+        for request in self.requests:
+            for format in (None, 'json'):
+                for username in usernames:
+                    user = User(pk=1, username=username)
+                    with self.subTest(path=request.get_full_path(),
+                                      format=format, username=username):
+                        templated, reversed_url = self.get_urls(
+                            user, request, format)
+                        self.assertEqual(templated, reversed_url)
+
+    def test_lookup_values_not_matching_pattern_are_reversed(self):
+        user = User(pk=1, username='user.name')
+        with self.assertRaises(NoReverseMatch):
+            self.templated.get_url(user, 'api:user-detail',
+                                   self.requests[0], None)
+
+    def test_unsaved_objects_have_no_url(self):
+        user = User(username='Dimka')
+        self.assertEqual(self.get_urls(user, self.requests[0], None),
+                         [None, None])
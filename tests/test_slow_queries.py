@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from profiles import slow_queries
+from profiles.slow_queries import explain_command
+
+from .utils import CreateUsersMixin
+
+
+class TestSlowQueriesLog(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_queries_are_attributed_to_view_and_field(self):
+        with self.assertLogs('profiles.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('api:user-detail', args=['Lenka']))
+
+        views = {record.view for record in logs.records}
+        fields = {record.field for record in logs.records}
+        self.assertEqual(views, {'UserViewSet.retrieve'})
+        self.assertIn('UserSerializer.address', fields)
+        self.assertIn('UserSerializer.groups', fields)
+        # Object lookup isn't made by serializer.
+        self.assertIn(None, fields)
+        self.assertIn('tests/test_slow_queries.py', logs.records[0].stack)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_logging_can_be_disabled(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('profiles.slow_queries'):
+                self.client.get(reverse('api:user-list'))
+
+
+class TestExplain(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(slow_queries._slowest.clear)
+        self.connection = mock.MagicMock()
+        self.connection.savepoint.return_value = 's1'
+        cursor = self.connection.connection.cursor.return_value
+        self.cursor = cursor.__enter__.return_value
+
+    def test_failed_explain_is_rolled_back_and_logged(self):
+        self.cursor.execute.side_effect = Exception('statement timeout')
+
+        with self.assertLogs('profiles.slow_queries', 'WARNING') as logs:
+            slow_queries.explain_if_slowest(self.connection, 'View', 1,
+                                            'SELECT 1', ())
+
+        self.assertIn('statement timeout', logs.output[0])
+        self.connection.savepoint_rollback.assert_called_once_with('s1')
+        self.connection.savepoint_commit.assert_not_called()
+
+    def test_plan_is_logged(self):
+        self.cursor.fetchall.return_value = [('Result',)]
+
+        with self.assertLogs('profiles.slow_queries', 'INFO') as logs:
+            slow_queries.explain_if_slowest(self.connection, 'View', 1,
+                                            'SELECT 1', ())
+
+        self.assertEqual(logs.records[0].plan, 'Result')
+        self.connection.savepoint_commit.assert_called_once_with('s1')
+
+
+class TestExplainCommand(APITestCase):
+    """Test that only queries without side effects are explained with
+    ANALYZE, which executes them"""
+
+    def test_plain_selects_are_analyzed(self):
+        for sql in (
+            'SELECT "profiles_user"."id" FROM "profiles_user" '
+            'WHERE "profiles_user"."id" IN (%s, %s)',
+            'SELECT COUNT(*) AS "__count" FROM "profiles_user"',
+            'SELECT (1) AS "a" FROM "profiles_user" WHERE EXISTS(SELECT 1)',
+        ):
+            with self.subTest(sql=sql):
+                self.assertEqual(explain_command(sql),
+                                 'EXPLAIN (ANALYZE, BUFFERS) ')
+
+    def test_locking_and_function_calls_are_only_planned(self):
+        for sql in (
+            'SELECT pg_notify(%s, %s)',
+            'SELECT "profiles_user"."id" FROM "profiles_user" FOR UPDATE',
+            'SELECT "id" FROM "profiles_user" FOR NO KEY UPDATE SKIP LOCKED',
+            'SELECT "id" FROM "profiles_user" for share',
+            'SELECT nextval(%s)',
+        ):
+            with self.subTest(sql=sql):
+                self.assertEqual(explain_command(sql), 'EXPLAIN ')
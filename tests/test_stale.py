@@ -0,0 +1,136 @@
+import threading
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APITestCase
+
+from profiles import stale
+from profiles.fragments import FragmentCacheMixin
+from profiles.models import User
+from profiles.timeouts import StatementTimeoutMixin
+
+from .utils import CreateUsersMixin
+
+
+@override_settings(STALE_WHILE_REVALIDATE_ENABLED=True)
+class TestStaleWhileRevalidate(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        stale.get_cache().clear()
+        self.client.force_authenticate(self.admin_user)
+        self.url = reverse('api:user-list')
+        self.cached = self.client.get(self.url)
+        self.regular_user.first_name = 'Changed'
+        self.regular_user.save()
+
+    def test_response_is_served_from_cache(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.cached.content)
+        self.assertEqual(response['Age'], '0')
+        self.assertNotIn('Warning', response)
+
+    def test_cache_is_keyed_by_query(self):
+        response = self.client.get(self.url, {'page': 1})
+
+        self.assertContains(response, 'Changed')
+
+    @override_settings(STALE_REVALIDATE_AFTER=-1)
+    def test_old_response_is_refreshed_in_background(self):
+        with mock.patch.object(stale, 'revalidate') as revalidate:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.content, self.cached.content)
+        revalidate.assert_called_once()
+
+    @override_settings(STALE_MAX_AGE=-1)
+    def test_expired_response_is_served_when_database_fails(self):
+        with mock.patch.object(FragmentCacheMixin, 'list',
+                               side_effect=OperationalError):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.cached.content)
+        self.assertEqual(response['Warning'], stale.REVALIDATION_FAILED)
+
+    @override_settings(STALE_MAX_AGE=-1, STALE_LATENCY_SLO=0.01)
+    def test_expired_response_is_served_when_database_is_slow(self):
+        released = threading.Event()
+
+        def slow_list(view, request, *args, **kwargs):
+            released.wait(5)
+            return Response(['fresh'])
+
+        with mock.patch.object(FragmentCacheMixin, 'list', slow_list):
+            response = self.client.get(self.url)
+            refresh, = stale._refreshes.values()
+            released.set()
+            refresh.join()
+
+        self.assertEqual(response.content, self.cached.content)
+        self.assertEqual(response['Warning'], stale.REVALIDATION_FAILED)
+        self.assertEqual(refresh.result[0], b'["fresh"]')
+        self.assertEqual(stale.get_cache().get(refresh.key)[0],
+                         b'["fresh"]')
+
+    @override_settings(STALE_MAX_AGE=-1)
+    def test_refresh_runs_in_own_view_with_statement_timeout(self):
+        calls = []
+
+        def fresh_list(view, request, *args, **kwargs):
+            calls.append((view, request, threading.current_thread()))
+            return Response(['fresh'])
+
+        with mock.patch.object(FragmentCacheMixin, 'list', fresh_list), \
+                mock.patch.object(stale, 'revalidate',
+                                  wraps=stale.revalidate) as revalidate, \
+                mock.patch.object(StatementTimeoutMixin,
+                                  'get_statement_timeout', autospec=True,
+                                  return_value=None) as get_timeout:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.content, b'["fresh"]')
+        (view, request, thread), = calls
+        self.assertIsNot(thread, threading.current_thread())
+        original = revalidate.call_args[0][1]
+        self.assertIsNot(view, original)
+        self.assertIsNot(request, original.request)
+        self.assertIs(request.parser_context['view'], view)
+        self.assertEqual(request.user, self.admin_user)
+        get_timeout.assert_called_once_with(view, request)
+
+    @override_settings(STALE_MAX_AGE=-1)
+    def test_other_errors_are_raised(self):
+        with mock.patch.object(FragmentCacheMixin, 'list',
+                               side_effect=NotFound):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(STALE_WHILE_REVALIDATE_ENABLED=True, STALE_MAX_AGE=-1)
+class TestRefresh(CreateUsersMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        stale.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+
+    def test_expired_response_is_refreshed(self):
+        self.client.get(reverse('api:search'))
+        self.regular_user.first_name = 'Changed'
+        self.regular_user.save()
+
+        response = self.client.get(reverse('api:search'))
+
+        self.assertContains(response, 'Changed')
+        self.assertNotIn('Age', response)
@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import throttling
+
+from .utils import CreateUsersMixin
+
+
+class TestBuckets(SimpleTestCase):
+
+    def test_tokens_are_refilled(self):
+        buckets = throttling.Buckets()
+
+        self.assertEqual(buckets.consume('a', 2, 1, now=100), 0)
+        self.assertEqual(buckets.consume('a', 2, 1, now=100), 0)
+        self.assertEqual(buckets.consume('a', 2, 1, now=100), 1)
+        self.assertEqual(buckets.consume('b', 2, 1, now=100), 0)
+        self.assertAlmostEqual(buckets.consume('a', 2, 1, now=100.5), 0.5)
+        self.assertEqual(buckets.consume('a', 2, 1, now=101), 0)
+
+    def test_buckets_are_shared_through_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'throttle.db')
+        # As if opened by two workers.
+        first = throttling.Buckets(path, slots=16)
+        second = throttling.Buckets(path, slots=16)
+
+        self.assertEqual(first.consume('a', 1, 1, now=100), 0)
+        self.assertEqual(second.consume('a', 1, 1, now=100), 1)
+
+    def test_least_recently_updated_bucket_is_replaced(self):
+        buckets = throttling.Buckets(slots=throttling.PROBES)
+        for number in range(throttling.PROBES):
+            buckets.consume(str(number), 1, 1, now=100 + number)
+
+        self.assertEqual(buckets.consume('new', 1, 1, now=200), 0)
+        # Bucket of "0" was replaced, so it's full again.
+        self.assertEqual(buckets.consume('0', 1, 1, now=200), 0)
+        self.assertEqual(buckets.consume('new', 1, 1, now=200), 1)
+
+
+class TestThrottling(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        rest_framework['DEFAULT_THROTTLE_RATES'] = {
+            'search': '2/minute', 'write': '1/minute', 'bulk': '1/minute',
+            'auth': '1/minute',
+        }
+        settings_override = override_settings(REST_FRAMEWORK=rest_framework)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Forcing creation of empty buckets.
+        throttling._buckets_pid = None
+        self.addCleanup(setattr, throttling, '_buckets_pid', None)
+
+    def authenticate(self, user):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + user.auth_token.key)
+
+    def test_search_is_throttled_per_token(self):
+        self.authenticate(self.admin_user)
+        for _ in range(2):
+            response = self.client.get(reverse('api:search'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('api:search'))
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        self.authenticate(self.regular_user)
+        response = self.client.get(reverse('api:search'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_only_writes_are_throttled(self):
+        self.authenticate(self.admin_user)
+        url = reverse('api:user-detail', args=['Lenka'])
+
+        response = self.client.patch(url, {'first_name': 'Elena'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(url, {'first_name': 'Lena'})
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_requests_are_throttled_per_ip(self):
+        data = {'username': 'Lenka', 'password': 'userpassword'}
+
+        response = self.client.post('/api/api-auth/', data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post('/api/api-auth/', data)
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+        response = self.client.post('/api/api-auth/', data,
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
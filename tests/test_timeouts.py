@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import coalescing, db, metrics, stale
+from profiles.views import SearchView
+
+from .utils import CreateUsersMixin
+
+
+class QueryCanceled(Exception):
+    pgcode = '57014'
+
+
+def canceled_query(*args, **kwargs):
+    try:
+        raise QueryCanceled('canceling statement due to statement timeout')
+    except QueryCanceled as exc:
+        raise OperationalError(*exc.args) from exc
+
+
+class TestStatementTimeouts(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+
+    @contextmanager
+    def record_set_local(self):
+        """Records SET LOCAL statements as if the database was PostgreSQL"""
+        statements = []
+
+        def record_set_local(execute, sql, params, many, context):
+            if sql.startswith('SET LOCAL'):
+                # Not supported by SQLite.
+                statements.append(sql % tuple(params))
+                return None
+            return execute(sql, params, many, context)
+
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                db.execute_wrapper(record_set_local):
+            yield statements
+
+    def test_timeout_of_view_and_action_is_set(self):
+        with self.settings(STATEMENT_TIMEOUTS={'UserViewSet.list': 0.5,
+                                               'SearchView': 2}), \
+                self.record_set_local() as statements:
+            self.client.get(reverse('api:search'))
+            self.client.get(reverse('api:user-list'))
+            self.client.get(reverse('api:user-detail', args=['Lenka']))
+
+        self.assertEqual(statements, ['SET LOCAL statement_timeout = 2000',
+                                      'SET LOCAL statement_timeout = 500'])
+
+    def test_waiting_for_flight_doesnt_open_transaction(self):
+        flight = coalescing.Flight()
+        flight.result = (b'[]', 'application/json')
+        flight.landed.set()
+
+        with self.settings(STATEMENT_TIMEOUTS={'SearchView': 2}), \
+                self.record_set_local() as statements, \
+                mock.patch.object(coalescing, 'join',
+                                  return_value=(flight, False)):
+            response = self.client.get(reverse('api:search'))
+
+        self.assertEqual(response.content, b'[]')
+        self.assertEqual(statements, [])
+
+    def test_cached_response_doesnt_open_transaction(self):
+        stale.get_cache().clear()
+        self.addCleanup(stale.get_cache().clear)
+
+        with self.settings(STATEMENT_TIMEOUTS={'SearchView': 2},
+                           STALE_WHILE_REVALIDATE_ENABLED=True), \
+                self.record_set_local() as statements:
+            self.client.get(reverse('api:search'))
+            response = self.client.get(reverse('api:search'))
+
+        self.assertIn('Age', response)
+        self.assertEqual(statements, ['SET LOCAL statement_timeout = 2000'])
+
+    def test_canceled_query_returns_504(self):
+        timeouts = metrics.STATEMENT_TIMEOUTS.value(('SearchView',))
+
+        with mock.patch.object(SearchView, 'list', canceled_query):
+            response = self.client.get(reverse('api:search'))
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertEqual(response.data['detail'].code, 'statement_timeout')
+        self.assertEqual(metrics.STATEMENT_TIMEOUTS.value(('SearchView',)),
+                         timeouts + 1)
+
+    def test_other_errors_are_not_converted(self):
+        with mock.patch.object(SearchView, 'list',
+                               side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                self.client.get(reverse('api:search'))
@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from profiles import tracing
+
+from .utils import CreateUsersMixin, create_group
+
+
+def read_trace(path):
+    with open(path) as f:
+        content = f.read()
+    # Trace files are left without closing bracket.
+    return json.loads(content.rstrip().rstrip(',') + ']')
+
+
+class TestTracing(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin_user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.pattern = os.path.join(directory.name, 'trace-{pid}.json')
+        self.path = self.pattern.format(pid=os.getpid())
+        settings_override = override_settings(
+            TRACING_ENABLED=True, TRACING_FILE=self.pattern
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Forcing creation of handler for new file.
+        tracing._handler_pid = None
+        self.addCleanup(setattr, tracing, '_handler_pid', None)
+
+    def test_records_spans_of_request_traced_by_header(self):
+        group = create_group('Managers')
+
+        response = self.client.put(
+            reverse('api:group-detail', args=[group.name]),
+            {'name': 'Sales', 'users': ['Lenka']}, format='json',
+            HTTP_X_TRACE='1'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = read_trace(self.path)
+        names = {event['name'] for event in events}
+        for name in ('request', 'GroupViewSet', 'auth',
+                     'perm-DissallowAdminGroupDeletion', 'get_queryset',
+                     'queryset', 'serialize', 'render', 'sql'):
+            self.assertIn(name, names)
+        request = next(e for e in events if e['name'] == 'request')
+        self.assertEqual(request['args']['status'], 200)
+        for event in events:
+            self.assertEqual(event['ph'], 'X')
+            self.assertGreaterEqual(event['ts'], request['ts'])
+
+    def test_records_serialization_of_every_object(self):
+        self.client.get(reverse('api:user-list'), HTTP_X_TRACE='1')
+
+        events = read_trace(self.path)
+        spans = [event for event in events
+                 if event['name'] == 'UserSerializer.to_representation']
+        self.assertEqual(len(spans), 2)
+
+    def test_requests_are_sampled(self):
+        with self.settings(TRACING_SAMPLE_RATE=0):
+            self.client.get(reverse('api:user-list'))
+        self.assertFalse(os.path.exists(self.path))
+
+        with self.settings(TRACING_SAMPLE_RATE=1):
+            self.client.get(reverse('api:user-list'))
+        self.assertTrue(read_trace(self.path))
+
+    def test_files_are_rotated_between_traces(self):
+        with self.settings(TRACING_MAX_BYTES=1000):
+            for _ in range(3):
+                self.client.get(reverse('api:user-list'), HTTP_X_TRACE='1')
+
+        files = glob.glob(self.path + '*')
+        self.assertGreater(len(files), 1)
+        for path in files:
+            # Request span is recorded last, files hold whole traces.
+            self.assertEqual(read_trace(path)[-1]['name'], 'request')
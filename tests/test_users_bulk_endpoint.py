@@ -0,0 +1,111 @@
+import io
+import json
+
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase
+
+from profiles.models import User
+from profiles.parsers import iter_json_array
+
+from .utils import CreateUsersMixin
+
+
+class TestJSONArrayParsing(APITestCase):
+    """Test that array items are decoded regardless of read boundaries"""
+
+    def test_items_are_decoded_across_reads(self):
+        data = [{'name': 'Роберт', 'tags': ['a', 'b']}, 12345, 'x', None,
+                [1.5, {'nested': True}]]
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        for read_size in (1, 2, 3, 7, 1024):
+            with self.subTest(read_size=read_size):
+                items = iter_json_array(io.BytesIO(payload),
+                                        read_size=read_size)
+                self.assertEqual(list(items), data)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.BytesIO(b' [ ] '))), [])
+
+    def test_invalid_payloads_raise_parse_error(self):
+        for payload in (b'', b'{}', b'[1, 2', b'[1 2]', b'[1] [2]',
+                        b'[{"a": }]'):
+            with self.subTest(payload=payload):
+                with self.assertRaises(ParseError):
+                    list(iter_json_array(io.BytesIO(payload), read_size=2))
+
+
+class TestBulkUserCreation(CreateUsersMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:bulk')
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.admin_user.auth_token.key
+        )
+
+    def user_data(self, username):
+        return {'username': username, 'first_name': 'First',
+                'last_name': 'Last',
+                'email': '{}@email.com'.format(username),
+                'password': 'userpassword', 'birthday': '1990-02-21',
+                'address': {'zip_code': '543211', 'country': 'Germany',
+                            'city': 'Berlin', 'district': 'West',
+                            'street': 'Big Low'}}
+
+    def test_users_are_created_in_chunks(self):
+        payload = [self.user_data('user{}'.format(i)) for i in range(5)]
+        with self.settings(BULK_CHUNK_SIZE=2):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 5})
+        self.assertEqual(User.objects.filter(
+            username__startswith='user').count(), 5)
+        self.assertTrue(User.objects.get(username='user4')
+                        .check_password('userpassword'))
+
+    def test_nothing_is_created_if_any_item_is_invalid(self):
+        payload = [self.user_data('user{}'.format(i)) for i in range(5)]
+        payload[3]['email'] = 'not an email'
+        with self.settings(BULK_CHUNK_SIZE=2):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0]['index'], 3)
+        self.assertIn('email', response.data[0]['errors'])
+        self.assertFalse(User.objects.filter(
+            username__startswith='user').exists())
+
+    def test_duplicates_in_payload_are_reported(self):
+        payload = [self.user_data('user{}'.format(i)) for i in range(5)]
+        payload[1]['username'] = 'user0'
+        payload[4]['email'] = 'user2@email.com'
+        with self.settings(BULK_CHUNK_SIZE=2):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [
+            {'index': 1, 'errors': {'username': ['Same username as item 0.']}}
+        ])
+
+        payload[1]['username'] = 'user1'
+        with self.settings(BULK_CHUNK_SIZE=2):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [
+            {'index': 4, 'errors': {'email': ['Same email as item 2.']}}
+        ])
+        self.assertFalse(User.objects.filter(
+            username__startswith='user').exists())
+
+    def test_regular_users_cant_create_users(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.regular_user.auth_token.key
+        )
+        response = self.client.post(self.url, [self.user_data('user')],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from profiles.models import User
+from profiles.serializers import UserSerializer
+
+from .utils import CreateUsersMixin, create_group, create_user
+
+
+class TestUsersExport(CreateUsersMixin, APITestCase):
+    """Test that export streams same data users endpoint returns"""
+
+    def setUp(self):
+        super().setUp()
+        managers = create_group('Managers')
+        user = create_user('Robz', 'robz@email.com', first_name='Робин')
+        user.groups.add(managers, self.admin_group)
+        self.url = reverse('api:export')
+
+    def expected_data(self, user):
+        request = APIRequestFactory().get('/something/')
+        request.user = user
+        return UserSerializer(User.objects.order_by('id'), many=True,
+                              context={'request': request}).data
+
+    def get(self, user, **kwargs):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + user.auth_token.key
+        )
+        return self.client.get(self.url, **kwargs)
+
+    def test_ndjson_export_matches_serializer_representation(self):
+        for user in (self.admin_user, self.regular_user):
+            with self.subTest(user=user.username):
+                response = self.get(user, data={'format': 'ndjson'})
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                content = b''.join(response.streaming_content).decode()
+                rows = [json.loads(line) for line in content.splitlines()]
+                self.assertEqual(rows, json.loads(
+                    json.dumps(self.expected_data(user))
+                ))
+
+    def test_csv_export_flattens_address_and_groups(self):
+        response = self.get(self.regular_user, data={'format': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        self.assertNotIn('is_active', rows[0])
+        self.assertEqual(set(rows[2]['groups'].split(';')),
+                         {'Managers', 'Administrators'})
+        self.assertEqual(rows[2]['first_name'], 'Робин')
+        self.assertEqual(rows[2]['address.zip_code'], '654321')
+
+    def test_export_is_compressed_if_client_accepts_gzip(self):
+        response = self.get(self.regular_user, data={'format': 'ndjson'},
+                            HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_export_isnt_compressed_if_client_refuses_gzip(self):
+        for accept_encoding in ('gzip;q=0, deflate', 'gzips', 'identity',
+                                '*;q=0', 'gzip; q=0.000'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(self.regular_user,
+                                    data={'format': 'ndjson'},
+                                    HTTP_ACCEPT_ENCODING=accept_encoding)
+
+                self.assertNotIn('Content-Encoding', response)
+                content = b''.join(response.streaming_content)
+                self.assertEqual(len(content.splitlines()), 3)
+
+    def test_export_is_compressed_if_any_coding_is_accepted(self):
+        response = self.get(self.regular_user, data={'format': 'ndjson'},
+                            HTTP_ACCEPT_ENCODING='br;q=1.0, *;q=0.5')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_anonymous_users_cant_export(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_management_command_writes_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.ndjson.gz')
+            call_command('export_users', path, format='ndjson',
+                         username='Dimka', base_url='http://testserver')
+            with gzip.open(path, 'rt') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(rows, json.loads(
+            json.dumps(self.expected_data(self.admin_user))
+        ))
@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from profiles import importer
+from profiles.models import Address, User
+
+from .utils import create_group, create_user
+
+
+class TestUsersImport(TestCase):
+    """Test that import_users command creates and updates users in bulk"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = {'zip_code': '543211', 'country': 'Germany',
+                        'city': 'Berlin', 'district': 'West',
+                        'street': 'Big Low'}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def user_record(self, username, **kwargs):
+        record = {'username': username,
+                  'email': '{}@email.com'.format(username),
+                  'first_name': 'First', 'last_name': 'Last',
+                  'birthday': '1990-02-21', 'address': self.address,
+                  'groups': ['Managers']}
+        record.update(kwargs)
+        return json.dumps(record)
+
+    def test_imports_ndjson_and_shares_addresses(self):
+        existing = create_user('Dimka', 'dimka@email.com')
+        create_group('Managers')
+        path = self.write('users.ndjson', '\n'.join([
+            self.user_record('Robz', password='robzpassword'),
+            self.user_record('Lily', groups=['Managers', 'Designers']),
+            self.user_record('Dimka', first_name='Dmitriy',
+                             email='dimka@email.com'),
+        ]))
+
+        call_command('import_users', path, processes=1,
+                     stdout=io.StringIO())
+
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Address.objects.filter(**self.address).count(), 1)
+        robz = User.objects.get(username='Robz')
+        self.assertTrue(robz.check_password('robzpassword'))
+        self.assertFalse(User.objects.get(username='Lily')
+                         .has_usable_password())
+        self.assertEqual(
+            set(User.objects.get(username='Lily').groups
+                .values_list('name', flat=True)),
+            {'Managers', 'Designers'}
+        )
+        existing_password = existing.password
+        existing.refresh_from_db()
+        self.assertEqual(existing.first_name, 'Dmitriy')
+        self.assertEqual(existing.password, existing_password)
+        self.assertEqual(Group.objects.get(name='Managers').user_set.count(),
+                         3)
+
+    def test_imports_csv(self):
+        path = self.write('users.csv', (
+            'username,first_name,last_name,email,birthday,'
+            'address.zip_code,address.country,address.city,'
+            'address.district,address.street,groups\n'
+            'Robz,Robin,Sparkles,robz@email.com,1990-02-21,'
+            '543211,Germany,Berlin,West,Big Low,Managers;Designers\n'
+            'Lily,Lily,Aldrin,lily@email.com,1991-03-01,,,,,,\n'
+        ))
+
+        call_command('import_users', path, processes=1,
+                     stdout=io.StringIO())
+
+        robz = User.objects.get(username='Robz')
+        self.assertEqual(robz.address.city, 'Berlin')
+        self.assertEqual(robz.groups.count(), 2)
+        self.assertIsNone(User.objects.get(username='Lily').address)
+
+    def test_nothing_is_imported_if_file_contains_invalid_rows(self):
+        path = self.write('users.ndjson', '\n'.join([
+            self.user_record('Robz'),
+            self.user_record('Lily', birthday='21.02.1990'),
+        ]))
+
+        with self.assertRaisesMessage(CommandError, 'line 2: birthday'):
+            call_command('import_users', path, processes=1)
+        self.assertFalse(User.objects.exists())
+
+    def test_malformed_json_line_is_reported_as_invalid_row(self):
+        path = self.write('users.ndjson', '\n'.join([
+            self.user_record('Robz'),
+            '{"username": "Lily",',
+            '[]',
+        ]))
+
+        with self.assertRaisesMessage(CommandError, 'line 2: invalid JSON'):
+            call_command('import_users', path, processes=1)
+        with self.assertRaisesMessage(
+                CommandError, 'line 3: record must be JSON object'):
+            call_command('import_users', path, processes=1)
+        self.assertFalse(User.objects.exists())
+
+    def test_emails_must_be_unique(self):
+        create_user('Dimka', 'dimka@email.com')
+        path = self.write('users.ndjson', '\n'.join([
+            self.user_record('Robz'),
+            self.user_record('Robz', first_name='Robin'),
+            self.user_record('Lily', email='Robz@email.com'),
+            self.user_record('Barny', email='dimka@email.com'),
+            self.user_record('Marshal', email='Lily@email.com'),
+        ]))
+
+        with self.assertRaises(CommandError) as raised:
+            call_command('import_users', path, processes=1, chunk_size=2)
+        self.assertEqual(str(raised.exception).splitlines()[1:], [
+            'line 3: email Robz@email.com is used by Robz on line 1',
+            'line 4: email dimka@email.com is taken by user Dimka',
+        ])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_fields_are_validated_by_model(self):
+        path = self.write('users.ndjson', '\n'.join([
+            self.user_record('Robz', email='not an email'),
+            self.user_record('Lily', first_name='L' * 129),
+            self.user_record('x' * 151),
+            self.user_record('lily.aldrin'),
+            self.user_record('Barny', groups=['G' * 81]),
+        ]))
+
+        with self.assertRaises(CommandError) as raised:
+            call_command('import_users', path, processes=1)
+        errors = str(raised.exception).splitlines()[1:]
+        fields = ['email', 'first_name', 'username', 'username', 'name']
+        self.assertEqual(len(errors), len(fields))
+        for line, (error, field) in enumerate(zip(errors, fields), 1):
+            self.assertTrue(
+                error.startswith('line {}: {}'.format(line, field)), error)
+        self.assertFalse(User.objects.exists())
+
+    def test_process_pool_is_started_only_for_passwords(self):
+        path = self.write('users.ndjson', self.user_record('Robz'))
+
+        with mock.patch.object(importer, 'ProcessPoolExecutor') as pool:
+            call_command('import_users', path, stdout=io.StringIO())
+
+        pool.assert_not_called()
+        self.assertTrue(User.objects.filter(username='Robz').exists())
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches, get_resolver
+
+from profiles import warmup
+
+calls = []
+
+
+def prime():
+    calls.append(connection.connection is not None)
+
+
+def fail():
+    raise OperationalError('canceling statement due to statement timeout')
+
+
+class TestWarmup(TestCase):
+
+    def test_url_patterns_are_compiled(self):
+        clear_url_caches()
+
+        warmup.prepare()
+
+        resolver = get_resolver()
+        self.assertTrue(resolver._populated)
+        api = next(pattern for pattern in resolver.url_patterns
+                   if getattr(pattern, 'namespace', None) == 'api')
+        self.assertTrue(api._populated)
+
+    @override_settings(WARMUP_HOOKS=['tests.test_warmup.prime'])
+    def test_hooks_run_with_open_connection(self):
+        del calls[:]
+
+        with self.assertLogs('profiles.warmup', 'INFO'):
+            warmup.install()
+
+        self.assertEqual(calls, [True])
+
+    @override_settings(WARMUP_ENABLED=False,
+                       WARMUP_HOOKS=['tests.test_warmup.prime'])
+    def test_can_be_disabled(self):
+        del calls[:]
+
+        warmup.install()
+
+        self.assertEqual(calls, [])
+
+    @override_settings(WARMUP_HOOKS=['tests.test_warmup.prime'])
+    def test_hooks_are_skipped_when_database_fails(self):
+        del calls[:]
+
+        with mock.patch.object(connection, 'ensure_connection',
+                               side_effect=OperationalError), \
+                self.assertLogs('profiles.warmup', 'ERROR'):
+            warmup.connect()
+
+        self.assertEqual(calls, [])
+
+    @override_settings(WARMUP_HOOKS=['tests.test_warmup.fail',
+                                     'tests.test_warmup.prime'])
+    def test_failed_hook_is_logged(self):
+        del calls[:]
+
+        with self.assertLogs('profiles.warmup', 'ERROR') as logs:
+            warmup.connect()
+
+        self.assertIn('tests.test_warmup.fail', logs.output[0])
+        self.assertEqual(calls, [True])
@@ -0,0 +1,18 @@
+"""
+ASGI config for xusers project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 1.11 has no native ASGI handler, so WSGI application is adapted with
+asgiref. Responses are streamed chunk by chunk, which keeps server-sent
+events (/api/events/) working under ASGI servers such as uvicorn or daphne.
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "xusers.settings")
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -67,6 +67,18 @@ TEMPLATES = [
 WSGI_APPLICATION = 'xusers.wsgi.application'
 
 MIDDLEWARE = [
+    'profiles.middleware.TracingMiddleware',
+    'profiles.middleware.ServerTimingMiddleware',
+    'profiles.middleware.AdmissionControlMiddleware',
+    'profiles.middleware.PathDispatchMiddleware',
+]
+
+# Middleware run by PathDispatchMiddleware for requests which path starts
+# with the prefix, first matching prefix wins, e.g.
+# [('/api/', API_MIDDLEWARE)]. Other requests run DEFAULT_MIDDLEWARE.
+MIDDLEWARE_CHAINS = []
+
+DEFAULT_MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +86,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiles.middleware.ProfilingMiddleware',
+]
+
+# Minimal chain for API requests when they are authenticated with tokens
+# only, sessions, CSRF, messages and clickjacking protection aren't used.
+API_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'profiles.middleware.ProfilingMiddleware',
 ]
 
 # Database
@@ -96,6 +117,32 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'profiles.User'
 
+AUTHENTICATION_BACKENDS = ['profiles.hashing.PooledModelBackend']
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
+]
+
+# Passwords are hashed by this number of threads of every process, see
+# profiles.hashing.
+PASSWORD_HASHING_WORKERS = 2
+# Number of password operations waiting for hashing thread, requests beyond
+# that are answered with 503.
+PASSWORD_HASHING_QUEUE_SIZE = 8
+# Number of password operations hashed or waiting in all workers of the
+# node, None means no node limit. Needed with single threaded workers, which
+# never fill their own pool.
+PASSWORD_HASHING_NODE_LIMIT = 16
+# Memory-mapped file counting password operations of all workers, should be
+# on tmpfs. Operations are counted per process if not set.
+PASSWORD_HASHING_FILE = os.environ.get('PASSWORD_HASHING_FILE')
+# Seconds sent in Retry-After header of 503 response.
+PASSWORD_HASHING_RETRY_AFTER = 1
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -129,4 +176,212 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/1.11/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
\ No newline at end of file
+STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+
+# Change notifications streaming (/api/events/)
+
+# Maximum number of undelivered events per connection, slower clients
+# are disconnected.
+EVENTS_QUEUE_SIZE = 100
+# Seconds between keep-alive comments sent to idle connections.
+EVENTS_HEARTBEAT_INTERVAL = 15
+# Seconds after which stream is closed and client has to reconnect.
+EVENTS_STREAM_LIFETIME = 300
+# Reconnection delay advised to clients, in milliseconds.
+EVENTS_RETRY_MS = 3000
+# PostgreSQL NOTIFY channel used to share events between workers,
+# set to None to deliver events only within a worker.
+EVENTS_NOTIFY_CHANNEL = 'xusers_events'
+
+
+# Batch requests (/api/batch)
+
+# Maximum number of sub-requests in one batch.
+BATCH_MAX_REQUESTS = 20
+# Threads used for batches of read-only requests submitted with
+# "parallel": true, 1 disables parallel execution.
+BATCH_MAX_WORKERS = 4
+
+
+# Bulk endpoints
+
+# Number of items validated and written at once.
+BULK_CHUNK_SIZE = 500
+
+
+# Instrumentation
+
+# Emit timings of request phases in Server-Timing response header.
+INSTRUMENTATION_SERVER_TIMING = True
+# Addresses getting Server-Timing header besides staff users, None allows
+# everyone. The header is sent to everyone in debug mode.
+INSTRUMENTATION_SERVER_TIMING_ALLOWED_IPS = ['127.0.0.1']
+# Seconds between stack samples of requests profiled with ?_profile=1.
+PROFILING_SAMPLE_INTERVAL = 0.001
+# Queries slower than this number of seconds are logged to
+# profiles.slow_queries logger, None disables logging.
+SLOW_QUERY_THRESHOLD = 0.1
+# Record spans of requests in Chrome trace format.
+TRACING_ENABLED = False
+# Probability of tracing request, requests with X-Trace header are always
+# traced.
+TRACING_SAMPLE_RATE = 0.0
+# Trace file of every process, rotated when it reaches TRACING_MAX_BYTES.
+TRACING_FILE = os.path.join(BASE_DIR, 'trace-{pid}.json')
+TRACING_MAX_BYTES = 50 * 1024 * 1024
+TRACING_BACKUP_COUNT = 3
+
+
+# Throttling
+
+# Memory-mapped file with token buckets shared by workers, should be on
+# tmpfs. Buckets are kept per process if not set.
+THROTTLE_FILE = os.environ.get('THROTTLE_FILE')
+# Number of buckets in the file, least recently used ones are replaced.
+THROTTLE_SLOTS = 65536
+
+
+# Statement timeouts
+
+# Seconds after which PostgreSQL cancels queries of views keyed by
+# "View.action" or "View", where action is lowercased method for views
+# other than viewsets. Requests with cancelled query get 504.
+STATEMENT_TIMEOUTS = {
+    'SearchView': 2,
+    'UserViewSet.list': 5,
+    'UserViewSet.retrieve': 1,
+    'GroupViewSet.list': 2,
+    'GroupViewSet.retrieve': 1,
+    'BulkUserCreateView': 30,
+}
+
+
+# Request coalescing
+
+# Identical concurrent list and retrieve requests share one response, see
+# profiles.coalescing.
+SINGLE_FLIGHT_ENABLED = True
+# Seconds requests wait for the identical one before computing response on
+# their own.
+SINGLE_FLIGHT_TIMEOUT = 10
+
+
+# Stale-while-revalidate
+
+# Serve list and retrieve responses from cache and refresh them in
+# background, see profiles.stale. Clients may get data up to
+# STALE_MAX_AGE seconds old. Refreshes run in threads, uwsgi must be run with
+# enable-threads.
+STALE_WHILE_REVALIDATE_ENABLED = False
+# Cache alias holding rendered responses.
+STALE_CACHE = 'default'
+# Responses older than this number of seconds are refreshed in background
+# when they are served.
+STALE_REVALIDATE_AFTER = 1
+# Responses older than this number of seconds are refreshed before they
+# are served.
+STALE_MAX_AGE = 60
+# Seconds request waits for the refresh before older response is served
+# with Warning header.
+STALE_LATENCY_SLO = 2
+# Maximum age in seconds of responses served when database is slow or
+# queries of the view fail. Doesn't help when database is down, requests
+# still need it for authentication.
+STALE_IF_ERROR_MAX_AGE = 60 * 60
+
+
+# Fragment cache
+
+# Assemble JSON of users and groups lists from cached JSON of their
+# objects, see profiles.fragments. Requires FRAGMENT_CACHE shared by
+# workers, like memcached or Redis, changes made in one worker aren't seen
+# by others with per-process cache.
+FRAGMENT_CACHE_ENABLED = False
+# Cache alias holding fragments, must be shared by workers.
+FRAGMENT_CACHE = 'default'
+# Seconds fragments are kept, bounds staleness of objects changed in other
+# workers or without signals.
+FRAGMENT_CACHE_TIMEOUT = 5 * 60
+
+
+# Admission control
+
+# Endpoint classes: (maximum number of in-flight requests of the class,
+# number of in-flight requests of all classes above which class requests
+# are rejected), None means no limit. Lower total limit sheds the class
+# sooner when the node is busy.
+ADMISSION_CLASSES = {
+    'cheap': (None, 64),
+    'default': (16, 48),
+    'expensive': (4, 32),
+}
+# Endpoint classes of views keyed by "View.action" or "View", where action
+# is lowercased method for views other than viewsets. Other views are of
+# "default" class, views of None class aren't admission controlled.
+ADMISSION_ENDPOINTS = {
+    'EventStreamView': None,
+    'UserViewSet.retrieve': 'cheap',
+    'GroupViewSet.retrieve': 'cheap',
+    'UserGroupsView.get': 'cheap',
+    'UserViewSet.list': 'expensive',
+    'SearchView': 'expensive',
+    'GroupViewSet.update': 'expensive',
+    'GroupViewSet.partial_update': 'expensive',
+}
+# Memory-mapped file counting in-flight requests of all workers of the node,
+# should be on tmpfs. Requests are counted per process if not set.
+ADMISSION_FILE = os.environ.get('ADMISSION_FILE')
+# Maximum number of processes sharing ADMISSION_FILE.
+ADMISSION_MAX_PROCESSES = 256
+# Seconds sent in Retry-After header of rejected requests.
+ADMISSION_RETRY_AFTER = 1
+
+
+# Worker warmup
+
+# Prepare worker on WSGI application load, see profiles.warmup.
+WARMUP_ENABLED = True
+# Dotted paths of functions priming caches, called in every worker once
+# database connection is opened.
+WARMUP_HOOKS = []
+
+
+# API documentation (/api/docs/)
+
+# Schema written by generate_schema command, generated on the first request
+# to docs if file does not exist.
+API_SCHEMA_FILE = os.path.join(BASE_DIR, 'schema.json')
+
+
+# Metrics (/metrics)
+
+# Directory where workers share metrics through memory-mapped files, must
+# be emptied on server start. Metrics are kept per process if not set.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Addresses allowed to read metrics, None allows everyone.
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'profiles.slow_queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'profiles.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
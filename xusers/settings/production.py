@@ -1,3 +1,5 @@
+import os
+
 from .base import *
 
 
@@ -5,12 +7,27 @@ DEBUG = False
 
 ALLOWED_HOSTS = ['.simplecloud.ru']
 
+# Connections are kept open between requests, so the ones opened by worker
+# warmup are reused, see profiles.warmup.
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('DB_CONN_MAX_AGE', 60))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'profiles.authentication.MeteredTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
         'rest_framework.permissions.DjangoModelPermissions',
-    )
-}
\ No newline at end of file
+    ),
+    # Token bucket capacity / refill rate, see profiles.throttling.
+    'DEFAULT_THROTTLE_RATES': {
+        'search': '10/second',
+        'write': '10/second',
+        'bulk': '10/minute',
+        'auth': '20/minute',
+    },
+}
+
+# API is authenticated with tokens only.
+MIDDLEWARE_CHAINS = [('/api/', API_MIDDLEWARE)]
@@ -7,10 +7,20 @@ ALLOWED_HOSTS = ['127.0.0.1']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'profiles.authentication.MeteredTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
         'rest_framework.permissions.DjangoModelPermissions',
     )
 }
+
+# API is authenticated with tokens only.
+MIDDLEWARE_CHAINS = [('/api/', API_MIDDLEWARE)]
+
+# Fast hashing for tests, hashes made by default hasher are still accepted
+# and upgraded on login.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
@@ -17,13 +17,15 @@ from django.conf.urls import url, include
 from django.contrib import admin
 
 from rest_framework.authtoken import views
-from rest_framework.documentation import include_docs_urls
+
+from profiles.throttling import AuthThrottle
+from profiles.views import MetricsView
 
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
     url(r'^api/', include('profiles.urls', namespace='api')),
-    url(r'^api/docs/', include_docs_urls(title='xUsers Managment System API',
-                                         authentication_classes=[],
-                                         permission_classes=[])),
-    url(r'api/api-auth/', views.obtain_auth_token)
+    url(r'^api/docs/', include('profiles.docs', namespace='api-docs')),
+    url(r'api/api-auth/',
+        views.ObtainAuthToken.as_view(throttle_classes=(AuthThrottle,))),
+    url(r'^metrics$', MetricsView.as_view(), name='metrics'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "xusers.settings")
 
 application = get_wsgi_application()
+
+# Imported once apps are loaded.
+from profiles import warmup  # noqa: E402
+
+warmup.install()